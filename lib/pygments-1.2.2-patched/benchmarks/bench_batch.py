@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for batch highlighting
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Highlights many small snippets (cut from the Pygments sources) with
+    a new lexer and formatter per snippet, and with
+    `pygments.batch.highlight_many` in the current process and with pools
+    of worker processes and threads.  Checks that all give the same
+    results and prints the time taken and snippets per second.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_batch.py [snippets [jobs]]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments import highlight
+from pygments.batch import highlight_many
+from pygments.lexers import get_lexer_by_name
+from pygments.formatters import get_formatter_by_name
+
+from bench_html import make_source
+
+
+def make_items(count):
+    lines = make_source(count * 1000).splitlines(True)
+    items = []
+    for i in xrange(count):
+        code = ''.join(lines[i * 15:(i + 1) * 15])
+        options = i % 3 and {} or {'linenos': 'table'}
+        items.append((code, i % 2 and 'python' or 'pycon', options))
+    return items
+
+
+def naive(items):
+    return [highlight(code, get_lexer_by_name(name, **options),
+                      get_formatter_by_name('html', **options))
+            for code, name, options in items]
+
+
+def main(args):
+    count = args[1:] and int(args[1]) or 2000
+    jobs = args[2:] and int(args[2]) or 4
+    items = make_items(count)
+    runs = [
+        ('new instances per snippet', lambda: naive(items)),
+        ('highlight_many', lambda: list(highlight_many(items))),
+        ('highlight_many, %d processes' % jobs,
+         lambda: list(highlight_many(items, jobs=jobs))),
+        ('highlight_many, %d threads' % jobs,
+         lambda: list(highlight_many(items, jobs=jobs, threads=True))),
+    ]
+    expected = None
+    for name, func in runs:
+        start = time.time()
+        results = func()
+        elapsed = time.time() - start
+        if expected is None:
+            expected = results
+        elif results != expected:
+            print '%s: different results' % name
+            sys.exit(1)
+        print '%-32s %8.3f s %8.0f snippets/s' % (name, elapsed,
+                                                  count / elapsed)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for token value escaping
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Lexes a large Python file (2 MB by default, built by repeating the
+    Pygments sources) once, then escapes all token values with the escape
+    functions of the text formatters and formats the tokens with these
+    formatters.  Prints the best time of several runs and the throughput
+    in MB of input per second.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_escape.py [repeat [megabytes]]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments.lexers import PythonLexer
+from pygments.formatters import HtmlFormatter, LatexFormatter, \
+     RtfFormatter, SvgFormatter
+from pygments.formatters.html import escape_html
+from pygments.formatters.latex import escape_tex
+
+from bench_html import NullFile, make_source
+
+
+def escape_values(escape, values):
+    for value in values:
+        escape(value)
+
+
+ESCAPES = [
+    ('escape_html', lambda values: escape_values(escape_html, values)),
+    ('escape_tex', lambda values: escape_values(
+        lambda value: escape_tex(value, 'PY'), values)),
+    ('RtfFormatter._escape_text', lambda values: escape_values(
+        RtfFormatter()._escape_text, values)),
+]
+
+FORMATTERS = [HtmlFormatter, LatexFormatter, RtfFormatter, SvgFormatter]
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 3
+    megabytes = args[2:] and float(args[2]) or 2
+    source = make_source(int(megabytes * 1024 * 1024))
+    tokens = list(PythonLexer().get_tokens(source))
+    values = [value for ttype, value in tokens]
+    print '%d characters, %d tokens' % (len(source), len(tokens))
+    for name, func in ESCAPES:
+        best = best_of(repeat, func, values)
+        print '%-28s %8.3f s %8.2f MB/s' % (name, best, megabytes / best)
+    for cls in FORMATTERS:
+        best = best_of(repeat, lambda: cls().format(tokens, NullFile()))
+        print '%-28s %8.3f s %8.2f MB/s' % (cls.__name__, best,
+                                            megabytes / best)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
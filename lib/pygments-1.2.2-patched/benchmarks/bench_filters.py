@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for filter pipelines
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Lexes a large Python file (2 MB by default, built by repeating the
+    Pygments sources) once, then runs several filter stacks over the
+    tokens, once with every filter applied on its own (chained
+    generators) and once fused by `apply_filters`.  Checks that both give
+    the same tokens and prints the best time of several runs.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_filters.py [repeat [megabytes]]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments.lexers import PythonLexer
+from pygments.filter import apply_filters
+from pygments.filters import get_filter_by_name
+
+from bench_html import make_source
+
+
+STACKS = [
+    ('codetagify', [('codetagify', {})]),
+    ('keywordcase+highlight', [('keywordcase', {'case': 'upper'}),
+                               ('highlight', {'names': ['self', 'cls']})]),
+    ('all but whitespace', [('codetagify', {}), ('keywordcase', {}),
+                            ('highlight', {'names': ['self']}),
+                            ('raiseonerror', {}), ('gobble', {'n': 0}),
+                            ('tokenmerge', {})]),
+    ('whitespace+codetagify', [('whitespace', {'spaces': True}),
+                               ('codetagify', {})]),
+]
+
+
+def chained(tokens, filters):
+    stream = iter(tokens)
+    for filter_ in filters:
+        stream = filter_.filter(None, stream)
+    return list(stream)
+
+
+def fused(tokens, filters):
+    return list(apply_filters(iter(tokens), filters))
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 3
+    megabytes = args[2:] and float(args[2]) or 2
+    source = make_source(int(megabytes * 1024 * 1024))
+    tokens = list(PythonLexer().get_tokens(source))
+    print '%d characters, %d tokens' % (len(source), len(tokens))
+    print '%-24s %10s %10s' % ('', 'chained', 'fused')
+    for name, stack in STACKS:
+        filters = [get_filter_by_name(fname, **options)
+                   for fname, options in stack]
+        chained_time, chained_tokens = best_of(repeat, chained, tokens,
+                                               filters)
+        fused_time, fused_tokens = best_of(repeat, fused, tokens, filters)
+        if chained_tokens != fused_tokens:
+            print '%s: different output' % name
+            sys.exit(1)
+        print '%-24s %8.3f s %8.3f s' % (name, chained_time, fused_time)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for the HTML formatter
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Lexes a large Python file (10 MB by default, built by repeating the
+    Pygments sources) once, then formats the tokens with several
+    HtmlFormatter configurations and prints the best time of several
+    runs and the throughput in MB of input per second.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_html.py [repeat [megabytes]]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments.lexers import PythonLexer
+from pygments.formatters import HtmlFormatter
+
+
+CONFIGURATIONS = [
+    ('default', {}),
+    ('noclasses', {'noclasses': True}),
+    ('linenos=table', {'linenos': 'table'}),
+    ('linenos=inline', {'linenos': 'inline'}),
+    ('hl_lines', {'hl_lines': range(1, 1000000, 7)}),
+    ('full', {'full': True}),
+]
+
+
+class NullFile(object):
+    """Count the output instead of storing it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+    def flush(self):
+        pass
+
+
+def make_source(size):
+    import pygments
+    directory = os.path.dirname(pygments.__file__)
+    chunks = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.py'):
+            chunks.append(open(os.path.join(directory, filename)).read())
+    chunk = '\n'.join(chunks).decode('utf-8')
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 3
+    megabytes = args[2:] and float(args[2]) or 10
+    source = make_source(int(megabytes * 1024 * 1024))
+    tokens = PythonLexer().get_token_buffer(source)
+    print '%d characters, %d tokens' % (len(source), len(tokens))
+    for name, options in CONFIGURATIONS:
+        best = None
+        for _ in xrange(repeat):
+            formatter = HtmlFormatter(**options)
+            outfile = NullFile()
+            start = time.time()
+            formatter.format(tokens, outfile)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print '%-16s %8.3f s %8.2f MB/s %10d chars out' % (
+            name, best, megabytes / best, outfile.size)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for import and startup time
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Runs typical startup sequences in fresh interpreters and prints the
+    best wall clock time of several runs together with the number of
+    Pygments modules that were imported.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_import.py [repeat]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+import subprocess
+
+# the fresh interpreters use the Pygments of this checkout, wherever the
+# script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+SCENARIOS = [
+    ('import pygments.formatters',
+     'import pygments.formatters'),
+    ('get_formatter_by_name',
+     'from pygments.formatters import get_formatter_by_name\n'
+     'get_formatter_by_name("html")'),
+    ('get_style_by_name',
+     'from pygments.styles import get_style_by_name\n'
+     'get_style_by_name("monokai")'),
+    ('pygmentize -l python -f html',
+     'from pygments.cmdline import main\n'
+     'main(["pygmentize", "-l", "python", "-f", "html", "-o", %r, %r])'
+     % (os.devnull, os.devnull)),
+]
+
+REPORT = '''
+import sys
+sys.stderr.write("%d\\n" % len([name for name, mod in sys.modules.items()
+                                if name.startswith("pygments") and mod]))
+'''
+
+
+def run(code):
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-c', code + REPORT],
+                            stderr=subprocess.PIPE, cwd=ROOT)
+    modules = proc.communicate()[1]
+    return time.time() - start, int(modules.split()[-1])
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 5
+    baseline = min([run('')[0] for _ in xrange(repeat)])
+    print '%-32s %8.3f s' % ('(empty interpreter)', baseline)
+    for name, code in SCENARIOS:
+        results = [run(code) for _ in xrange(repeat)]
+        best = min([elapsed for elapsed, _ in results])
+        print '%-32s %8.3f s %+8.3f s %4d modules' % (
+            name, best, best - baseline, results[0][1])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for ``do_insertions``
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Merges tens of thousands of prompt insertions into a token stream,
+    both directly and through the shell session and Python console
+    lexers lexing long interactive transcripts.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_insertions.py [repeat]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments.lexer import do_insertions
+from pygments.lexers import BashSessionLexer, PythonConsoleLexer
+from pygments.token import Generic, Name, Text
+
+
+def make_tokens(count):
+    tokens = []
+    pos = 0
+    for i in xrange(count):
+        value = u'name%d' % i
+        tokens.append((pos, Name, value))
+        tokens.append((pos + len(value), Text, u'\n'))
+        pos += len(value) + 1
+    return tokens
+
+
+def make_insertions(tokens, every=1):
+    # one prompt in front of every `every` lines
+    return [(i, [(0, Generic.Prompt, u'$ ')])
+            for i, t, v in tokens[::2 * every]]
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench(name, repeat, func):
+    best, ntokens = best_of(repeat, func)
+    print '%-24s %8d tokens %8.3f s %10.0f tokens/s' % (
+        name, ntokens, best, ntokens / best)
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 3
+
+    tokens = make_tokens(50000)
+    insertions = make_insertions(tokens)
+    bench('do_insertions', repeat,
+          lambda: len(list(do_insertions(insertions, iter(tokens)))))
+    sparse = make_insertions(tokens, 50)
+    bench('do_insertions (sparse)', repeat,
+          lambda: len(list(do_insertions(sparse, iter(tokens)))))
+
+    session = u''.join([u'$ echo %d\n%d\n' % (i, i) for i in xrange(20000)])
+    bench('Bash Session', repeat,
+          lambda: len(list(BashSessionLexer().get_tokens(session))))
+
+    console = u''.join([u'>>> x = %d\n... y = x\n%d\n' % (i, i)
+                        for i in xrange(20000)])
+    bench('Python console session', repeat,
+          lambda: len(list(PythonConsoleLexer().get_tokens(console))))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark for lexers delegating to other lexers with ``using()``
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Lexes HTML documents with many embedded script and style blocks and
+    an HTML+Django template, and prints the best time of several runs.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/bench_using.py [repeat]
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+
+# use the Pygments of this checkout, wherever the script is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pygments.lexers import HtmlLexer, HtmlDjangoLexer
+
+
+HTML_BLOCK = u'''\
+<div class="item" id="item%(i)d">
+  <script type="text/javascript">var x%(i)d = [1, 2, "three"];</script>
+  <style type="text/css">#item%(i)d { color: #%(i)03d; margin: 0 }</style>
+  <a href="/item/%(i)d" onclick="show(%(i)d)">Item %(i)d</a>
+</div>
+'''
+
+DJANGO_BLOCK = u'''\
+{%% for entry in entries %%}
+  <li class="{{ entry.kind|lower }}">{{ entry.title|escape }} %(i)d</li>
+  <script>load({{ entry.id }}, "%(i)d");</script>
+  <style>li.e%(i)d { display: none }</style>
+{%% endfor %%}
+'''
+
+
+def make_document(block, count):
+    return u''.join([block % {'i': i} for i in xrange(count)])
+
+
+def bench(lexer_cls, text, repeat):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        ntokens = 0
+        for _ in lexer_cls().get_tokens(text):
+            ntokens += 1
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print '%-20s %8d tokens %8.3f s %10.0f tokens/s' % (
+        lexer_cls.name, ntokens, best, ntokens / best)
+
+
+def main(args):
+    repeat = args[1:] and int(args[1]) or 3
+    bench(HtmlLexer, make_document(HTML_BLOCK, 2000), repeat)
+    bench(HtmlDjangoLexer, make_document(DJANGO_BLOCK, 2000), repeat)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,578 @@
+# -*- coding: utf-8 -*-
+"""
+    Inputs for the benchmark suite
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Synthetic code-like text that every lexer can be run on, small
+    real-world samples for common languages, and files found in corpus
+    directories.  All inputs are deterministic, so that results of
+    different runs can be compared.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import random
+from fnmatch import fnmatch
+
+
+SAMPLES = {
+    'c': r'''#include <stdio.h>
+#include <stdlib.h>
+
+/* Count the words read from standard input. */
+typedef struct entry {
+    char *word;
+    unsigned long count;
+    struct entry *next;
+} entry_t;
+
+static entry_t *table[4096];
+
+static unsigned hash(const char *s)
+{
+    unsigned h = 5381;
+    while (*s)
+        h = h * 33 + (unsigned char) *s++;
+    return h % 4096;
+}
+
+int main(int argc, char **argv)
+{
+    char buf[256];
+    while (scanf("%255s", buf) == 1) {
+        entry_t *e = table[hash(buf)];
+        if (e == NULL && argc > 1)
+            fprintf(stderr, "new word: %s\n", buf);
+    }
+    return 0;  // done
+}
+''',
+    'cpp': r'''#include <iostream>
+#include <map>
+#include <string>
+
+namespace stats {
+
+template <typename T>
+class Counter {
+public:
+    explicit Counter(const std::string &name) : name_(name) {}
+    void add(const T &value) { ++counts_[value]; }
+    size_t size() const { return counts_.size(); }
+private:
+    std::string name_;
+    std::map<T, unsigned long> counts_;
+};
+
+}  // namespace stats
+
+int main() {
+    stats::Counter<std::string> words("words");
+    std::string word;
+    while (std::cin >> word)
+        words.add(word);
+    std::cout << words.size() << " distinct words" << std::endl;
+    return 0;
+}
+''',
+    'css': r'''body {
+    margin: 0;
+    padding: 0 1em;
+    font: 13px/1.4 "Helvetica Neue", Arial, sans-serif;
+    background: #fafafa url(images/bg.png) repeat-x;
+}
+
+a:link, a:visited { color: #0645ad; text-decoration: none; }
+a:hover { text-decoration: underline !important; }
+
+#header .navigation > li {
+    display: inline-block;
+    width: 12.5%;
+    border-bottom: 1px solid rgba(0, 0, 0, 0.2);
+}
+
+@media print {
+    .sidebar { display: none; }
+}
+''',
+    'go': r'''package main
+
+import (
+	"bufio"
+	"fmt"
+	"os"
+	"strings"
+)
+
+// WordCount counts the words of the lines read from r.
+func WordCount(r *bufio.Reader) map[string]int {
+	counts := make(map[string]int)
+	for {
+		line, err := r.ReadString('\n')
+		for _, word := range strings.Fields(line) {
+			counts[word]++
+		}
+		if err != nil {
+			break
+		}
+	}
+	return counts
+}
+
+func main() {
+	counts := WordCount(bufio.NewReader(os.Stdin))
+	fmt.Printf("%d distinct words\n", len(counts))
+}
+''',
+    'haskell': r'''module Main where
+
+import qualified Data.Map as Map
+import Data.Char (toLower, isAlpha)
+
+-- | Count the words of a text.
+wordCount :: String -> Map.Map String Int
+wordCount = foldr insert Map.empty . words . map normalize
+  where
+    insert w = Map.insertWith (+) w 1
+    normalize c
+      | isAlpha c = toLower c
+      | otherwise = ' '
+
+data Stats = Stats { total :: Int, distinct :: Int }
+  deriving (Show, Eq)
+
+main :: IO ()
+main = do
+  text <- getContents
+  let counts = wordCount text
+  print Stats { total = sum (Map.elems counts), distinct = Map.size counts }
+''',
+    'html': r'''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN"
+  "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+  <title>Word count &mdash; results</title>
+  <link rel="stylesheet" href="style.css" type="text/css" />
+  <style type="text/css">
+    td.count { text-align: right; }
+  </style>
+  <script type="text/javascript">
+    function toggle(id) {
+      var el = document.getElementById(id);
+      el.style.display = el.style.display == 'none' ? '' : 'none';
+    }
+  </script>
+</head>
+<body>
+  <!-- generated table -->
+  <table id="results" class="wide">
+    <tr><th>Word</th><th>Count</th></tr>
+    <tr><td>the</td><td class="count">1024</td></tr>
+  </table>
+  <p><a href="#" onclick="toggle('results'); return false;">Toggle</a></p>
+</body>
+</html>
+''',
+    'java': r'''package com.example.stats;
+
+import java.util.HashMap;
+import java.util.Map;
+
+/**
+ * Counts the words of a text.
+ */
+public final class WordCounter {
+  private final Map<String, Integer> counts = new HashMap<String, Integer>();
+
+  public void add(String text) {
+    for (String word : text.split("\\s+")) {
+      Integer count = counts.get(word);
+      counts.put(word, count == null ? 1 : count + 1);
+    }
+  }
+
+  @Override
+  public String toString() {
+    return "WordCounter(" + counts.size() + " words)";
+  }
+
+  public static void main(String[] args) throws Exception {
+    WordCounter counter = new WordCounter();
+    counter.add("a b c a");
+    System.out.println(counter);  // prints 3 words
+  }
+}
+''',
+    'js': r'''/**
+ * Word counting for the results page.
+ */
+var WordCount = (function () {
+    'use strict';
+
+    function count(text) {
+        var counts = {}, words = text.toLowerCase().split(/\s+/), i;
+        for (i = 0; i < words.length; i += 1) {
+            if (words[i] !== '') {
+                counts[words[i]] = (counts[words[i]] || 0) + 1;
+            }
+        }
+        return counts;
+    }
+
+    return {
+        count: count,
+        render: function (el, text) {
+            var counts = count(text), key, html = [];
+            for (key in counts) {
+                if (counts.hasOwnProperty(key)) {
+                    html.push('<li>' + key + ': ' + counts[key] + '</li>');
+                }
+            }
+            el.innerHTML = html.join('\n');
+        }
+    };
+}());
+''',
+    'objective-c': r'''#import <Foundation/Foundation.h>
+
+@interface WordCounter : NSObject {
+    NSMutableDictionary *counts;
+}
+- (void)addText:(NSString *)text;
+@property (readonly) NSUInteger distinctWords;
+@end
+
+@implementation WordCounter
+
+- (id)init {
+    if ((self = [super init])) {
+        counts = [[NSMutableDictionary alloc] init];
+    }
+    return self;
+}
+
+- (void)addText:(NSString *)text {
+    for (NSString *word in [text componentsSeparatedByString:@" "]) {
+        NSNumber *n = [counts objectForKey:word];
+        [counts setObject:[NSNumber numberWithInt:[n intValue] + 1] forKey:word];
+    }
+}
+
+- (NSUInteger)distinctWords {
+    return [counts count];
+}
+
+@end
+''',
+    'perl': r'''#!/usr/bin/perl
+use strict;
+use warnings;
+
+# Count the words read from the files given on the command line.
+my %count;
+while (my $line = <>) {
+    chomp $line;
+    next if $line =~ /^\s*#/;
+    for my $word (split /\W+/, lc $line) {
+        $count{$word}++ if length $word;
+    }
+}
+
+my @sorted = sort { $count{$b} <=> $count{$a} || $a cmp $b } keys %count;
+printf "%-20s %6d\n", $_, $count{$_} for @sorted[0 .. 9];
+print "Total: ", scalar(@sorted), " distinct words\n";
+__END__
+=head1 NAME
+
+wordcount - count words
+''',
+    'python': r'''#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Count the words read from standard input."""
+
+import re
+import sys
+from collections import defaultdict
+
+WORD_RE = re.compile(r"[a-z']+")
+
+
+class WordCounter(object):
+    """Counts words, ignoring case."""
+
+    def __init__(self, stopwords=()):
+        self.counts = defaultdict(int)
+        self.stopwords = frozenset(stopwords)
+
+    def add(self, text):
+        for word in WORD_RE.findall(text.lower()):
+            if word not in self.stopwords:
+                self.counts[word] += 1
+
+    def most_common(self, n=10):
+        items = sorted(self.counts.items(), key=lambda item: -item[1])
+        return items[:n]
+
+
+if __name__ == '__main__':
+    counter = WordCounter(['the', 'a'])
+    for line in sys.stdin:
+        counter.add(line)
+    for word, count in counter.most_common():
+        print '%-20s %6d' % (word, count)
+''',
+    'scala': r'''package com.example.stats
+
+import scala.collection.mutable
+import scala.io.Source
+
+/** Counts the words of a text. */
+object WordCount {
+  def count(lines: Iterator[String]): Map[String, Int] = {
+    val counts = mutable.Map[String, Int]().withDefaultValue(0)
+    for (line <- lines; word <- line.split("\\s+") if word.nonEmpty)
+      counts(word.toLowerCase) += 1
+    counts.toMap
+  }
+
+  case class Stats(total: Int, distinct: Int)
+
+  def main(args: Array[String]): Unit = {
+    val counts = count(Source.stdin.getLines())
+    val stats = Stats(counts.values.sum, counts.size)
+    println(s"$stats")  // e.g. Stats(120,42)
+  }
+}
+''',
+    'xml': r'''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE project>
+<project name="wordcount" default="jar" basedir=".">
+  <!-- build properties -->
+  <property name="src.dir" value="src"/>
+  <property name="build.dir" value="build"/>
+
+  <target name="compile" description="Compile the sources">
+    <mkdir dir="${build.dir}/classes"/>
+    <javac srcdir="${src.dir}" destdir="${build.dir}/classes"
+           debug="true" includeantruntime="false">
+      <classpath>
+        <fileset dir="lib" includes="*.jar"/>
+      </classpath>
+    </javac>
+  </target>
+
+  <target name="jar" depends="compile">
+    <jar destfile="${build.dir}/wordcount.jar">
+      <fileset dir="${build.dir}/classes"/>
+      <![CDATA[ raw <data> ]]>
+    </jar>
+  </target>
+</project>
+''',
+    'ruby': r'''#!/usr/bin/env ruby
+# Count the words read from standard input.
+require 'set'
+
+class WordCounter
+  attr_reader :counts
+
+  def initialize(stopwords = [])
+    @counts = Hash.new(0)
+    @stopwords = Set.new(stopwords)
+  end
+
+  def add(text)
+    text.downcase.scan(/[a-z']+/) do |word|
+      @counts[word] += 1 unless @stopwords.include?(word)
+    end
+    self
+  end
+
+  def most_common(n = 10)
+    @counts.sort_by { |word, count| [-count, word] }.first(n)
+  end
+end
+
+counter = WordCounter.new(%w[the a])
+$stdin.each_line { |line| counter.add(line) }
+counter.most_common.each { |word, count| puts "#{word}: #{count}" }
+''',
+    'php': r'''<?php
+/**
+ * Count the words of the submitted text.
+ */
+class WordCounter
+{
+    private $counts = array();
+
+    public function add($text)
+    {
+        foreach (preg_split('/\s+/', strtolower($text)) as $word) {
+            if ($word !== '') {
+                $this->counts[$word] = isset($this->counts[$word])
+                    ? $this->counts[$word] + 1 : 1;
+            }
+        }
+        return $this;
+    }
+
+    public function render()
+    {
+        arsort($this->counts);
+        foreach ($this->counts as $word => $count) {
+            echo "<li>" . htmlspecialchars($word) . ": $count</li>\n";
+        }
+    }
+}
+
+$counter = new WordCounter();
+$counter->add($_POST['text'])->render();
+?>
+''',
+    'bash': r'''#!/bin/bash
+# Count the words of the files given as arguments.
+set -e
+
+usage() {
+    echo "Usage: $0 [-n count] file..." >&2
+    exit 2
+}
+
+count=10
+while getopts "n:" opt; do
+    case $opt in
+        n) count=$OPTARG ;;
+        *) usage ;;
+    esac
+done
+shift $((OPTIND - 1))
+[ $# -gt 0 ] || usage
+
+for file in "$@"; do
+    if [ ! -r "$file" ]; then
+        echo "cannot read $file" >&2
+        continue
+    fi
+    tr -cs 'A-Za-z' '\n' < "$file"
+done | tr 'A-Z' 'a-z' | sort | uniq -c | sort -rn | head -n "$count"
+''',
+    'sql': r'''-- Word statistics
+CREATE TABLE words (
+    id INTEGER PRIMARY KEY,
+    word VARCHAR(64) NOT NULL UNIQUE,
+    count INTEGER DEFAULT 0
+);
+
+INSERT INTO words (word, count) VALUES ('the', 1024), ('a', 512);
+
+SELECT w.word, w.count, ROUND(100.0 * w.count / t.total, 2) AS percent
+  FROM words w,
+       (SELECT SUM(count) AS total FROM words) t
+ WHERE w.count > 10
+   AND w.word NOT LIKE '%''%'
+ ORDER BY w.count DESC, w.word
+ LIMIT 10;
+
+UPDATE words SET count = count + 1 WHERE word = 'the';
+DROP TABLE IF EXISTS old_words;
+''',
+}
+SAMPLES['python3'] = SAMPLES['python'].replace(
+    "print '%-20s %6d' % (word, count)", "print('%-20s %6d' % (word, count))")
+
+_KEYWORDS = ['if', 'else', 'for', 'while', 'return', 'class', 'def', 'int',
+             'var', 'function', 'end', 'begin', 'let', 'in', 'import',
+             'new', 'this', 'self', 'null', 'true', 'false', 'public']
+_NAMES = ['foo', 'bar', 'baz', 'value', 'count', 'item', 'result', 'data',
+          'x', 'y', 'index', 'buffer', 'node', 'parent']
+_WORDS = ['the', 'quick', 'brown', 'fox', 'jumps', 'over', 'lazy', 'dog',
+          'lorem', 'ipsum', 'dolor', 'sit', 'amet']
+_TEMPLATES = [
+    '%(kw)s %(name)s = %(other)s + %(num)s;',
+    '%(name)s(%(other)s, "%(text)s");',
+    '    %(name)s.%(other)s[%(num)s] = %(num2)s.%(num)s',
+    '# %(text)s',
+    '// %(text)s',
+    '/* %(text)s */',
+    '%(kw)s (%(name)s < %(num)s) { %(other)s++; }',
+    '<%(name)s %(other)s="%(text)s">%(text)s</%(name)s>',
+    "    '%(text)s' => %(name)s",
+    '%(name)s: %(num)s, %(other)s: [%(num2)s, 0x%(num)sff]',
+    '',
+    '%(kw)s %(name)s(%(other)s):',
+    '    %(kw)s %(other)s',
+    '}',
+]
+
+
+def make_synthetic(size, seed=0):
+    """
+    Return `size` characters of code-like text: statements, calls,
+    strings, comments and markup in many syntaxes.
+    """
+    rnd = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = rnd.choice(_TEMPLATES) % {
+            'kw': rnd.choice(_KEYWORDS),
+            'name': rnd.choice(_NAMES),
+            'other': rnd.choice(_NAMES),
+            'num': rnd.randint(0, 9999),
+            'num2': rnd.randint(0, 99),
+            'text': ' '.join(rnd.sample(_WORDS, rnd.randint(1, 5))),
+        }
+        lines.append(line)
+        length += len(line) + 1
+    return (u'\n'.join(lines) + u'\n')[:size]
+
+
+def _repeat(text, size):
+    return (text * (size // len(text) + 1))[:size]
+
+
+def find_files(directories, patterns, limit=100):
+    """
+    Return up to `limit` paths of files below `directories` whose names
+    match one of the shell `patterns`, in a stable order.
+    """
+    found = []
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = sorted([name for name in dirnames
+                                  if not name.startswith('.')])
+            for name in sorted(filenames):
+                for pattern in patterns:
+                    if fnmatch(name, pattern):
+                        found.append(os.path.join(dirpath, name))
+                        break
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def make_real(lexer_cls, size, directories):
+    """
+    Return `size` characters of real-world input for `lexer_cls`: the
+    contents of matching files below `directories`, else the built-in
+    sample for one of its aliases.  Return None if there is neither.
+    """
+    chunks = []
+    length = 0
+    for path in find_files(directories, lexer_cls.filenames):
+        try:
+            text = open(path, 'rb').read().decode('utf-8')
+        except (IOError, UnicodeError):
+            continue
+        chunks.append(text)
+        length += len(text)
+        if length >= size:
+            break
+    if chunks:
+        return _repeat(u'\n'.join(chunks), size)
+    for alias in lexer_cls.aliases:
+        if alias in SAMPLES:
+            return _repeat(unicode(SAMPLES[alias]), size)
+    return None
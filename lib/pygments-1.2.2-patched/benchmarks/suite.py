@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmark suite with a regression gate
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Times
+
+    * ``get_tokens_unprocessed`` of every lexer in ``_mapping.LEXERS`` on
+      synthetic code-like input and, where available, real-world input
+      (files from the corpus directories given with ``-c``, else built-in
+      samples), with totals for all lexers and for the lexers used by
+      jgments (``lexers.ALL``),
+    * `HtmlFormatter`, `TerminalFormatter`, `LatexFormatter` and
+      `RawTokenFormatter` on the tokens of real Python code,
+    * `guess_lexer` on the built-in samples,
+    * startup sequences in fresh interpreters,
+
+    and writes the best time of several runs of every benchmark to a JSON
+    file.  The ``compare`` command compares two such files and fails if a
+    benchmark got slower by more than a threshold.  Results are compared
+    per character (or call), and results for different inputs, e.g. from
+    different corpus directories, are marked.
+
+    Run it from the directory containing the ``pygments`` package::
+
+        python benchmarks/suite.py run [-o results.json] [-r repeat]
+            [-s kilobytes] [-k pattern] [-c corpus-dir] [-j jgments-lexers.py]
+        python benchmarks/suite.py compare [-t threshold] [-k pattern]
+            baseline.json results.json
+
+    By default, every benchmark is run 3 times on inputs of 32 KB.  ``-k``
+    selects the benchmarks whose names match a shell pattern, e.g.
+    ``-k 'lex/*'`` or ``-k '*Python*'``; the totals are only recorded for
+    complete runs.  The threshold is the allowed slowdown as a fraction
+    (0.1 by default, i.e. 10%).
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import getopt
+import platform
+from fnmatch import fnmatch
+from textwrap import dedent
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# use the Pygments of this checkout, wherever the script is run from
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import pygments
+from pygments.lexers import find_lexer_class, guess_lexer
+from pygments.lexers._mapping import LEXERS
+from pygments.formatters import HtmlFormatter, TerminalFormatter, \
+     LatexFormatter, RawTokenFormatter
+from pygments.util import ClassNotFound
+
+from bench_html import NullFile
+from bench_import import SCENARIOS, run as run_interpreter
+from corpus import SAMPLES, make_synthetic, make_real
+
+#: Default location of the jgments lexer list in a jgments checkout.
+JGMENTS_LEXERS = os.path.join(HERE, os.pardir, os.pardir, os.pardir, 'java',
+                              'com', 'google', 'jgments', 'lexers.py')
+
+FORMATTERS = [HtmlFormatter, TerminalFormatter, LatexFormatter,
+              RawTokenFormatter]
+
+
+def jgments_lexer_names(path):
+    """
+    Return the class names of the lexers in ``ALL`` of the jgments
+    ``lexers.py`` at `path`.  The module is not imported, because it
+    monkeypatches `pygments.lexer`.
+    """
+    try:
+        source = open(path).read()
+    except IOError:
+        return []
+    start = source.find('ALL = ')
+    if start < 0:
+        return []
+    end = source.find(']', start)
+    return re.findall(r'pygments\.lexers\.\w+\.(\w+)', source[start:end])
+
+
+def measure(func, repeat, mintime=0.05):
+    """
+    Return the best time per call of `func` over `repeat` runs, each
+    calling it often enough to take at least `mintime` seconds.
+    """
+    number = 1
+    while 1:
+        start = time.time()
+        for _ in xrange(number):
+            func()
+        elapsed = time.time() - start
+        if elapsed >= mintime:
+            break
+        number *= 2
+    best = elapsed
+    for _ in xrange(repeat - 1):
+        start = time.time()
+        for _ in xrange(number):
+            func()
+        best = min(best, time.time() - start)
+    return best / number
+
+
+class Suite(object):
+
+    def __init__(self, repeat, size, pattern, corpus, jgments):
+        self.repeat = repeat
+        self.size = size
+        self.pattern = pattern
+        self.corpus = corpus
+        self.jgments = jgments
+        self.results = {}
+
+    def wanted(self, name):
+        return fnmatch(name, self.pattern)
+
+    def record(self, name, seconds, units, unit, data=u''):
+        self.results[name] = {
+            'seconds': seconds, 'units': units, 'unit': unit,
+            'input': '%08x' % (zlib.crc32(data.encode('utf-8')) & 0xffffffff),
+        }
+        print '%-56s %10.4f s %12s %s/s' % (name, seconds,
+                                            '%.4g' % (units / seconds), unit)
+        sys.stdout.flush()
+
+    def fail(self, name, err):
+        self.results[name] = {'error': '%s: %s' % (err.__class__.__name__,
+                                                   err)}
+        print '%-56s %s' % (name, self.results[name]['error'])
+
+    def run_lexers(self):
+        synthetic = make_synthetic(self.size)
+        totals = {}
+        jgments = set(self.jgments)
+        for key in sorted(LEXERS):
+            cls = find_lexer_class(LEXERS[key][1])
+            inputs = [('synthetic', synthetic)]
+            real = make_real(cls, self.size, self.corpus)
+            if real is not None:
+                inputs.append(('real', real))
+            for kind, text in inputs:
+                name = 'lex/%s/%s' % (key, kind)
+                if not self.wanted(name):
+                    continue
+                if not text.endswith('\n'):
+                    # like the preprocessing in get_tokens()
+                    text += '\n'
+                try:
+                    lexer = cls()
+                    seconds = measure(
+                        lambda: list(lexer.get_tokens_unprocessed(text)),
+                        self.repeat)
+                except Exception, err:
+                    self.fail(name, err)
+                    continue
+                self.record(name, seconds, len(text), 'chars', text)
+                groups = ['all']
+                if key in jgments:
+                    groups.append('jgments')
+                for group in groups:
+                    total = totals.setdefault((group, kind), [0.0, 0, 0])
+                    total[0] += seconds
+                    total[1] += len(text)
+                    total[2] = zlib.crc32(text.encode('utf-8'), total[2])
+        for (group, kind), (seconds, chars, crc) in sorted(totals.items()):
+            # totals are recorded for complete runs only
+            if self.pattern == '*':
+                self.results['lex-total/%s/%s' % (group, kind)] = {
+                    'seconds': seconds, 'units': chars, 'unit': 'chars',
+                    'input': '%08x' % (crc & 0xffffffff)}
+                print '%-56s %10.4f s %12s chars/s' % (
+                    'lex-total/%s/%s' % (group, kind), seconds,
+                    '%.4g' % (chars / seconds))
+
+    def run_formatters(self):
+        text = make_real(find_lexer_class('Python'), self.size * 4,
+                         self.corpus)
+        lexer = find_lexer_class('Python')()
+        tokens = list(lexer.get_tokens(text))
+        for cls in FORMATTERS:
+            name = 'format/%s' % cls.__name__
+            if not self.wanted(name):
+                continue
+            formatter = cls()
+            seconds = measure(lambda: formatter.format(tokens, NullFile()),
+                              self.repeat)
+            self.record(name, seconds, len(text), 'chars', text)
+
+    def run_guess(self):
+        for alias in sorted(SAMPLES):
+            name = 'guess_lexer/%s' % alias
+            if not self.wanted(name):
+                continue
+            text = unicode(SAMPLES[alias])
+            try:
+                seconds = measure(lambda: guess_lexer(text), self.repeat)
+            except ClassNotFound, err:
+                self.fail(name, err)
+                continue
+            self.record(name, seconds, 1, 'calls', text)
+
+    def run_imports(self):
+        scenarios = [('(empty interpreter)', '')] + SCENARIOS
+        for scenario, code in scenarios:
+            name = 'import/%s' % scenario
+            if not self.wanted(name):
+                continue
+            seconds = min([run_interpreter(code)[0]
+                           for _ in xrange(self.repeat)])
+            self.record(name, seconds, 1, 'runs', unicode(code))
+
+    def run(self):
+        self.run_lexers()
+        self.run_formatters()
+        self.run_guess()
+        self.run_imports()
+        return {
+            'meta': {
+                'pygments': pygments.__version__,
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'repeat': self.repeat,
+                'size': self.size,
+            },
+            'results': self.results,
+        }
+
+
+def compare(old, new, threshold, pattern):
+    """
+    Print the changes between the results `old` and `new` and return the
+    names of the benchmarks that got slower by more than `threshold`.
+    The change printed is that of the time per unit, so positive values
+    are slowdowns, as in the threshold.
+    """
+    regressions = []
+    old, new = old['results'], new['results']
+    print '%-56s %12s %12s %12s' % ('benchmark (units/s)', 'old', 'new',
+                                    'time change')
+    for name in sorted(set(old) | set(new)):
+        if not fnmatch(name, pattern):
+            continue
+        before, after = old.get(name), new.get(name)
+        if before is None or after is None:
+            print '%-56s %s' % (name, before is None and 'new' or 'removed')
+            continue
+        if 'error' in before or 'error' in after:
+            print '%-56s %s' % (name, after.get('error') or 'fixed')
+            continue
+        # compare the time per unit, so that runs with different input
+        # sizes can be compared
+        old_time = before['seconds'] / before['units']
+        new_time = after['seconds'] / after['units']
+        change = new_time / old_time - 1
+        note = ''
+        if change > threshold:
+            regressions.append(name)
+            note = ' REGRESSION'
+        if before['input'] != after['input']:
+            note += ' (different input)'
+        print '%-56s %12s %12s %+11.1f%%%s' % (
+            name, '%.4g' % (1 / old_time), '%.4g' % (1 / new_time),
+            100 * change, note)
+    return regressions
+
+
+USAGE = dedent(__doc__[__doc__.find('    Run it'):
+                       __doc__.find('    :copyright:')]).rstrip()
+
+
+def main(args):
+    command = args[1:2]
+    if command not in (['run'], ['compare']):
+        print >>sys.stderr, USAGE
+        return 2
+    try:
+        popts, args = getopt.getopt(args[2:], 'o:r:s:k:c:j:t:')
+    except getopt.GetoptError:
+        print >>sys.stderr, USAGE
+        return 2
+    opts = {}
+    corpus = []
+    for opt, arg in popts:
+        if opt == '-c':
+            corpus.append(arg)
+        else:
+            opts[opt] = arg
+    pattern = opts.get('-k', '*')
+
+    if command == ['compare']:
+        if len(args) != 2:
+            print >>sys.stderr, USAGE
+            return 2
+        old, new = [json.load(open(filename)) for filename in args]
+        threshold = float(opts.get('-t', 0.1))
+        regressions = compare(old, new, threshold, pattern)
+        if regressions:
+            print '%d benchmarks got slower by more than %d%%' % (
+                len(regressions), threshold * 100)
+            return 1
+        return 0
+
+    if args:
+        print >>sys.stderr, USAGE
+        return 2
+    suite = Suite(int(opts.get('-r', 3)), int(float(opts.get('-s', 32)) * 1024),
+                  pattern, corpus,
+                  jgments_lexer_names(opts.get('-j', JGMENTS_LEXERS)))
+    results = suite.run()
+    if '-o' in opts:
+        f = open(opts['-o'], 'w')
+        try:
+            json.dump(results, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
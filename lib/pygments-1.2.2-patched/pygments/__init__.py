@@ -51,14 +51,19 @@ def lex(code, lexer):
         raise
 
 
-def format(tokens, formatter, outfile=None):
+def format(tokens, formatter, outfile=None, cache=None):
     """
     Format a tokenlist ``tokens`` with the formatter ``formatter``.
 
     If ``outfile`` is given and a valid file object (an object
     with a ``write`` method), the result will be written to it, otherwise
     it is returned as a string.
+
+    If ``cache`` is given, it must be a `pygments.cache.HighlightCache`
+    which is asked for the result first.
     """
+    if cache is not None:
+        return cache.format(tokens, formatter, outfile)
     try:
         if not outfile:
             #print formatter, 'using', formatter.encoding
@@ -75,14 +80,19 @@ def format(tokens, formatter, outfile=None):
         raise
 
 
-def highlight(code, lexer, formatter, outfile=None):
+def highlight(code, lexer, formatter, outfile=None, cache=None):
     """
     Lex ``code`` with ``lexer`` and format it with the formatter ``formatter``.
 
     If ``outfile`` is given and a valid file object (an object
     with a ``write`` method), the result will be written to it, otherwise
     it is returned as a string.
+
+    If ``cache`` is given, it must be a `pygments.cache.HighlightCache`
+    which is asked for the result first.
     """
+    if cache is not None:
+        return cache.highlight(code, lexer, formatter, outfile)
     return format(lex(code, lexer), formatter, outfile)
 
 
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.batch
+    ~~~~~~~~~~~~~~
+
+    Highlighting of many snippets at once.
+
+    Creating a lexer and a formatter for every snippet is often more
+    expensive than highlighting it.  `highlight_many` reuses one lexer and
+    one formatter per distinct name and options, and can spread the work
+    over several processes or threads::
+
+        from pygments.batch import highlight_many
+
+        items = [(code, 'python', {}), (other_code, 'c', {'linenos': 1})]
+        for html in highlight_many(items, 'html', jobs=4):
+            ...
+
+    `highlight_files` does the same for files, writing every result to its
+    own output file.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import tempfile
+import threading
+
+from pygments import highlight
+from pygments.cache import make_key, Uncacheable
+from pygments.util import ClassNotFound
+from pygments.lexers import get_lexer_by_name, get_lexer_for_filename, \
+     guess_lexer, TextLexer
+from pygments.formatters import get_formatter_by_name
+
+__all__ = ['highlight_many', 'highlight_files']
+
+#: Number of lexers and formatters every thread keeps at most.
+MAX_INSTANCES = 256
+
+# every thread (and so every worker process) has its own instances, since
+# formatters are not safe to use from several threads at once
+_local = threading.local()
+
+
+def _get_instance(factory, name, options):
+    try:
+        instances = _local.instances
+    except AttributeError:
+        instances = _local.instances = {}
+    try:
+        key = (factory, name, make_key(options))
+    except Uncacheable:
+        return factory(name, **options)
+    try:
+        return instances[key]
+    except KeyError:
+        if len(instances) >= MAX_INSTANCES:
+            instances.clear()
+        instance = instances[key] = factory(name, **options)
+        return instance
+
+
+def _highlight_item(item):
+    code, lexer_name, options, formatter_name = item
+    lexer = _get_instance(get_lexer_by_name, lexer_name, options)
+    formatter = _get_instance(get_formatter_by_name, formatter_name, options)
+    return highlight(code, lexer, formatter)
+
+
+def highlight_many(items, formatter_name='html', jobs=1, threads=False,
+                   chunksize=16):
+    """
+    Highlight every ``(code, lexer_name, options)`` tuple in `items` and
+    yield the results in order.  Like the ``-O`` options of
+    ``pygmentize``, `options` are passed to both the lexer and the
+    formatter named `formatter_name`.
+
+    With `jobs` greater than one, the snippets are highlighted by a pool
+    of that many worker processes, or threads if `threads` is true, which
+    get `chunksize` snippets at a time.  Processes need Python 2.6 or the
+    ``multiprocessing`` package, and `items` and the results must be
+    picklable.
+    """
+    items = ((code, lexer_name, options, formatter_name)
+             for code, lexer_name, options in items)
+    if jobs <= 1:
+        for item in items:
+            yield _highlight_item(item)
+        return
+    if threads:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(jobs)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap(_highlight_item, items, chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+
+
+def _write_atomic(path, data):
+    """
+    Write `data` to the file `path`, replacing it atomically.
+    """
+    dirname = os.path.dirname(path) or os.curdir
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # created concurrently
+            pass
+    fd, tmpname = tempfile.mkstemp(dir=dirname, prefix='.tmp')
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmpname, path)
+    except:
+        os.remove(tmpname)
+        raise
+
+
+class _FileHighlighter(object):
+    """
+    Highlights files with one formatter and one lexer per lexer class.
+    """
+
+    def __init__(self, formatter_name, lexer_name, options, filters, guess):
+        self.formatter = get_formatter_by_name(formatter_name, **options)
+        if 'encoding' not in options and 'outencoding' not in options:
+            # encoding pass-through, like ``pygmentize -o``
+            self.formatter.encoding = 'latin1'
+        self.options = options
+        self.filters = filters
+        self.guess = guess
+        self.lexers = {}
+        self.lexer = None
+        if lexer_name:
+            self.lexer = self._new_lexer(get_lexer_by_name(lexer_name,
+                                                           **options))
+
+    def _new_lexer(self, lexer):
+        for fname, fopts in self.filters:
+            lexer.add_filter(fname, **fopts)
+        return lexer
+
+    def get_lexer(self, filename, code):
+        if self.lexer is not None:
+            return self.lexer
+        try:
+            cls = get_lexer_for_filename(filename, code).__class__
+        except ClassNotFound:
+            if not self.guess:
+                raise
+            try:
+                cls = guess_lexer(code).__class__
+            except ClassNotFound:
+                cls = TextLexer
+        try:
+            return self.lexers[cls]
+        except KeyError:
+            lexer = self.lexers[cls] = self._new_lexer(cls(**self.options))
+            return lexer
+
+    def __call__(self, item):
+        infn, outfn, required = item
+        try:
+            f = open(infn, 'rb')
+            try:
+                code = f.read()
+            finally:
+                f.close()
+            try:
+                lexer = self.get_lexer(infn, code)
+            except ClassNotFound:
+                if required:
+                    raise
+                return infn, None, 0, None
+            _write_atomic(outfn, highlight(code, lexer, self.formatter))
+        except Exception, err:
+            return infn, outfn, 0, '%s: %s' % (err.__class__.__name__, err)
+        return infn, outfn, len(code), None
+
+
+_file_highlighter = None
+
+
+def _init_file_worker(*config):
+    global _file_highlighter
+    _file_highlighter = _FileHighlighter(*config)
+
+
+def _highlight_file(item):
+    return _file_highlighter(item)
+
+
+def highlight_files(items, formatter_name='html', lexer_name=None,
+                    options={}, filters=(), guess=False, jobs=1,
+                    chunksize=4):
+    """
+    Highlight every file ``infn`` of the ``(infn, outfn, required)``
+    tuples in `items` and write the result to ``outfn``, which is
+    replaced atomically.  Yield an ``(infn, outfn, size, error)`` tuple
+    for every file as soon as it is done, where `size` is the size of
+    the input and `error` a message if highlighting failed.
+
+    Every file is highlighted with the lexer named `lexer_name`, or else
+    with the lexer matching its name.  Files matching no lexer are
+    guessed if `guess` is true, else they fail if ``required`` is true
+    and are skipped otherwise; ``outfn`` is None for skipped files.
+    `options` are passed to the lexers and to the formatter named
+    `formatter_name`, and `filters` is a sequence of ``(name, options)``
+    tuples of filters to add to the lexers.  If no output encoding is
+    given in `options`, the input bytes are passed through.
+
+    With `jobs` greater than one, the files are highlighted by a pool of
+    that many worker processes, which get `chunksize` files at a time.
+    Every process (or only this one) keeps one formatter and one lexer
+    per lexer class for all its files.
+    """
+    config = (formatter_name, lexer_name, options, filters, guess)
+    if jobs <= 1:
+        highlighter = _FileHighlighter(*config)
+        for item in items:
+            yield highlighter(item)
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs, _init_file_worker, config)
+    try:
+        for result in pool.imap_unordered(_highlight_file, items, chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
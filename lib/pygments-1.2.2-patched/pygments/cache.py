@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.cache
+    ~~~~~~~~~~~~~~
+
+    Opt-in caches for highlighting results.
+
+    A cache stores the output of `pygments.highlight` and `pygments.format`
+    under a hash of everything that determines it: the code (or token
+    stream), the lexer class, options and filters, the formatter class
+    and options, and the Pygments version.  Usage::
+
+        from pygments import highlight
+        from pygments.cache import SQLiteCache
+
+        cache = SQLiteCache('highlight.db', maxsize=50 * 1024 * 1024)
+        html = highlight(code, lexer, formatter, cache=cache)
+        print cache.hits, cache.misses
+
+    Option values are keyed by their ``repr()`` if they are strings,
+    numbers, booleans or None, classes and named functions by their
+    qualified name, containers by their items, and other objects with an
+    ``options`` dict (e.g. lexers and formatters) by their class and
+    options.  Results for other option values are not cached.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import time
+import types
+import tempfile
+import threading
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+import pygments
+
+__all__ = ['HighlightCache', 'MemoryCache', 'SQLiteCache',
+           'DirectoryCache', 'make_key', 'Uncacheable']
+
+
+class Uncacheable(Exception):
+    """
+    Raised by `make_key` for objects it cannot represent.
+    """
+
+
+_plain_types = (type(None), bool, int, long, float, complex, str, unicode)
+_named_types = (type, types.ClassType, types.FunctionType,
+                types.BuiltinFunctionType)
+
+
+def make_key(obj):
+    """
+    Return a string describing `obj` for cache keys, or raise
+    `Uncacheable` if there is none.  Equal option values, lexers and
+    formatters give equal strings.
+    """
+    if isinstance(obj, _plain_types):
+        return repr(obj)
+    if isinstance(obj, _named_types):
+        name = obj.__name__
+        if name == '<lambda>':
+            raise Uncacheable(obj)
+        return '%s.%s' % (getattr(obj, '__module__', ''), name)
+    if isinstance(obj, dict):
+        return '{%s}' % ', '.join(sorted(['%s: %s' % (make_key(k),
+                                                    make_key(v))
+                                          for k, v in obj.iteritems()]))
+    if isinstance(obj, (set, frozenset)):
+        return 'set([%s])' % ', '.join(sorted(map(make_key, obj)))
+    if isinstance(obj, list):
+        return '[%s]' % ', '.join(map(make_key, obj))
+    if isinstance(obj, tuple):
+        return '(%s)' % ', '.join(map(make_key, obj))
+    options = getattr(obj, 'options', None)
+    if isinstance(options, dict):
+        return '%s(%s)' % (make_key(obj.__class__), make_key(options))
+    raise Uncacheable(obj)
+
+
+def _update_text(hasher, text):
+    if isinstance(text, unicode):
+        hasher.update('u')
+        hasher.update(text.encode('utf-8'))
+    else:
+        hasher.update('b')
+        hasher.update(text)
+
+
+class HighlightCache(object):
+    """
+    Base class for highlighting caches.
+
+    Subclasses implement `get` and `set`, which map hexadecimal key
+    strings to byte or Unicode strings.  The `hits` and `misses` counters
+    are maintained by `highlight` and `format`.
+
+    `maxsize` is the approximate maximum size in bytes of all cached
+    values; the least recently used values are evicted first.
+    """
+
+    def __init__(self, maxsize=32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the value stored under `key`, or None.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting old values if necessary.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove all cached values.
+        """
+        raise NotImplementedError
+
+    def _new_key(self, lexer, formatter):
+        hasher = sha1()
+        if lexer is not None:
+            hasher.update('%s\0%s\0%r\0%s\0' % (
+                make_key(lexer.__class__), make_key(lexer.options),
+                lexer.encoding,
+                make_key([(f.__class__, getattr(f, 'options', None))
+                          for f in lexer.filters])))
+        hasher.update('%s\0%s\0%r\0%s\0' % (
+            make_key(formatter.__class__), make_key(formatter.options),
+            formatter.encoding, pygments.__version__))
+        return hasher
+
+    def highlight_key(self, code, lexer, formatter):
+        """
+        Return the cache key for highlighting `code`.  Raises
+        `Uncacheable` if an option cannot be represented in the key.
+        """
+        hasher = self._new_key(lexer, formatter)
+        _update_text(hasher, code)
+        return hasher.hexdigest()
+
+    def format_key(self, tokens, formatter):
+        """
+        Return the cache key for formatting the token list `tokens`.
+        Raises `Uncacheable` like `highlight_key`.
+        """
+        hasher = self._new_key(None, formatter)
+        update = hasher.update
+        for ttype, value in tokens:
+            update(str(ttype))
+            update('\0')
+            _update_text(hasher, value)
+            update('\0')
+        return hasher.hexdigest()
+
+    def _lookup(self, key, compute, outfile):
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+            value = compute()
+            self.set(key, value)
+        else:
+            self.hits += 1
+        if outfile:
+            outfile.write(value)
+        else:
+            return value
+
+    def highlight(self, code, lexer, formatter, outfile=None):
+        """
+        Like `pygments.highlight`, but look up the result in the cache
+        first.
+        """
+        try:
+            key = self.highlight_key(code, lexer, formatter)
+        except Uncacheable:
+            return pygments.highlight(code, lexer, formatter, outfile)
+        return self._lookup(key, lambda: pygments.highlight(code, lexer,
+                                                            formatter),
+                            outfile)
+
+    def format(self, tokens, formatter, outfile=None):
+        """
+        Like `pygments.format`, but look up the result in the cache
+        first.  The token stream is consumed to compute the key.
+        """
+        tokens = list(tokens)
+        try:
+            key = self.format_key(tokens, formatter)
+        except Uncacheable:
+            return pygments.format(tokens, formatter, outfile)
+        return self._lookup(key, lambda: pygments.format(tokens, formatter),
+                            outfile)
+
+
+def _encode_value(value):
+    if isinstance(value, unicode):
+        return 'u', value.encode('utf-8')
+    return 'b', value
+
+
+def _decode_value(kind, data):
+    if kind == 'u':
+        return data.decode('utf-8')
+    return data
+
+
+class MemoryCache(HighlightCache):
+    """
+    In-memory least recently used cache.
+    """
+
+    def __init__(self, maxsize=32 * 1024 * 1024):
+        HighlightCache.__init__(self, maxsize)
+        self.clear()
+
+    def clear(self):
+        # key -> link; links are [prev, next, key, value, size] lists in
+        # a circular list ordered from least to most recently used
+        self._links = {}
+        root = self._root = []
+        root[:] = [root, root, None, None, 0]
+        self.size = 0
+
+    def __len__(self):
+        return len(self._links)
+
+    def get(self, key):
+        link = self._links.get(key)
+        if link is None:
+            return None
+        # move to the most recently used end
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+        root = self._root
+        last = root[0]
+        last[1] = root[0] = link
+        link[0], link[1] = last, root
+        return link[3]
+
+    def set(self, key, value):
+        if key in self._links:
+            self._unlink(self._links.pop(key))
+        size = len(value)
+        if size > self.maxsize:
+            return
+        root = self._root
+        last = root[0]
+        link = [last, root, key, value, size]
+        last[1] = root[0] = self._links[key] = link
+        self.size += size
+        while self.size > self.maxsize:
+            oldest = root[1]
+            del self._links[oldest[2]]
+            self._unlink(oldest)
+
+    def _unlink(self, link):
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+        self.size -= link[4]
+
+
+class SQLiteCache(HighlightCache):
+    """
+    Cache stored in an SQLite database at `filename`, which can be shared
+    between processes and survives restarts.
+
+    The total size of the entries is kept in the database.  The access
+    times of hits are written together with the next new entry, or when
+    `close` is called or `atime_batch` hits are waiting.
+    """
+
+    atime_batch = 256
+
+    def __init__(self, filename, maxsize=256 * 1024 * 1024):
+        HighlightCache.__init__(self, maxsize)
+        self.filename = filename
+        # SQLite connections may only be used by the thread (and process)
+        # that opened them, so every thread gets its own
+        self._local = threading.local()
+        db = self._connection()
+        db.execute('CREATE TABLE IF NOT EXISTS highlight '
+                   '(key TEXT PRIMARY KEY, kind TEXT, value BLOB, '
+                   'size INTEGER, atime REAL)')
+        db.execute('CREATE INDEX IF NOT EXISTS highlight_atime '
+                   'ON highlight (atime)')
+        db.execute('CREATE TABLE IF NOT EXISTS highlight_size '
+                   '(id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)')
+        # databases of earlier versions start with the sum of their entries
+        db.execute('INSERT OR IGNORE INTO highlight_size '
+                   'SELECT 0, COALESCE(SUM(size), 0) FROM highlight')
+        db.commit()
+
+    def _connection(self):
+        local = self._local
+        db = getattr(local, 'db', None)
+        if db is None or local.pid != os.getpid():
+            import sqlite3
+            db = local.db = sqlite3.connect(self.filename)
+            db.text_factory = str
+            local.pid = os.getpid()
+            # access times of hits that are not written yet
+            local.atimes = {}
+        return db
+
+    def _write_atimes(self, db):
+        atimes = self._local.atimes
+        if atimes:
+            db.executemany('UPDATE highlight SET atime = ? WHERE key = ?',
+                           [(atime, key) for key, atime in atimes.iteritems()])
+            atimes.clear()
+
+    def close(self):
+        """
+        Write the waiting access times and close the connection of the
+        calling thread.
+        """
+        db = getattr(self._local, 'db', None)
+        if db is not None and self._local.pid == os.getpid():
+            self._write_atimes(db)
+            db.commit()
+            db.close()
+        self._local.db = None
+
+    def get(self, key):
+        db = self._connection()
+        row = db.execute('SELECT kind, value FROM highlight '
+                         'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        atimes = self._local.atimes
+        atimes[key] = time.time()
+        if len(atimes) >= self.atime_batch:
+            self._write_atimes(db)
+            db.commit()
+        return _decode_value(row[0], str(row[1]))
+
+    def set(self, key, value):
+        kind, data = _encode_value(value)
+        if len(data) > self.maxsize:
+            return
+        import sqlite3
+        db = self._connection()
+        self._write_atimes(db)
+        # the size of a replaced entry is looked up in the same statement,
+        # which locks the database against other writers
+        db.execute('UPDATE highlight_size SET total = total + ? - '
+                   'COALESCE((SELECT size FROM highlight WHERE key = ?), 0)',
+                   (len(data), key))
+        db.execute('INSERT OR REPLACE INTO highlight VALUES (?, ?, ?, ?, ?)',
+                   (key, kind, sqlite3.Binary(data), len(data), time.time()))
+        total = db.execute('SELECT total FROM highlight_size').fetchone()[0]
+        if total > self.maxsize:
+            excess = total - self.maxsize
+            doomed = []
+            freed = 0
+            for oldkey, size in db.execute('SELECT key, size FROM highlight '
+                                           'ORDER BY atime'):
+                if freed >= excess:
+                    break
+                doomed.append((oldkey,))
+                freed += size
+            db.executemany('DELETE FROM highlight WHERE key = ?', doomed)
+            db.execute('UPDATE highlight_size SET total = total - ?',
+                       (freed,))
+        db.commit()
+
+    def clear(self):
+        db = self._connection()
+        self._local.atimes.clear()
+        db.execute('DELETE FROM highlight')
+        db.execute('UPDATE highlight_size SET total = 0')
+        db.commit()
+
+
+class DirectoryCache(HighlightCache):
+    """
+    Cache storing every value in its own file below `directory`.  Files
+    are replaced atomically, so the directory can be shared between
+    processes.
+    """
+
+    def __init__(self, directory, maxsize=256 * 1024 * 1024):
+        HighlightCache.__init__(self, maxsize)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.size = sum([size for path, size, atime in self._entries()])
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def _entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        try:
+            # the modification time records the last use
+            os.utime(path, None)
+        except OSError:
+            pass
+        return _decode_value(data[:1], data[1:])
+
+    def set(self, key, value):
+        kind, data = _encode_value(value)
+        if len(data) > self.maxsize:
+            return
+        path = self._path(key)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # created concurrently
+                pass
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        fd, tmpname = tempfile.mkstemp(dir=dirname, prefix='.tmp')
+        f = os.fdopen(fd, 'wb')
+        try:
+            f.write(kind)
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmpname, path)
+        self.size += len(data) + 1 - replaced
+        if self.size > self.maxsize:
+            self._evict()
+
+    def _evict(self):
+        entries = list(self._entries())
+        entries.sort(key=lambda entry: entry[2])
+        self.size = sum([size for path, size, mtime in entries])
+        for path, size, mtime in entries:
+            if self.size <= self.maxsize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def clear(self):
+        for path, size, mtime in list(self._entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
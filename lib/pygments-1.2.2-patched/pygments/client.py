@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.client
+    ~~~~~~~~~~~~~~~
+
+    The options of the ``pygmentize`` command line and a client for a
+    ``pygmentize --serve`` server (see `pygments.daemon`).  Unlike
+    ``pygmentize --client``, which imports the whole command line with
+    its lexers, formatters and styles first, ::
+
+        python -m pygments.client <socket> <pygmentize arguments>
+
+    only imports this module and the request code of `pygments.daemon`,
+    and leaves the rest to the server.  Only if no server is listening on
+    <socket>, it runs the command line itself.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import sys
+import getopt
+
+__all__ = ['main']
+
+SHORT_OPTIONS = "l:f:F:o:O:P:LS:a:N:hVHgs"
+LONG_OPTIONS = ['serve=', 'client=', 'jobs=']
+
+#: Options that make ``pygmentize`` print something instead of reading
+#: the input.
+INFO_OPTIONS = ('-h', '-V', '-L', '-H', '-N', '-S')
+
+USAGE = """\
+Usage: %s <socket> [<pygmentize options and arguments>]
+
+Run pygmentize with the given options and arguments on the server
+listening on <socket> (started with pygmentize --serve <socket>), or
+here if there is none.
+"""
+
+
+def run_client(path, argv, popts, args):
+    """
+    Send the command line `argv`, parsed into `popts` and `args`, to the
+    server at `path`.  Return the exit status, or None if the server is
+    not reachable.
+    """
+    import socket
+    from pygments.daemon import request, _Stream
+
+    opts = dict(popts)
+    data = ''
+    inencoding = getattr(sys.stdin, 'encoding', None)
+    if not args and not [opt for opt in INFO_OPTIONS if opt in opts]:
+        # the input is read from stdin
+        data = sys.stdin.read()
+    try:
+        status, out, err = request(path, argv, data, inencoding,
+                                   getattr(sys.stdout, 'encoding', None))
+    except socket.error:
+        if data:
+            # keep the input for doing the work locally
+            sys.stdin = _Stream(data, inencoding)
+        return None
+    except EOFError:
+        print >>sys.stderr, 'Error: connection to the server closed'
+        return 1
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return status
+
+
+def main(args=sys.argv):
+    """
+    Client command line entry point.
+    """
+    if len(args) < 2 or args[1].startswith('-'):
+        print >>sys.stderr, USAGE % args[0]
+        return 2
+    argv = [args[0]] + args[2:]
+    try:
+        popts, pargs = getopt.getopt(argv[1:], SHORT_OPTIONS, LONG_OPTIONS)
+    except getopt.GetoptError:
+        # let pygmentize complain, without reading the input
+        popts, pargs = [('-h', '')], []
+    status = run_client(args[1], argv, popts, pargs)
+    if status is None:
+        # no server, do it ourselves
+        from pygments.cmdline import main
+        status = main(argv)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
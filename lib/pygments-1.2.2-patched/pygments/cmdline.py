@@ -8,11 +8,16 @@
     :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
     :license: BSD, see LICENSE for details.
 """
+import os
 import sys
+import mmap
+import time
 import getopt
+from itertools import chain
 from textwrap import dedent
 
-from pygments import __version__, highlight
+from pygments import __version__, highlight, format
+from pygments.client import SHORT_OPTIONS, LONG_OPTIONS, run_client
 from pygments.util import ClassNotFound, OptionError, docstring_headline
 from pygments.lexers import get_all_lexers, get_lexer_by_name, get_lexer_for_filename, \
      find_lexer_class, guess_lexer, TextLexer
@@ -25,18 +30,31 @@ from pygments.styles import get_all_styles, get_style_by_name
 
 USAGE = """\
 Usage: %s [-l <lexer> | -g] [-F <filter>[:<options>]] [-f <formatter>]
-          [-O <options>] [-P <option=value>] [-o <outfile>] [<infile>]
+          [-O <options>] [-P <option=value>] [-s] [-o <outfile>] [<infile>]
+       %s [-l <lexer> | -g] [-F <filter>[:<options>]] [-f <formatter>]
+          [-O <options>] [-P <option=value>] [--jobs <n>] -o <outdir>/
+          <infile or directory> ...
 
        %s -S <style> -f <formatter> [-a <arg>] [-O <options>] [-P <option=value>]
        %s -L [<which> ...]
        %s -N <filename>
        %s -H <type> <name>
        %s -h | -V
+       %s --serve <socket>
+       %s --client <socket> <any of the above>
 
 Highlight the input file and write the result to <outfile>.
 
 If no input file is given, use stdin, if -o is not given, use stdout.
 
+If <outdir> is a directory (or ends with a slash), highlight all given
+files and all files below the given directories, and write the results
+to files in <outdir> named like the input files (relative to the given
+directories) plus the extension of the formatter, which is HTML if -f is
+not given.  Files in directories that match no lexer are skipped.  With
+--jobs, the files are highlighted by <n> worker processes.  Statistics
+are printed on stderr at the end.
+
 <lexer> is a lexer name (query all lexer names with -L). If -l is not
 given, the lexer is guessed from the extension of the input file name
 (this obviously doesn't work if the input is stdin).  If -g is passed,
@@ -61,6 +79,12 @@ not be spaces around the colon).
 
 The -O, -P and -F options can be given multiple times.
 
+With the -s option, the input is read in line-aligned windows (memory-
+mapped if it is a regular file) and the output is written while
+lexing, so that memory use stays bounded for large input.  This works
+for most lexers based on regular expressions and for "text"; other
+lexers, like those for templates, still read the whole input.
+
 With the -S option, print out style definitions for style <style>
 for formatter <formatter>. The argument given by -a is formatter
 dependent.
@@ -76,11 +100,27 @@ If no specific lexer can be determined "text" is returned.
 The -H option prints detailed help for the object <name> of type <type>,
 where <type> is one of "lexer", "formatter" or "filter".
 
+The --serve option keeps running and serves highlighting requests on
+the Unix domain socket <socket>, saving the startup time of later calls.
+With --client <socket>, the remaining options and arguments are passed
+to the server at <socket>, which runs them in the working directory of
+the client.  If no server is listening there, the client does the work
+itself.  "python -m pygments.client <socket> ..." does the same, but
+does not import the lexers and formatters before asking the server.
+
+If the environment variable PYGMENTS_LEXER_CACHE names a directory,
+the compiled regular expressions of the lexers are cached there, which
+makes later calls start faster.
+
 The -h option prints this help.
 The -V option prints the package version.
 """
 
 
+#: Approximate size of the input windows in streaming mode (``-s``).
+STREAM_WINDOW_SIZE = 1 << 20
+
+
 def _parse_options(o_strs):
     opts = {}
     if not o_strs:
@@ -115,6 +155,144 @@ def _parse_filters(f_strs):
     return filters
 
 
+def _iter_windows(infile, size=STREAM_WINDOW_SIZE, close=False):
+    """
+    Yield the contents of `infile` in windows of about `size` bytes that
+    end at line boundaries.  Regular files are memory-mapped.  If `close`
+    is true, `infile` is closed when the generator finishes or is closed.
+    """
+    try:
+        try:
+            data = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError, mmap.error):
+            # not a regular file, or an empty one
+            while 1:
+                window = infile.read(size)
+                if not window:
+                    break
+                if not window.endswith('\n'):
+                    window += infile.readline()
+                yield window
+            return
+        try:
+            pos = 0
+            while pos < len(data):
+                end = data.find('\n', pos + size - 1)
+                if end < 0:
+                    end = len(data)
+                else:
+                    end += 1
+                yield data[pos:end]
+                pos = end
+        finally:
+            data.close()
+    finally:
+        if close:
+            infile.close()
+
+
+def _first_window(windows):
+    try:
+        return windows.next()
+    except StopIteration:
+        return ''
+
+
+def _format_args(popts, args):
+    """
+    Turn the options and arguments parsed by getopt back into a command
+    line.
+    """
+    argv = []
+    for opt, arg in popts:
+        if opt[1:] + ':' in SHORT_OPTIONS or opt[2:] + '=' in LONG_OPTIONS:
+            argv.extend((opt, arg))
+        else:
+            argv.append(opt)
+    return argv + ['--'] + args
+
+
+def _is_directory_name(outfn):
+    return outfn.endswith('/') or outfn.endswith(os.sep) or \
+           os.path.isdir(outfn)
+
+
+def _collect_files(args, outdir, ext):
+    """
+    Return ``(infn, outfn, required)`` tuples for the files in `args` and
+    the files below the directories in `args`.  Hidden files and
+    directories and `outdir` itself are left out.
+    """
+    realoutdir = os.path.realpath(outdir)
+    items = []
+    for arg in args:
+        if not os.path.isdir(arg):
+            items.append((arg, os.path.join(outdir,
+                                            os.path.basename(arg) + ext), True))
+            continue
+        for dirpath, dirnames, filenames in os.walk(arg):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')
+                           and os.path.realpath(os.path.join(dirpath, name))
+                           != realoutdir]
+            dirnames.sort()
+            filenames.sort()
+            reldir = dirpath[len(arg):].lstrip('/' + os.sep)
+            for name in filenames:
+                if not name.startswith('.'):
+                    items.append((os.path.join(dirpath, name),
+                                  os.path.join(outdir, reldir, name + ext),
+                                  False))
+    return items
+
+
+def _highlight_batch(args, outdir, fmter, lexer, parsed_opts, F_opts, guess,
+                     jobs):
+    """
+    Handle ``pygmentize -o <outdir>/ <infile or directory> ...``.
+    """
+    from pygments.batch import highlight_files
+
+    fmter = fmter or 'html'
+    try:
+        cls = get_formatter_by_name(fmter, **parsed_opts).__class__
+        if lexer:
+            get_lexer_by_name(lexer, **parsed_opts)
+    except (OptionError, ClassNotFound), err:
+        print >>sys.stderr, 'Error:', err
+        return 1
+    ext = cls.filenames and cls.filenames[0].lstrip('*') or \
+          '.' + cls.aliases[0]
+
+    items = _collect_files(args, outdir, ext)
+    seen = {}
+    for infn, outfn, required in items:
+        if outfn in seen:
+            print >>sys.stderr, 'Error: %s and %s would both be written ' \
+                                'to %s' % (seen[outfn], infn, outfn)
+            return 1
+        seen[outfn] = infn
+
+    start = time.time()
+    done = skipped = failed = size = 0
+    for infn, outfn, nbytes, error in highlight_files(
+        items, fmter, lexer, parsed_opts, F_opts, guess, jobs):
+        if error:
+            print >>sys.stderr, 'Error: cannot highlight %s: %s' % (infn,
+                                                                    error)
+            failed += 1
+        elif outfn is None:
+            skipped += 1
+        else:
+            done += 1
+            size += nbytes
+    elapsed = max(time.time() - start, 1e-6)
+    print >>sys.stderr, '%d files highlighted, %d skipped, %d failed: ' \
+                        '%.2f MB in %.2f s (%.2f MB/s, %.1f files/s)' % \
+          (done, skipped, failed, size / 1048576.0, elapsed,
+           size / 1048576.0 / elapsed, done / elapsed)
+    return failed and 1 or 0
+
+
 def _print_help(what, name):
     try:
         if what == 'lexer':
@@ -190,13 +368,52 @@ def main(args=sys.argv):
     """
     # pylint: disable-msg=R0911,R0912,R0915
 
-    usage = USAGE % ((args[0],) * 6)
+    usage = USAGE % ((args[0],) * 9)
 
     try:
-        popts, args = getopt.getopt(args[1:], "l:f:F:o:O:P:LS:a:N:hVHg")
+        popts, pargs = getopt.getopt(args[1:], SHORT_OPTIONS, LONG_OPTIONS)
     except getopt.GetoptError, err:
         print >>sys.stderr, usage
         return 2
+
+    # handle ``pygmentize --serve`` and ``pygmentize --client``
+    for opt, path in popts:
+        if opt == '--serve':
+            if len(popts) > 1 or pargs:
+                print >>sys.stderr, usage
+                return 2
+            from pygments.daemon import serve
+            try:
+                serve(path)
+            except EnvironmentError, err:
+                print >>sys.stderr, 'Error:', err
+                return 1
+            return 0
+        if opt == '--client':
+            popts = [item for item in popts if item[0] != '--client']
+            if [item for item in popts if item[0] == '--serve']:
+                print >>sys.stderr, usage
+                return 2
+            argv = [args[0]] + _format_args(popts, pargs)
+            status = run_client(path, argv, popts, pargs)
+            if status is not None:
+                return status
+            # no server, do it ourselves
+            if not popts and not pargs:
+                print usage
+                return 0
+            break
+    args = pargs
+
+    cachedir = os.environ.get('PYGMENTS_LEXER_CACHE')
+    if cachedir:
+        from pygments.lexercache import install
+        try:
+            install(cachedir)
+        except EnvironmentError:
+            # the cache is only an optimization
+            pass
+
     opts = {}
     O_opts = []
     P_opts = []
@@ -316,8 +533,25 @@ def main(args=sys.argv):
     F_opts = _parse_filters(F_opts)
     opts.pop('-F', None)
 
-    # select formatter
+    # handle ``pygmentize -o <outdir>/ <infile or directory> ...``
     outfn = opts.pop('-o', None)
+    jobs = opts.pop('--jobs', None)
+    if outfn and _is_directory_name(outfn):
+        try:
+            jobs = int(jobs or 1)
+        except ValueError:
+            jobs = 0
+        if not args or jobs < 1 or '-s' in opts:
+            print >>sys.stderr, usage
+            return 2
+        return _highlight_batch(args, outfn, opts.pop('-f', None),
+                                opts.pop('-l', None), parsed_opts, F_opts,
+                                '-g' in opts, jobs)
+    if jobs is not None:
+        print >>sys.stderr, usage
+        return 2
+
+    # select formatter
     fmter = opts.pop('-f', None)
     if fmter:
         try:
@@ -352,6 +586,8 @@ def main(args=sys.argv):
             print >>sys.stderr, 'Error:', err
             return 1
 
+    stream = opts.pop('-s', None) is not None
+
     if args:
         if len(args) > 1:
             print >>sys.stderr, usage
@@ -359,7 +595,11 @@ def main(args=sys.argv):
 
         infn = args[0]
         try:
-            code = open(infn, 'rb').read()
+            if stream:
+                windows = _iter_windows(open(infn, 'rb'), close=True)
+                code = _first_window(windows)
+            else:
+                code = open(infn, 'rb').read()
         except Exception, err:
             print >>sys.stderr, 'Error: cannot read infile:', err
             return 1
@@ -381,8 +621,13 @@ def main(args=sys.argv):
                 return 1
 
     else:
+        if stream:
+            windows = _iter_windows(sys.stdin)
         if '-g' in opts:
-            code = sys.stdin.read()
+            if stream:
+                code = _first_window(windows)
+            else:
+                code = sys.stdin.read()
             try:
                 lexer = guess_lexer(code)
             except ClassNotFound:
@@ -391,6 +636,8 @@ def main(args=sys.argv):
             print >>sys.stderr, 'Error: no lexer name given and reading ' + \
                                 'from stdin (try using -g or -l <lexer>)'
             return 2
+        elif stream:
+            code = _first_window(windows)
         else:
             code = sys.stdin.read()
 
@@ -414,7 +661,14 @@ def main(args=sys.argv):
         # process filters
         for fname, fopts in F_opts:
             lexer.add_filter(fname, **fopts)
-        highlight(code, lexer, fmter, outfile)
+        if stream:
+            try:
+                tokens = lexer.get_tokens_windowed(chain([code], windows))
+                format(tokens, fmter, outfile)
+            finally:
+                windows.close()
+        else:
+            highlight(code, lexer, fmter, outfile)
     except Exception, err:
         import traceback
         info = traceback.format_exception(*sys.exc_info())
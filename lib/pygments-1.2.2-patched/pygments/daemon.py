@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.daemon
+    ~~~~~~~~~~~~~~~
+
+    A persistent ``pygmentize`` process serving requests on a Unix domain
+    socket (``pygmentize --serve <socket>``), and the client for it
+    (``pygmentize --client <socket> ...``).  The server keeps the modules
+    and the processed lexers of earlier requests, so a request only costs
+    the lexing and formatting.
+
+    Every message is a sequence of frames, each a four byte big-endian
+    length followed by that many bytes.  A request consists of the frames
+
+    * ``PYGMENTIZE 1``, the protocol version,
+    * the command line arguments, including the program name, separated
+      by NUL bytes,
+    * the working directory,
+    * the encoding of standard input and of standard output (may be
+      empty),
+    * the data for standard input,
+
+    and a response of the frames
+
+    * the exit status as decimal number,
+    * the data written to standard output,
+    * the data written to standard error.
+
+    Requests are handled one at a time.  The socket is only accessible to
+    the user running the server.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import errno
+import signal
+import socket
+import struct
+import traceback
+import SocketServer
+import StringIO
+
+__all__ = ['serve', 'request']
+
+PROTOCOL = 'PYGMENTIZE 1'
+
+
+def write_frames(wfile, frames):
+    """
+    Write `frames`, a sequence of byte strings, to `wfile`.
+    """
+    for frame in frames:
+        wfile.write(struct.pack('>I', len(frame)))
+        wfile.write(frame)
+    wfile.flush()
+
+
+def read_frame(rfile):
+    """
+    Read one frame from `rfile`.  Raise EOFError if the connection ends
+    before it is complete.
+    """
+    header = rfile.read(4)
+    if len(header) != 4:
+        raise EOFError('connection closed')
+    length = struct.unpack('>I', header)[0]
+    data = rfile.read(length)
+    if len(data) != length:
+        raise EOFError('connection closed')
+    return data
+
+
+class _Stream(StringIO.StringIO):
+    """
+    In-memory replacement for the standard streams of a request.
+    """
+
+    def __init__(self, data='', encoding=None):
+        StringIO.StringIO.__init__(self, data)
+        self.encoding = encoding
+
+    def isatty(self):
+        return False
+
+
+def _is_daemon_option(arg):
+    # getopt accepts unique prefixes of long options
+    name = arg.split('=', 1)[0]
+    return len(name) > 2 and ('--serve'.startswith(name) or
+                              '--client'.startswith(name))
+
+
+def _run(args, cwd, inencoding, outencoding, data):
+    """
+    Run ``pygmentize`` with `args` in `cwd` and return the exit status
+    and what it wrote to standard output and standard error.
+    """
+    from pygments.cmdline import main
+
+    stdin = _Stream(data, inencoding or None)
+    stdout = _Stream(encoding=outencoding or None)
+    stderr = _Stream(encoding=outencoding or None)
+    saved = sys.stdin, sys.stdout, sys.stderr
+    oldcwd = os.getcwd()
+    try:
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+        try:
+            status = None
+            for arg in args[1:]:
+                if arg == '--':
+                    break
+                if _is_daemon_option(arg):
+                    print >>sys.stderr, 'Error: %s is not allowed in ' \
+                                        'requests to the server' % arg
+                    status = 2
+                    break
+            if status is None:
+                os.chdir(cwd)
+                status = main(args)
+        except _Terminated:
+            raise
+        except SystemExit, err:
+            status = err.code
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+        os.chdir(oldcwd)
+    if not isinstance(status, int):
+        status = status is not None and 1 or 0
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+class _Terminated(SystemExit):
+    """
+    Raised when the server receives SIGTERM.
+    """
+
+
+class _Server(SocketServer.UnixStreamServer):
+
+    terminated = False
+
+    def terminate(self, signum, frame):
+        # the exception can be replaced by one from cleaning up the
+        # current request, so the flag is checked after the request too
+        self.terminated = True
+        raise _Terminated()
+
+    def handle_error(self, request, client_address):
+        # SocketServer passes every exception of a request here
+        if self.terminated:
+            raise _Terminated()
+        SocketServer.UnixStreamServer.handle_error(self, request,
+                                                   client_address)
+
+    def close_request(self, request):
+        SocketServer.UnixStreamServer.close_request(self, request)
+        if self.terminated:
+            raise _Terminated()
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            version = read_frame(self.rfile)
+            if version != PROTOCOL:
+                write_frames(self.wfile, ['2', '', 'Error: unsupported '
+                                          'protocol %r\n' % version])
+                return
+            args, cwd, inencoding, outencoding, data = \
+                [read_frame(self.rfile) for _ in xrange(5)]
+        except EOFError:
+            return
+        status, out, err = _run(args.split('\0'), cwd, inencoding,
+                                outencoding, data)
+        if isinstance(out, unicode):
+            out = out.encode(outencoding or 'utf-8')
+        if isinstance(err, unicode):
+            err = err.encode(outencoding or 'utf-8')
+        write_frames(self.wfile, [str(status), out, err])
+
+
+def serve(path):
+    """
+    Serve ``pygmentize`` requests on the Unix domain socket `path` until
+    interrupted or terminated with SIGTERM, and remove the socket file
+    then.  A stale socket file is replaced; if another server is
+    listening on it, `socket.error` is raised.
+    """
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                probe.connect(path)
+            except socket.error, err:
+                if err.args[0] not in (errno.ECONNREFUSED, errno.ENOENT):
+                    raise
+                os.remove(path)
+            else:
+                raise socket.error(errno.EADDRINUSE,
+                                   'a server is already running on %s' % path)
+        finally:
+            probe.close()
+    # only the current user may connect
+    umask = os.umask(0177)
+    try:
+        server = _Server(path, _RequestHandler)
+    finally:
+        os.umask(umask)
+    try:
+        try:
+            previous = signal.signal(signal.SIGTERM, server.terminate)
+        except ValueError:
+            # signal handlers can only be installed in the main thread
+            previous = None
+        try:
+            try:
+                server.serve_forever()
+            except (KeyboardInterrupt, _Terminated):
+                pass
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+    finally:
+        try:
+            server.server_close()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def request(path, args, data='', inencoding='', outencoding=''):
+    """
+    Send a request to run ``pygmentize`` with `args` (including the
+    program name) to the server at `path`.  `data` is the input to
+    provide on standard input.  Return the exit status and the standard
+    output and error data.  Raise `socket.error` if the server is not
+    reachable.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        wfile = sock.makefile('wb')
+        rfile = sock.makefile('rb')
+        try:
+            write_frames(wfile, [PROTOCOL, '\0'.join(args), os.getcwd(),
+                                 inencoding or '', outencoding or '', data])
+            status = int(read_frame(rfile))
+            return status, read_frame(rfile), read_frame(rfile)
+        finally:
+            wfile.close()
+            rfile.close()
+    finally:
+        sock.close()
@@ -15,15 +15,86 @@ def apply_filters(stream, filters, lexer=None):
     Use this method to apply an iterable of filters to
     a stream. If lexer is given it's forwarded to the
     filter, otherwise the filter receives `None`.
+
+    Consecutive filters that declare the token types they touch (see
+    `Filter.ttypes`) are fused into a single loop over the stream.
     """
     def _apply(filter_, stream):
         for token in filter_.filter(lexer, stream):
             yield token
+    fusable = []
     for filter_ in filters:
+        if _is_fusable(filter_):
+            fusable.append(filter_)
+            continue
+        if fusable:
+            stream = _fused(fusable, stream, lexer)
+            fusable = []
         stream = _apply(filter_, stream)
+    if fusable:
+        stream = _fused(fusable, stream, lexer)
     return stream
 
 
+def _is_fusable(filter_):
+    return (getattr(filter_, 'ttypes', None) is not None and
+            filter_.filter.im_func is Filter.filter.im_func)
+
+
+def _fused(filters, stream, lexer):
+    """
+    Apply the fusable `filters` to `stream` in one loop.  Every token is
+    passed to the `process` functions of the filters touching its type, in
+    filter order; the tokens they return are processed further depth
+    first, so that the output order is the same as with chained filters.
+    """
+    # for every filter: a dict caching whether it touches a token type,
+    # the touched types and the process function
+    steps = [({}, filter_.ttypes, filter_.compile(lexer))
+             for filter_ in filters]
+    n = len(steps)
+
+    def next_step(ttype, i):
+        # index of the first filter from i on that touches ttype, or n
+        while i < n:
+            touched, ttypes, process = steps[i]
+            try:
+                if touched[ttype]:
+                    return i
+            except KeyError:
+                for parent in ttypes:
+                    if ttype in parent:
+                        touched[ttype] = True
+                        return i
+                touched[ttype] = False
+            i += 1
+        return n
+
+    # token type -> first touching filter
+    first = {}
+    for token in stream:
+        ttype = token[0]
+        try:
+            i = first[ttype]
+        except KeyError:
+            i = first[ttype] = next_step(ttype, 0)
+        if i == n:
+            # untouched by all filters
+            yield token
+            continue
+        pending = [(token, i)]
+        while pending:
+            token, i = pending.pop()
+            i = next_step(token[0], i)
+            if i == n:
+                yield token
+                continue
+            result = steps[i][2](token[0], token[1])
+            i += 1
+            for j in xrange(len(result) - 1, -1, -1):
+                pending.append((result[j], i))
+
+
 def simplefilter(f):
     """
     Decorator that converts a function into a filter::
@@ -44,14 +115,34 @@ class Filter(object):
     """
     Default filter. Subclass this class or use the `simplefilter`
     decorator to create own filters.
+
+    Instead of overriding `filter`, filters that only look at some tokens
+    one at a time can list the token types (including their subtypes)
+    they touch in `ttypes` and implement `compile`.  Such filters are
+    fused by `apply_filters`, and all other tokens pass them untouched.
     """
 
+    #: The token types whose tokens are passed to the function returned
+    #: by `compile`, or None if the filter implements `filter` instead.
+    ttypes = None
+
     def __init__(self, **options):
         self.options = options
 
-    def filter(self, lexer, stream):
+    def compile(self, lexer):
+        """
+        Return a function called with the token type and value of every
+        token in a stream whose type is in `ttypes`, which returns a
+        sequence of the tokens replacing it.  Every call of `compile`
+        starts a new stream.
+        """
         raise NotImplementedError()
 
+    def filter(self, lexer, stream):
+        if self.ttypes is None:
+            raise NotImplementedError()
+        return _fused([self], stream, lexer)
+
 
 class FunctionFilter(Filter):
     """
@@ -15,9 +15,10 @@ except NameError:
     from sets import Set as set
 
 import re
-from pygments.token import String, Comment, Keyword, Name, Error, Whitespace, \
-    string_to_tokentype
+from pygments.token import Token, String, Comment, Keyword, Name, Error, \
+    Whitespace, string_to_tokentype
 from pygments.filter import Filter
+from pygments.tokenbuffer import TokenBuffer
 from pygments.util import get_list_opt, get_int_opt, get_bool_opt, get_choice_opt, \
      ClassNotFound, OptionError
 from pygments.plugin import find_plugin_filters
@@ -80,6 +81,7 @@ class CodeTagFilter(Filter):
        A list of strings that are flagged as code tags.  The default is to
        highlight ``XXX``, ``TODO``, ``BUG`` and ``NOTE``.
     """
+    ttypes = (String.Doc, Comment)
 
     def __init__(self, **options):
         Filter.__init__(self, **options)
@@ -89,17 +91,14 @@ class CodeTagFilter(Filter):
             re.escape(tag) for tag in tags if tag
         ]))
 
-    def filter(self, lexer, stream):
+    def compile(self, lexer):
         regex = self.tag_re
-        for ttype, value in stream:
-            if ttype in String.Doc or \
-               ttype in Comment and \
-               ttype not in Comment.Preproc:
-                for sttype, svalue in _replace_special(ttype, value, regex,
-                                                       Comment.Special):
-                    yield sttype, svalue
-            else:
-                yield ttype, value
+        def process(ttype, value):
+            if ttype in Comment.Preproc:
+                return ((ttype, value),)
+            return list(_replace_special(ttype, value, regex,
+                                         Comment.Special))
+        return process
 
 
 class KeywordCaseFilter(Filter):
@@ -116,18 +115,18 @@ class KeywordCaseFilter(Filter):
        The casing to convert keywords to. Must be one of ``'lower'``,
        ``'upper'`` or ``'capitalize'``.  The default is ``'lower'``.
     """
+    ttypes = (Keyword,)
 
     def __init__(self, **options):
         Filter.__init__(self, **options)
         case = get_choice_opt(options, 'case', ['lower', 'upper', 'capitalize'], 'lower')
         self.convert = getattr(unicode, case)
 
-    def filter(self, lexer, stream):
-        for ttype, value in stream:
-            if ttype in Keyword:
-                yield ttype, self.convert(value)
-            else:
-                yield ttype, value
+    def compile(self, lexer):
+        convert = self.convert
+        def process(ttype, value):
+            return ((ttype, convert(value)),)
+        return process
 
 
 class NameHighlightFilter(Filter):
@@ -154,6 +153,7 @@ class NameHighlightFilter(Filter):
       used for highlighting the strings in `names`.  The default is
       `Name.Function`.
     """
+    ttypes = (Name,)
 
     def __init__(self, **options):
         Filter.__init__(self, **options)
@@ -164,12 +164,14 @@ class NameHighlightFilter(Filter):
         else:
             self.tokentype = Name.Function
 
-    def filter(self, lexer, stream):
-        for ttype, value in stream:
-            if ttype is Name and value in self.names:
-                yield self.tokentype, value
-            else:
-                yield ttype, value
+    def compile(self, lexer):
+        names = self.names
+        tokentype = self.tokentype
+        def process(ttype, value):
+            if ttype is Name and value in names:
+                return ((tokentype, value),)
+            return ((ttype, value),)
+        return process
 
 
 class ErrorToken(Exception):
@@ -187,6 +189,7 @@ class RaiseOnErrorTokenFilter(Filter):
 
     *New in Pygments 0.8.*
     """
+    ttypes = (Error,)
 
     def __init__(self, **options):
         Filter.__init__(self, **options)
@@ -198,11 +201,13 @@ class RaiseOnErrorTokenFilter(Filter):
         except TypeError:
             raise OptionError('excclass option is not an exception class')
 
-    def filter(self, lexer, stream):
-        for ttype, value in stream:
+    def compile(self, lexer):
+        exception = self.exception
+        def process(ttype, value):
             if ttype is Error:
-                raise self.exception(value)
-            yield ttype, value
+                raise exception(value)
+            return ((ttype, value),)
+        return process
 
 
 class VisibleWhitespaceFilter(Filter):
@@ -235,6 +240,7 @@ class VisibleWhitespaceFilter(Filter):
 
     *New in Pygments 0.8.*
     """
+    ttypes = (Token,)
 
     def __init__(self, **options):
         Filter.__init__(self, **options)
@@ -251,12 +257,13 @@ class VisibleWhitespaceFilter(Filter):
             self.newlines += '\n'
         self.wstt = get_bool_opt(options, 'wstokentype', True)
 
-    def filter(self, lexer, stream):
+    def compile(self, lexer):
         if self.wstt:
             spaces = self.spaces or ' '
             tabs = self.tabs or '\t'
             newlines = self.newlines or '\n'
             regex = re.compile(r'\s')
+            search = regex.search
             def replacefunc(wschar):
                 if wschar == ' ':
                     return spaces
@@ -266,21 +273,24 @@ class VisibleWhitespaceFilter(Filter):
                     return newlines
                 return wschar
 
-            for ttype, value in stream:
-                for sttype, svalue in _replace_special(ttype, value, regex,
-                                                       Whitespace, replacefunc):
-                    yield sttype, svalue
+            def process(ttype, value):
+                if search(value) is None:
+                    # _replace_special would drop empty values, too
+                    return value and ((ttype, value),) or ()
+                return list(_replace_special(ttype, value, regex,
+                                             Whitespace, replacefunc))
         else:
             spaces, tabs, newlines = self.spaces, self.tabs, self.newlines
             # simpler processing
-            for ttype, value in stream:
+            def process(ttype, value):
                 if spaces:
                     value = value.replace(' ', spaces)
                 if tabs:
                     value = value.replace('\t', tabs)
                 if newlines:
                     value = value.replace('\n', newlines)
-                yield ttype, value
+                return ((ttype, value),)
+        return process
 
 
 class GobbleFilter(Filter):
@@ -298,6 +308,8 @@ class GobbleFilter(Filter):
 
     *New in Pygments 1.2.*
     """
+    ttypes = (Token,)
+
     def __init__(self, **options):
         Filter.__init__(self, **options)
         self.n = get_int_opt(options, 'n', 0)
@@ -308,19 +320,26 @@ class GobbleFilter(Filter):
         else:
             return '', left - len(value)
 
-    def filter(self, lexer, stream):
+    def compile(self, lexer):
         n = self.n
-        left = n # How many characters left to gobble.
-        for ttype, value in stream:
-            # Remove ``left`` tokens from first line, ``n`` from all others.
-            parts = value.split('\n')
-            (parts[0], left) = self.gobble(parts[0], left)
-            for i in range(1, len(parts)):
-                (parts[i], left) = self.gobble(parts[i], n)
-            value = '\n'.join(parts)
+        gobble = self.gobble
+        left = [n] # How many characters left to gobble.
+        def process(ttype, value):
+            if '\n' not in value:
+                (value, left[0]) = gobble(value, left[0])
+            else:
+                # Remove ``left`` tokens from first line, ``n`` from all
+                # others.
+                parts = value.split('\n')
+                (parts[0], left[0]) = gobble(parts[0], left[0])
+                for i in range(1, len(parts)):
+                    (parts[i], left[0]) = gobble(parts[i], n)
+                value = '\n'.join(parts)
 
             if value != '':
-                yield ttype, value
+                return ((ttype, value),)
+            return ()
+        return process
 
 
 class TokenMergeFilter(Filter):
@@ -334,19 +353,26 @@ class TokenMergeFilter(Filter):
         Filter.__init__(self, **options)
 
     def filter(self, lexer, stream):
-        output = []
+        if isinstance(stream, TokenBuffer):
+            # merge the spans without concatenating strings
+            return iter(stream.merged())
+        return self._filter(stream)
+
+    def _filter(self, stream):
         current_type = None
-        current_value = None
+        # joined at the end of a run, concatenating one by one would take
+        # quadratic time for long runs
+        current_values = []
         for ttype, value in stream:
             if ttype is current_type:
-                current_value += value
+                current_values.append(value)
             else:
                 if current_type is not None:
-                    yield current_type, current_value
+                    yield current_type, ''.join(current_values)
                 current_type = ttype
-                current_value = value
+                current_values = [value]
         if current_type is not None:
-            yield current_type, current_value
+            yield current_type, ''.join(current_values)
 
 
 FILTERS = {
@@ -10,59 +10,95 @@
 """
 import os.path
 import fnmatch
+import types
 
 from pygments.formatters._mapping import FORMATTERS
 from pygments.plugin import find_plugin_formatters
-from pygments.util import docstring_headline, ClassNotFound
-
-ns = globals()
-for fcls in FORMATTERS:
-    ns[fcls.__name__] = fcls
-del fcls
+from pygments.util import ClassNotFound
 
 __all__ = ['get_formatter_by_name', 'get_formatter_for_filename',
-           'get_all_formatters'] + [cls.__name__ for cls in FORMATTERS]
+           'get_all_formatters'] + FORMATTERS.keys()
+
+_formatter_cache = {}
+
 
+def _load_formatters(module_name):
+    """
+    Load a formatter (and all others in the module too).
+    """
+    mod = __import__(module_name, None, None, ['__all__'])
+    for formatter_name in mod.__all__:
+        cls = getattr(mod, formatter_name)
+        _formatter_cache[cls.name] = cls
 
-_formatter_alias_cache = {}
-_formatter_filename_cache = []
 
-def _init_formatter_cache():
-    if _formatter_alias_cache:
-        return
-    for cls in get_all_formatters():
-        for alias in cls.aliases:
-            _formatter_alias_cache[alias] = cls
-        for fn in cls.filenames:
-            _formatter_filename_cache.append((fn, cls))
+def _get_formatter_class(module_name, name):
+    if name not in _formatter_cache:
+        _load_formatters(module_name)
+    return _formatter_cache[name]
 
 
 def find_formatter_class(name):
-    _init_formatter_cache()
-    cls = _formatter_alias_cache.get(name, None)
-    return cls
+    """
+    Lookup a formatter class by alias.  Return None if not found.
+    """
+    for module_name, fname, aliases, _, _ in FORMATTERS.itervalues():
+        if name in aliases:
+            return _get_formatter_class(module_name, fname)
+    for _, cls in find_plugin_formatters():
+        if name in cls.aliases:
+            return cls
 
 
 def get_formatter_by_name(name, **options):
-    _init_formatter_cache()
-    cls = _formatter_alias_cache.get(name, None)
-    if not cls:
+    """
+    Lookup and instantiate a formatter by alias.
+    """
+    cls = find_formatter_class(name)
+    if cls is None:
         raise ClassNotFound("No formatter found for name %r" % name)
     return cls(**options)
 
 
 def get_formatter_for_filename(fn, **options):
-    _init_formatter_cache()
+    """
+    Lookup and instantiate a formatter by filename pattern.
+    """
     fn = os.path.basename(fn)
-    for pattern, cls in _formatter_filename_cache:
-        if fnmatch.fnmatch(fn, pattern):
-            return cls(**options)
+    for module_name, name, _, filenames, _ in FORMATTERS.itervalues():
+        for filename in filenames:
+            if fnmatch.fnmatch(fn, filename):
+                return _get_formatter_class(module_name, name)(**options)
+    for _, cls in find_plugin_formatters():
+        for filename in cls.filenames:
+            if fnmatch.fnmatch(fn, filename):
+                return cls(**options)
     raise ClassNotFound("No formatter found for file name %r" % fn)
 
 
 def get_all_formatters():
     """Return a generator for all formatters."""
-    for formatter in FORMATTERS:
-        yield formatter
+    for module_name, name, _, _, _ in FORMATTERS.itervalues():
+        yield _get_formatter_class(module_name, name)
     for _, formatter in find_plugin_formatters():
         yield formatter
+
+
+class _automodule(types.ModuleType):
+    """Automatically import formatters."""
+
+    def __getattr__(self, name):
+        info = FORMATTERS.get(name)
+        if info:
+            cls = _get_formatter_class(info[0], info[1])
+            setattr(self, name, cls)
+            return cls
+        raise AttributeError(name)
+
+
+import sys
+oldmod = sys.modules['pygments.formatters']
+newmod = _automodule('pygments.formatters')
+newmod.__dict__.update(oldmod.__dict__)
+sys.modules['pygments.formatters'] = newmod
+del newmod.newmod, newmod.oldmod, newmod.sys, newmod.types
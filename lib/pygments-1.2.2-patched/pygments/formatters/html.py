@@ -9,6 +9,8 @@
     :license: BSD, see LICENSE for details.
 """
 import sys, os
+import marshal
+import tempfile
 import StringIO
 
 try:
@@ -17,22 +19,15 @@ except NameError:
     from sets import Set as set
 
 from pygments.formatter import Formatter
-from pygments.token import Token, Text, STANDARD_TYPES
-from pygments.util import get_bool_opt, get_int_opt, get_list_opt, bytes
+from pygments.token import Token, Text, STANDARD_TYPES, _token_table
+from pygments.util import get_bool_opt, get_int_opt, get_list_opt, bytes, \
+     escape_html
+from pygments.tokenbuffer import TokenBuffer
 
 
 __all__ = ['HtmlFormatter']
 
 
-def escape_html(text):
-    """Escape &, <, > as well as single and double quotes for HTML."""
-    return text.replace('&', '&amp;').  \
-                replace('<', '&lt;').   \
-                replace('>', '&gt;').   \
-                replace('"', '&quot;'). \
-                replace("'", '&#39;')
-
-
 def get_random_id():
     """Return a random id for javascript fields."""
     from random import random
@@ -45,6 +40,92 @@ def get_random_id():
     return sha('%s|%s' % (random(), time())).hexdigest()
 
 
+#: Size in bytes of buffered tokens above which `_count_lines` moves them
+#: to a temporary file.
+SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def _replay_tokens(batches, spool):
+    if spool is not None:
+        spool.seek(0)
+        load = marshal.load
+        try:
+            while 1:
+                try:
+                    batch = load(spool)
+                except EOFError:
+                    break
+                ids, values = batch
+                for i in xrange(len(ids)):
+                    yield _token_table[ids[i]], values[i]
+        finally:
+            spool.close()
+    for batch in batches:
+        ids, values = marshal.loads(batch)
+        for i in xrange(len(ids)):
+            yield _token_table[ids[i]], values[i]
+
+
+def _count_lines(tokensource):
+    """
+    Return ``(tokensource, lncount)``, where `lncount` is the number of
+    lines `HtmlFormatter._format_lines` produces for `tokensource`.
+
+    Token buffers, lists and tuples can be iterated twice and are returned
+    unchanged.  Other token streams are buffered in marshalled batches
+    (in a temporary file once they grow beyond `SPOOL_SIZE` bytes), and
+    the returned token source replays them.
+    """
+    if isinstance(tokensource, TokenBuffer) and tokensource.is_verbatim():
+        text = tokensource.text
+        return tokensource, (text.count('\n') +
+                             (text and text[-1] != '\n' or 0))
+    if isinstance(tokensource, (TokenBuffer, list, tuple)):
+        tokens = tokensource
+        batches = spool = None
+    else:
+        tokens = iter(tokensource)
+        batches = []
+        spool = None
+        size = 0
+        ids = []
+        values = []
+
+    newlines = 0
+    last = ''
+    for ttype, value in tokens:
+        if value:
+            newlines += value.count('\n')
+            last = value
+        if batches is not None:
+            ids.append(ttype.id)
+            values.append(value)
+            if len(ids) >= 4096:
+                batch = marshal.dumps((ids, values))
+                ids = []
+                values = []
+                if spool is not None:
+                    spool.write(batch)
+                    continue
+                batches.append(batch)
+                size += len(batch)
+                if size > SPOOL_SIZE:
+                    spool = tempfile.TemporaryFile()
+                    for batch in batches:
+                        spool.write(batch)
+                    batches = []
+    lncount = newlines + (last and last[-1] != '\n' or 0)
+    if batches is None:
+        return tokensource, lncount
+    if ids:
+        batch = marshal.dumps((ids, values))
+        if spool is not None:
+            spool.write(batch)
+        else:
+            batches.append(batch)
+    return _replay_tokens(batches, spool), lncount
+
+
 def _get_ttype_class(ttype):
     fname = STANDARD_TYPES.get(ttype)
     if fname:
@@ -376,13 +457,38 @@ class HtmlFormatter(Formatter):
 
         self._class_cache = {}
         self._create_stylesheet()
+        self._create_span_table()
 
     def _get_css_class(self, ttype):
         """Return the css class of this token type prefixed with
         the classprefix option."""
-        if ttype in self._class_cache:
-            return self._class_cache[ttype]
-        return self.classprefix + _get_ttype_class(ttype)
+        cls = self._class_cache.get(ttype)
+        if cls is None:
+            cls = self._class_cache[ttype] = \
+                  self.classprefix + _get_ttype_class(ttype)
+        return cls
+
+    def _get_span_open(self, ttype):
+        """Return the ``<span>`` tag opened for tokens of this type, or
+        '' if they are not styled."""
+        if self.noclasses:
+            # for <span style=""> lookup only
+            getcls = self.ttype2class.get
+            cclass = getcls(ttype)
+            while cclass is None:
+                ttype = ttype.parent
+                cclass = getcls(ttype)
+            return cclass and '<span style="%s">' % self.class2style[cclass][0] \
+                   or ''
+        cls = self._get_css_class(ttype)
+        return cls and '<span class="%s">' % cls or ''
+
+    def _create_span_table(self):
+        # span tags for all token types created so far; `_format_lines`
+        # adds the ones created later
+        get_span_open = self._get_span_open
+        self._span_table = dict([(ttype, get_span_open(ttype))
+                                 for ttype in _token_table])
 
     def _create_stylesheet(self):
         t2c = self.ttype2class = {Token: ''}
@@ -497,67 +603,74 @@ class HtmlFormatter(Formatter):
             yield t, line
         yield 0, DOC_FOOTER
 
-    def _wrap_tablelinenos(self, inner):
-        dummyoutfile = StringIO.StringIO()
-        lncount = 0
-        for t, line in inner:
-            if t:
-                lncount += 1
-            dummyoutfile.write(line)
+    def _wrap_tablelinenos(self, inner, lncount=None):
+        if lncount is None:
+            # count the lines first
+            dummyoutfile = StringIO.StringIO()
+            lncount = 0
+            for t, line in inner:
+                if t:
+                    lncount += 1
+                dummyoutfile.write(line)
+            inner = [(0, dummyoutfile.getvalue())]
 
+        # in case you wonder about the seemingly redundant <div> here: since the
+        # content in the other cell also is wrapped in a div, some browsers in
+        # some configurations seem to mess up the formatting...
+        yield 0, ('<table class="%stable">' % self.cssclass +
+                  '<tr><td class="linenos"><div class="linenodiv"><pre>')
+        for piece in self._iter_linenos(lncount):
+            yield 0, piece
+        yield 0, '</pre></div></td><td class="code">'
+        for tup in inner:
+            yield tup
+        yield 0, '</td></tr></table>'
+
+    def _iter_linenos(self, lncount):
+        """
+        Yield the contents of the line numbers cell in pieces.
+        """
         fl = self.linenostart
         mw = len(str(lncount + fl - 1))
         sp = self.linenospecial
         st = self.linenostep
         la = self.lineanchors
         aln = self.anchorlinenos
-        if sp:
-            lines = []
-
-            for i in range(fl, fl+lncount):
-                if i % st == 0:
-                    if i % sp == 0:
-                        if aln:
-                            lines.append('<a href="#%s-%d" class="special">%*d</a>' %
-                                         (la, i, mw, i))
-                        else:
-                            lines.append('<span class="special">%*d</span>' % (mw, i))
+        lines = []
+        sep = ''
+        for i in xrange(fl, fl+lncount):
+            if i % st == 0:
+                if sp and i % sp == 0:
+                    if aln:
+                        lines.append('<a href="#%s-%d" class="special">%*d</a>' %
+                                     (la, i, mw, i))
                     else:
-                        if aln:
-                            lines.append('<a href="#%s-%d">%*d</a>' % (la, i, mw, i))
-                        else:
-                            lines.append('%*d' % (mw, i))
+                        lines.append('<span class="special">%*d</span>' % (mw, i))
                 else:
-                    lines.append('')
-            ls = '\n'.join(lines)
-        else:
-            lines = []
-            for i in range(fl, fl+lncount):
-                if i % st == 0:
                     if aln:
                         lines.append('<a href="#%s-%d">%*d</a>' % (la, i, mw, i))
                     else:
                         lines.append('%*d' % (mw, i))
-                else:
-                    lines.append('')
-            ls = '\n'.join(lines)
-
-        # in case you wonder about the seemingly redundant <div> here: since the
-        # content in the other cell also is wrapped in a div, some browsers in
-        # some configurations seem to mess up the formatting...
-        yield 0, ('<table class="%stable">' % self.cssclass +
-                  '<tr><td class="linenos"><div class="linenodiv"><pre>' +
-                  ls + '</pre></div></td><td class="code">')
-        yield 0, dummyoutfile.getvalue()
-        yield 0, '</td></tr></table>'
-
-    def _wrap_inlinelinenos(self, inner):
-        # need a list of lines since we need the width of a single number :(
-        lines = list(inner)
+            else:
+                lines.append('')
+            if len(lines) >= 1000:
+                yield sep + '\n'.join(lines)
+                sep = '\n'
+                lines = []
+        if lines:
+            yield sep + '\n'.join(lines)
+
+    def _wrap_inlinelinenos(self, inner, lncount=None):
+        if lncount is None:
+            # need a list of lines since we need the width of a single
+            # number :(
+            inner = list(inner)
+            lncount = len(inner)
+        lines = inner
         sp = self.linenospecial
         st = self.linenostep
         num = self.linenostart
-        mw = len(str(len(lines) + num - 1))
+        mw = len(str(lncount + num - 1))
 
         if sp:
             for t, line in lines:
@@ -581,7 +694,7 @@ class HtmlFormatter(Formatter):
             else:
                 yield 0, line
 
-    def _wrap_div(self, inner):
+    def _get_div_start(self):
         style = []
         if (self.noclasses and not self.nobackground and
             self.style.background_color is not None):
@@ -590,13 +703,16 @@ class HtmlFormatter(Formatter):
             style.append(self.cssstyles)
         style = '; '.join(style)
 
-        yield 0, ('<div' + (self.cssclass and ' class="%s"' % self.cssclass)
-                  + (style and (' style="%s"' % style)) + '>')
+        return ('<div' + (self.cssclass and ' class="%s"' % self.cssclass)
+                + (style and (' style="%s"' % style)) + '>')
+
+    def _wrap_div(self, inner):
+        yield 0, self._get_div_start()
         for tup in inner:
             yield tup
         yield 0, '</div>\n'
 
-    def _wrap_pre(self, inner):
+    def _get_pre_start(self):
         style = []
         if self.prestyles:
             style.append(self.prestyles)
@@ -604,65 +720,109 @@ class HtmlFormatter(Formatter):
             style.append('line-height: 125%')
         style = '; '.join(style)
 
-        yield 0, ('<pre' + (style and ' style="%s"' % style) + '>')
+        return '<pre' + (style and ' style="%s"' % style) + '>'
+
+    def _wrap_pre(self, inner):
+        yield 0, self._get_pre_start()
         for tup in inner:
             yield tup
         yield 0, '</pre>'
 
+    def _wrap_fused(self, tokensource):
+        """
+        Produce the same output as the default wrapping of `_format_lines`,
+        ``self._wrap_div(self._wrap_pre(self._format_lines(tokensource)))``,
+        but with many lines per piece.
+        """
+        yield 0, self._get_div_start() + self._get_pre_start()
+        for lines in self._format_line_batches(tokensource):
+            yield 1, ''.join(lines)
+        yield 0, '</pre></div>\n'
+
+    def _has_default_lines(self):
+        # the number of lines is known in advance only if no subclass
+        # changed the line formatting and the default wrappers
+        cls = HtmlFormatter
+        return (self.wrap.im_func is cls.wrap.im_func and
+                self._format_lines.im_func is cls._format_lines.im_func and
+                self._wrap_div.im_func is cls._wrap_div.im_func and
+                self._wrap_pre.im_func is cls._wrap_pre.im_func)
+
+    def _can_fuse(self, lncount):
+        # only the default wrappers without per-line processing can be
+        # fused; table line numbers need the line count up front
+        return (not self.nowrap and not self.lineanchors and
+                not self.hl_lines and self.linenos != 2 and
+                (not self.linenos or lncount is not None) and
+                self._has_default_lines())
+
     def _format_lines(self, tokensource):
         """
         Just format the tokens, without any wrapping tags.
         Yield individual lines.
         """
-        nocls = self.noclasses
+        for lines in self._format_line_batches(tokensource):
+            for line in lines:
+                yield 1, line
+
+    def _format_line_batches(self, tokensource):
+        """
+        Format the tokens like `_format_lines`, but yield lists of lines.
+        """
         lsep = self.lineseparator
-        # for <span style=""> lookup only
-        getcls = self.ttype2class.get
-        c2s = self.class2style
+        spans = self._span_table
+        escape = escape_html
 
+        lines = []
+        # the pieces of the current line and the span open at its end
+        line = []
         lspan = ''
-        line = ''
         for ttype, value in tokensource:
-            if nocls:
-                cclass = getcls(ttype)
-                while cclass is None:
-                    ttype = ttype.parent
-                    cclass = getcls(ttype)
-                cspan = cclass and '<span style="%s">' % c2s[cclass][0] or ''
-            else:
-                cls = self._get_css_class(ttype)
-                cspan = cls and '<span class="%s">' % cls or ''
-
-            parts = escape_html(value).split('\n')
-
-            # for all but the last line
-            for part in parts[:-1]:
-                if line:
-                    if lspan != cspan:
-                        line += (lspan and '</span>') + cspan + part + \
-                                (cspan and '</span>') + lsep
-                    else: # both are the same
-                        line += part + (lspan and '</span>') + lsep
-                    yield 1, line
-                    line = ''
-                elif part:
-                    yield 1, cspan + part + (cspan and '</span>') + lsep
-                else:
-                    yield 1, lsep
+            try:
+                cspan = spans[ttype]
+            except KeyError:
+                cspan = spans[ttype] = self._get_span_open(ttype)
+            value = escape(value)
+
+            if '\n' in value:
+                parts = value.split('\n')
+                value = parts.pop()
+                # for all but the last line
+                for part in parts:
+                    if line:
+                        if lspan != cspan:
+                            line.append((lspan and '</span>') + cspan + part +
+                                        (cspan and '</span>') + lsep)
+                        else: # both are the same
+                            line.append(part + (lspan and '</span>') + lsep)
+                        lines.append(''.join(line))
+                        line = []
+                    elif part:
+                        lines.append(cspan + part + (cspan and '</span>') +
+                                     lsep)
+                    else:
+                        lines.append(lsep)
+                if len(lines) >= 1000:
+                    yield lines
+                    lines = []
+
             # for the last line
-            if line and parts[-1]:
-                if lspan != cspan:
-                    line += (lspan and '</span>') + cspan + parts[-1]
+            if value:
+                if not line:
+                    line = [cspan, value]
+                    lspan = cspan
+                elif lspan != cspan:
+                    line.append((lspan and '</span>') + cspan + value)
                     lspan = cspan
                 else:
-                    line += parts[-1]
-            elif parts[-1]:
-                line = cspan + parts[-1]
-                lspan = cspan
+                    line.append(value)
             # else we neither have to open a new span nor set lspan
 
         if line:
-            yield 1, line + (lspan and '</span>') + lsep
+            line.append((lspan and '</span>') + lsep)
+            lines.append(''.join(line))
+        if lines:
+            yield lines
 
     def _highlight_lines(self, tokensource):
         """
@@ -708,17 +868,27 @@ class HtmlFormatter(Formatter):
         use several different wrappers that process the original source
         linewise, e.g. line number generators.
         """
-        source = self._format_lines(tokensource)
-        if self.hl_lines:
-            source = self._highlight_lines(source)
+        lncount = None
+        if self.linenos and not self.nowrap and self._has_default_lines():
+            # count the lines in a first pass, so that line numbers can be
+            # written without keeping the formatted code in memory
+            tokensource, lncount = _count_lines(tokensource)
+
+        if self._can_fuse(lncount):
+            source = self._wrap_fused(tokensource)
+        else:
+            source = self._format_lines(tokensource)
+            if self.hl_lines:
+                source = self._highlight_lines(source)
+            if not self.nowrap:
+                if self.linenos == 2:
+                    source = self._wrap_inlinelinenos(source, lncount)
+                if self.lineanchors:
+                    source = self._wrap_lineanchors(source)
+                source = self.wrap(source, outfile)
         if not self.nowrap:
-            if self.linenos == 2:
-                source = self._wrap_inlinelinenos(source)
-            if self.lineanchors:
-                source = self._wrap_lineanchors(source)
-            source = self.wrap(source, outfile)
             if self.linenos == 1:
-                source = self._wrap_tablelinenos(source)
+                source = self._wrap_tablelinenos(source, lncount)
             if self.full:
                 source = self._wrap_full(source, outfile)
 
@@ -331,6 +331,7 @@ class ImageFormatter(Formatter):
         self.hl_color = options.get('hl_color',
                                     self.style.highlight_color) or '#f90'
         self.drawables = []
+        self._text_widths = {}
 
     def get_style_defs(self, arg=''):
         raise NotImplementedError('The -S option is meaningless for the image '
@@ -413,39 +414,104 @@ class ImageFormatter(Formatter):
         """
         self.drawables.append((pos, text, font, kw))
 
+    def _get_text_width(self, font, text):
+        """
+        Get the width of ``text`` drawn in ``font``, caching the result.
+        """
+        key = (font, text)
+        try:
+            return self._text_widths[key]
+        except KeyError:
+            if len(self._text_widths) > 10000:
+                self._text_widths.clear()
+            width = self._text_widths[key] = font.getsize(text)[0]
+            return width
+
+    def _can_join(self, font, left, right):
+        """
+        Check if the fragment ``right`` can be added to a run ending with
+        the fragment ``left``, i.e. if drawing them in one go puts the
+        characters of ``right`` at the same positions as drawing it in the
+        character cell after ``left``.  That is the case if both fill
+        exactly their cells and there is no kerning between the last
+        character of ``left`` and the first of ``right``.  Only the
+        fragments and that pair are measured, never the whole run.
+        """
+        fontw = self.fontw
+        width = self._get_text_width
+        return (width(font, left) == len(left) * fontw and
+                width(font, right) == len(right) * fontw and
+                width(font, left[-1] + right[0]) == 2 * fontw)
+
     def _create_drawables(self, tokensource):
         """
-        Create drawables for the token content.
+        Create drawables for the token content.  Adjacent fragments of a
+        line with the same font and color are drawn as a single run if
+        that gives the same pixels (see `_can_join`).  Italic fragments are
+        never joined, since their glyphs may overhang into the next cell.
         """
+        styles = self.styles
+        # ttype -> (font, fill, joinable)
+        drawstyles = {}
         lineno = charno = maxcharno = 0
+        # the text of the current run, its last fragment, its start and
+        # drawing style
+        run = last = ''
+        runstart = 0
+        runstyle = None
         for ttype, value in tokensource:
-            while ttype not in self.styles:
-                ttype = ttype.parent
-            style = self.styles[ttype]
+            try:
+                drawstyle = drawstyles[ttype]
+            except KeyError:
+                stype = ttype
+                while stype not in styles:
+                    stype = stype.parent
+                style = styles[stype]
+                drawstyle = drawstyles[ttype] = (
+                    self._get_style_font(style), self._get_text_color(style),
+                    not style['italic'])
             # TODO: make sure tab expansion happens earlier in the chain.  It
             # really ought to be done on the input, as to do it right here is
             # quite complex.
-            value = value.expandtabs(4)
-            lines = value.splitlines(True)
-            #print lines
-            for i, line in enumerate(lines):
+            if '\t' in value:
+                value = value.expandtabs(4)
+            for line in value.splitlines(True):
                 temp = line.rstrip('\n')
                 if temp:
-                    self._draw_text(
-                        self._get_text_pos(charno, lineno),
-                        temp,
-                        font = self._get_style_font(style),
-                        fill = self._get_text_color(style)
-                    )
+                    if not (run and drawstyle == runstyle and drawstyle[2] and
+                            self._can_join(drawstyle[0], last, temp)):
+                        if run:
+                            self._draw_run(runstart, lineno, run, runstyle)
+                        run = ''
+                        runstart = charno
+                        runstyle = drawstyle
+                    run += temp
+                    last = temp
                     charno += len(temp)
                     maxcharno = max(maxcharno, charno)
                 if line.endswith('\n'):
                     # add a line for each extra line in the value
+                    if run:
+                        self._draw_run(runstart, lineno, run, runstyle)
+                        run = ''
                     charno = 0
                     lineno += 1
+        if run:
+            self._draw_run(runstart, lineno, run, runstyle)
         self.maxcharno = maxcharno
         self.maxlineno = lineno
 
+    def _draw_run(self, charno, lineno, text, drawstyle):
+        """
+        Remember a drawable for the text of a run starting at ``charno``.
+        """
+        self._draw_text(
+            self._get_text_pos(charno, lineno),
+            text,
+            font = drawstyle[0],
+            fill = drawstyle[1]
+        )
+
     def _draw_line_numbers(self):
         """
         Create drawables for the line numbers.
@@ -500,8 +566,9 @@ class ImageFormatter(Formatter):
                 y = self._get_line_y(linenumber - 1)
                 draw.rectangle([(x, y), (x + rectw, y + recth)],
                                fill=self.hl_color)
+        text = draw.text
         for pos, value, font, kw in self.drawables:
-            draw.text(pos, value, font=font, **kw)
+            text(pos, value, font=font, **kw)
         im.save(outfile, self.image_format.upper())
 
 
@@ -11,23 +11,30 @@
 
 from pygments.formatter import Formatter
 from pygments.token import Token, STANDARD_TYPES
-from pygments.util import get_bool_opt, get_int_opt, StringIO
+from pygments.util import get_bool_opt, get_int_opt, StringIO, make_escaper
 
 
 __all__ = ['LatexFormatter']
 
 
+_tex_escapers = {}
+
+def _get_tex_escaper(commandprefix):
+    try:
+        return _tex_escapers[commandprefix]
+    except KeyError:
+        escape = _tex_escapers[commandprefix] = make_escaper({
+            '\\': r'\%sZbs{}' % commandprefix,
+            '{':  r'\%sZob{}' % commandprefix,
+            '}':  r'\%sZcb{}' % commandprefix,
+            '^':  r'\%sZca{}' % commandprefix,
+            '_':  r'\%sZus{}' % commandprefix,
+        })
+        return escape
+
+
 def escape_tex(text, commandprefix):
-    return text.replace('\\', '\x00'). \
-                replace('{', '\x01'). \
-                replace('}', '\x02'). \
-                replace('^', '\x03'). \
-                replace('_', '\x04'). \
-                replace('\x00', r'\%sZbs{}' % commandprefix). \
-                replace('\x01', r'\%sZob{}' % commandprefix). \
-                replace('\x02', r'\%sZcb{}' % commandprefix). \
-                replace('\x03', r'\%sZca{}' % commandprefix). \
-                replace('\x04', r'\%sZus{}' % commandprefix)
+    return _get_tex_escaper(commandprefix)(text)
 
 
 DOC_TEMPLATE = r'''
@@ -294,6 +301,7 @@ class LatexFormatter(Formatter):
             outfile.write(',' + self.verboptions)
         outfile.write(']\n')
 
+        escape = _get_tex_escaper(self.commandprefix)
         for ttype, value in tokensource:
             if ttype in Token.Comment:
                 if self.texcomments:
@@ -305,7 +313,7 @@ class LatexFormatter(Formatter):
                         start += value[i]
 
                     value = value[len(start):]
-                    start = escape_tex(start, self.commandprefix)
+                    start = escape(start)
 
                     # ... but do not escape inside comment.
                     value = start + value
@@ -315,13 +323,13 @@ class LatexFormatter(Formatter):
                     in_math = False
                     for i, part in enumerate(parts):
                         if not in_math:
-                            parts[i] = escape_tex(part, self.commandprefix)
+                            parts[i] = escape(part)
                         in_math = not in_math
                     value = '$'.join(parts)
                 else:
-                    value = escape_tex(value, self.commandprefix)
+                    value = escape(value)
             else:
-                value = escape_tex(value, self.commandprefix)
+                value = escape(value)
             styles = []
             while ttype is not Token:
                 try:
@@ -10,8 +10,10 @@
 """
 
 from pygments.formatter import Formatter
-from pygments.util import OptionError, get_choice_opt, b
+from pygments.util import OptionError, get_choice_opt, get_bool_opt, b, \
+     RAW_TOKEN_MAGIC, RAW_TOKEN_VERSION, encode_varint
 from pygments.token import Token
+from pygments.tokenbuffer import TokenBuffer
 from pygments.console import colorize
 
 __all__ = ['NullFormatter', 'RawTokenFormatter']
@@ -27,6 +29,13 @@ class NullFormatter(Formatter):
 
     def format(self, tokensource, outfile):
         enc = self.encoding
+        if isinstance(tokensource, TokenBuffer):
+            # write the shared text in one go
+            value = tokensource.getvalue()
+            if enc:
+                value = value.encode(enc)
+            outfile.write(value)
+            return
         for ttype, value in tokensource:
             if enc:
                 outfile.write(value.encode(enc))
@@ -42,15 +51,24 @@ class RawTokenFormatter(Formatter):
     be converted to a token stream with the `RawTokenLexer`, described in the
     `lexer list <lexers.txt>`_.
 
-    Only two options are accepted:
+    With the `binary` option, a compact binary format is written instead.
+    It starts with a magic string and a format version byte, followed by
+    records of two varints and a UTF-8 payload: a record with type number
+    ``0`` defines the next token type number by giving its name, all other
+    records are tokens of the given type whose value is the payload.  The
+    `RawTokenLexer` recognizes both formats.
+
+    Options accepted:
 
+    `binary`
+        If true, write the binary format (default: ``False``).
     `compress`
         If set to ``'gz'`` or ``'bz2'``, compress the output with the given
         compression algorithm after encoding (default: ``''``).
     `error_color`
         If set to a color name, highlight error tokens using that color.  If
         set but with no value, defaults to ``'red'``.
-        *New in Pygments 0.11.*
+        *New in Pygments 0.11.*  Not supported with the binary format.
 
     """
     name = 'Raw tokens'
@@ -70,6 +88,10 @@ class RawTokenFormatter(Formatter):
         self.error_color = options.get('error_color', None)
         if self.error_color is True:
             self.error_color = 'red'
+        self.binary = get_bool_opt(options, 'binary', False)
+        if self.binary and self.error_color is not None:
+            raise OptionError('the binary raw token format does not '
+                              'support the error_color option')
         if self.error_color is not None:
             try:
                 colorize(self.error_color, '')
@@ -86,22 +108,28 @@ class RawTokenFormatter(Formatter):
         if self.compress == 'gz':
             import gzip
             outfile = gzip.GzipFile('', 'wb', 9, outfile)
-            def write(text):
-                outfile.write(text.encode())
+            write_bytes = outfile.write
             flush = outfile.flush
         elif self.compress == 'bz2':
             import bz2
             compressor = bz2.BZ2Compressor(9)
-            def write(text):
-                outfile.write(compressor.compress(text.encode()))
+            def write_bytes(data):
+                outfile.write(compressor.compress(data))
             def flush():
                 outfile.write(compressor.flush())
                 outfile.flush()
         else:
-            def write(text):
-                outfile.write(text.encode())
+            write_bytes = outfile.write
             flush = outfile.flush
 
+        if self.binary:
+            self._format_binary(tokensource, write_bytes)
+            flush()
+            return
+
+        def write(text):
+            write_bytes(text.encode())
+
         lasttype = None
         lastval = u''
         if self.error_color:
@@ -115,3 +143,26 @@ class RawTokenFormatter(Formatter):
             for ttype, value in tokensource:
                 write("%s\t%r\n" % (ttype, value))
         flush()
+
+    def _format_binary(self, tokensource, write):
+        write(RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION))
+        typenums = {}
+        buf = []
+        append = buf.append
+        for ttype, value in tokensource:
+            try:
+                num = typenums[ttype]
+            except KeyError:
+                num = typenums[ttype] = len(typenums) + 1
+                name = str(ttype)
+                append('\x00' + encode_varint(len(name)) + name)
+            data = value.encode('utf-8')
+            length = len(data)
+            if num < 0x80 and length < 0x80:
+                append(chr(num) + chr(length) + data)
+            else:
+                append(encode_varint(num) + encode_varint(length) + data)
+            if len(buf) > 1024:
+                write(''.join(buf))
+                del buf[:]
+        write(''.join(buf))
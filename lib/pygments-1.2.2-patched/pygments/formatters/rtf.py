@@ -10,11 +10,45 @@
 """
 
 from pygments.formatter import Formatter
+from pygments.util import make_escaper
 
 
 __all__ = ['RtfFormatter']
 
 
+class _TextEscapes(dict):
+    """
+    Replacements for `RtfFormatter._escape_text`.  Characters outside
+    ASCII are looked up on demand in the ANSI `encoding`.
+    """
+
+    def __init__(self, encoding):
+        dict.__init__(self, {'\\': '\\\\', '{': '\\{', '}': '\\}',
+                             '\n': '\\par\n'})
+        self.encoding = encoding
+
+    def __missing__(self, c):
+        ansic = c.encode(self.encoding, 'ignore') or '?'
+        if ord(ansic) > 127:
+            ansic = '\\\'%x' % ord(ansic)
+        else:
+            ansic = c
+        result = self[c] = r'\ud{\u%d%s}' % (ord(c), ansic)
+        return result
+
+
+_escape = make_escaper({'\\': '\\\\', '{': '\\{', '}': '\\}'})
+_text_escapers = {}
+
+def _get_text_escaper(encoding):
+    try:
+        return _text_escapers[encoding]
+    except KeyError:
+        escape = _text_escapers[encoding] = make_escaper(
+            _TextEscapes(encoding), u'[\\\\{}\n]|[^\x00-\x7f]')
+        return escape
+
+
 class RtfFormatter(Formatter):
     """
     Format tokens as RTF markup. This formatter automatically outputs full RTF
@@ -54,35 +88,24 @@ class RtfFormatter(Formatter):
         self.fontface = options.get('fontface') or ''
 
     def _escape(self, text):
-        return text.replace('\\', '\\\\') \
-                   .replace('{', '\\{') \
-                   .replace('}', '\\}')
+        return _escape(text)
 
     def _escape_text(self, text):
         # empty strings, should give a small performance improvment
         if not text:
             return ''
 
-        # escape text
-        text = self._escape(text)
         if self.encoding in ('utf-8', 'utf-16', 'utf-32'):
             encoding = 'iso-8859-15'
         else:
             encoding = self.encoding or 'iso-8859-15'
-
-        buf = []
-        for c in text:
-            if ord(c) > 128:
-                ansic = c.encode(encoding, 'ignore') or '?'
-                if ord(ansic) > 128:
-                    ansic = '\\\'%x' % ord(ansic)
-                else:
-                    ansic = c
-                buf.append(r'\ud{\u%d%s}' % (ord(c), ansic))
-            else:
-                buf.append(str(c))
-
-        return ''.join(buf).replace('\n', '\\par\n')
+        text = _get_text_escaper(encoding)(text)
+        try:
+            # the result only has non-ASCII characters if the encoding has
+            # no representation for them
+            return str(text)
+        except UnicodeError:
+            return text
 
     def format_unencoded(self, tokensource, outfile):
         # rtf 1.8 header
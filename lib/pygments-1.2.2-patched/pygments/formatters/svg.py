@@ -10,20 +10,11 @@
 """
 
 from pygments.formatter import Formatter
-from pygments.util import get_bool_opt, get_int_opt
+from pygments.util import get_bool_opt, get_int_opt, escape_html
 
 __all__ = ['SvgFormatter']
 
 
-def escape_html(text):
-    """Escape &, <, > as well as single and double quotes for HTML."""
-    return text.replace('&', '&amp;').  \
-                replace('<', '&lt;').   \
-                replace('>', '&gt;').   \
-                replace('"', '&quot;'). \
-                replace("'", '&#39;')
-
-
 class2style = {}
 
 class SvgFormatter(Formatter):
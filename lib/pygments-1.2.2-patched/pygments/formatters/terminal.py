@@ -94,7 +94,7 @@ class TerminalFormatter(Formatter):
         for ttype, value in tokensource:
             color = self.colorscheme.get(ttype)
             while color is None:
-                ttype = ttype[:-1]
+                ttype = ttype.parent
                 color = self.colorscheme.get(ttype)
             if color:
                 color = color[self.darkbg]
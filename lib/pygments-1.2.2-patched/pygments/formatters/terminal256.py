@@ -30,6 +30,110 @@ from pygments.formatter import Formatter
 __all__ = ['Terminal256Formatter']
 
 
+# the xterm palette as a tuple, built by `_get_xterm_colors`
+_xterm_colors = None
+# (r >> 4, g >> 4, b >> 4) -> indices of the palette colors that can be
+# closest to a color in that cell
+_color_cells = {}
+# (formatter class, style, usebold, useunderline) ->
+# (best_match, style_string, resolved)
+_setup_cache = {}
+
+
+def _get_xterm_colors():
+    """
+    Return the RGB values of the xterm colors 0..253.
+    """
+    global _xterm_colors
+    if _xterm_colors is None:
+        colors = [
+            # colors 0..15: 16 basic colors
+            (0x00, 0x00, 0x00), (0xcd, 0x00, 0x00), (0x00, 0xcd, 0x00),
+            (0xcd, 0xcd, 0x00), (0x00, 0x00, 0xee), (0xcd, 0x00, 0xcd),
+            (0x00, 0xcd, 0xcd), (0xe5, 0xe5, 0xe5), (0x7f, 0x7f, 0x7f),
+            (0xff, 0x00, 0x00), (0x00, 0xff, 0x00), (0xff, 0xff, 0x00),
+            (0x5c, 0x5c, 0xff), (0xff, 0x00, 0xff), (0x00, 0xff, 0xff),
+            (0xff, 0xff, 0xff),
+        ]
+
+        # colors 16..232: the 6x6x6 color cube
+
+        valuerange = (0x00, 0x5f, 0x87, 0xaf, 0xd7, 0xff)
+
+        for i in range(217):
+            r = valuerange[(i // 36) % 6]
+            g = valuerange[(i // 6) % 6]
+            b = valuerange[i % 6]
+            colors.append((r, g, b))
+
+        # colors 233..253: grayscale
+
+        for i in range(1, 22):
+            v = 8 + i * 10
+            colors.append((v, v, v))
+        _xterm_colors = tuple(colors)
+    return _xterm_colors
+
+
+def _axis_distances(value, low, high):
+    # smallest and largest distance of value to a point in [low, high]
+    if value < low:
+        near = low - value
+    elif value > high:
+        near = value - high
+    else:
+        near = 0
+    far = max(value - low, high - value)
+    return near * near, far * far
+
+
+def _get_cell_candidates(cell):
+    """
+    Return the indices of the palette colors that can be closest to some
+    color in the 16x16x16 cube `cell` of the RGB space.  A color qualifies
+    if its smallest distance to the cube is not larger than the largest
+    distance of some other color to the cube.
+    """
+    bounds = [(c << 4, (c << 4) + 15) for c in cell]
+    limits = []
+    for values in _get_xterm_colors():
+        near = far = 0
+        for value, (low, high) in zip(values, bounds):
+            n, f = _axis_distances(value, low, high)
+            near += n
+            far += f
+        limits.append((near, far))
+    best = min([far for near, far in limits])
+    candidates = [i for i, (near, far) in enumerate(limits) if near <= best]
+    _color_cells[cell] = candidates
+    return candidates
+
+
+def _closest_xterm_color(r, g, b):
+    """
+    Return the index of the xterm color closest to (r, g, b), and the
+    first of them if several are equally close.
+    """
+    cell = (r >> 4, g >> 4, b >> 4)
+    try:
+        candidates = _color_cells[cell]
+    except KeyError:
+        candidates = _get_cell_candidates(cell)
+    colors = _xterm_colors
+    distance = 257*257*3
+    match = 0
+    for i in candidates:
+        values = colors[i]
+        rd = r - values[0]
+        gd = g - values[1]
+        bd = b - values[2]
+        d = rd*rd + gd*gd + bd*bd
+        if d < distance:
+            match = i
+            distance = d
+    return match
+
+
 class EscapeSequence:
     def __init__(self, fg=None, bg=None, bold=False, underline=False):
         self.fg = fg
@@ -97,45 +201,32 @@ class Terminal256Formatter(Formatter):
         self.useunderline = 'nounderline' not in options
 
         self._build_color_table() # build an RGB-to-256 color conversion table
-        self._setup_styles() # convert selected style's colors to term. colors
-
-    def _build_color_table(self):
-        # colors 0..15: 16 basic colors
-
-        self.xterm_colors.append((0x00, 0x00, 0x00)) # 0
-        self.xterm_colors.append((0xcd, 0x00, 0x00)) # 1
-        self.xterm_colors.append((0x00, 0xcd, 0x00)) # 2
-        self.xterm_colors.append((0xcd, 0xcd, 0x00)) # 3
-        self.xterm_colors.append((0x00, 0x00, 0xee)) # 4
-        self.xterm_colors.append((0xcd, 0x00, 0xcd)) # 5
-        self.xterm_colors.append((0x00, 0xcd, 0xcd)) # 6
-        self.xterm_colors.append((0xe5, 0xe5, 0xe5)) # 7
-        self.xterm_colors.append((0x7f, 0x7f, 0x7f)) # 8
-        self.xterm_colors.append((0xff, 0x00, 0x00)) # 9
-        self.xterm_colors.append((0x00, 0xff, 0x00)) # 10
-        self.xterm_colors.append((0xff, 0xff, 0x00)) # 11
-        self.xterm_colors.append((0x5c, 0x5c, 0xff)) # 12
-        self.xterm_colors.append((0xff, 0x00, 0xff)) # 13
-        self.xterm_colors.append((0x00, 0xff, 0xff)) # 14
-        self.xterm_colors.append((0xff, 0xff, 0xff)) # 15
-
-        # colors 16..232: the 6x6x6 color cube
 
-        valuerange = (0x00, 0x5f, 0x87, 0xaf, 0xd7, 0xff)
+        # the escape sequences only depend on these, so they are computed
+        # once per process
+        key = (self.__class__, self.style, self.usebold, self.useunderline)
+        try:
+            best_match, style_string, self._resolved = _setup_cache[key]
+            self.best_match = best_match.copy()
+            self.style_string = style_string.copy()
+        except KeyError:
+            self._setup_styles() # convert selected style's colors to term. colors
+            self._resolved = {}
+            if len(_setup_cache) >= 100:
+                _setup_cache.clear()
+            _setup_cache[key] = (self.best_match.copy(),
+                                 self.style_string.copy(), self._resolved)
 
-        for i in range(217):
-            r = valuerange[(i // 36) % 6]
-            g = valuerange[(i // 6) % 6]
-            b = valuerange[i % 6]
-            self.xterm_colors.append((r, g, b))
-
-        # colors 233..253: grayscale
-
-        for i in range(1, 22):
-            v = 8 + i * 10
-            self.xterm_colors.append((v, v, v))
+    def _build_color_table(self):
+        # a copy, so that subclasses can change it
+        self.xterm_colors = list(_get_xterm_colors())
 
     def _closest_color(self, r, g, b):
+        if tuple(self.xterm_colors) == _get_xterm_colors():
+            # the unchanged palette: look at the colors that can be
+            # closest only
+            return _closest_xterm_color(r, g, b)
+
         distance = 257*257*3 # "infinity" (>distance from #000000 to #ffffff)
         match = 0
 
@@ -189,31 +280,34 @@ class Terminal256Formatter(Formatter):
             self.encoding = outfile.encoding
         return Formatter.format(self, tokensource, outfile)
 
+    def _resolve_style(self, ttype):
+        """
+        Return the ``(on, off)`` escape sequences for `ttype`, or None if
+        it has no style.
+        """
+        # only the type itself is looked up: walking up with ttype[:-1]
+        # gave plain tuples, whose str() never matches a key
+        return self.style_string.get(str(ttype))
+
     def format_unencoded(self, tokensource, outfile):
+        # ttype -> (on, off) or None, shared by equally set up instances
+        resolved = self._resolved
         for ttype, value in tokensource:
-            not_found = True
-            while ttype and not_found:
-                try:
-                    #outfile.write( "<" + str(ttype) + ">" )
-                    on, off = self.style_string[str(ttype)]
-
-                    # Like TerminalFormatter, add "reset colors" escape sequence
-                    # on newline.
-                    spl = value.split('\n')
-                    for line in spl[:-1]:
-                        if line:
-                            outfile.write(on + line + off)
-                        outfile.write('\n')
-                    if spl[-1]:
-                        outfile.write(on + spl[-1] + off)
-
-                    not_found = False
-                    #outfile.write( '#' + str(ttype) + '#' )
-
-                except KeyError:
-                    #ottype = ttype
-                    ttype = ttype[:-1]
-                    #outfile.write( '!' + str(ottype) + '->' + str(ttype) + '!' )
-
-            if not_found:
+            try:
+                codes = resolved[ttype]
+            except KeyError:
+                codes = resolved[ttype] = self._resolve_style(ttype)
+            if codes is None:
                 outfile.write(value)
+                continue
+            on, off = codes
+
+            # Like TerminalFormatter, add "reset colors" escape sequence
+            # on newline.
+            spl = value.split('\n')
+            for line in spl[:-1]:
+                if line:
+                    outfile.write(on + line + off)
+                outfile.write('\n')
+            if spl[-1]:
+                outfile.write(on + spl[-1] + off)
@@ -9,6 +9,9 @@
     :license: BSD, see LICENSE for details.
 """
 import re
+from array import array
+from bisect import bisect_right
+from itertools import chain, izip
 
 try:
     set
@@ -18,16 +21,40 @@ except NameError:
 from pygments.filter import apply_filters, Filter
 from pygments.filters import get_filter_by_name
 from pygments.token import Error, Text, Other, _TokenType
+from pygments.tokenbuffer import TokenBuffer
 from pygments.util import get_bool_opt, get_int_opt, get_list_opt, \
      make_analysator
 
 
 __all__ = ['Lexer', 'RegexLexer', 'ExtendedRegexLexer', 'DelegatingLexer',
-           'LexerContext', 'include', 'flags', 'bygroups', 'using', 'this']
+           'LexerContext', 'OffsetMap', 'include', 'flags', 'bygroups',
+           'using', 'this']
 
 
 _default_analyse = staticmethod(lambda x: 0.0)
 
+_crlf_re = re.compile('\r\n')
+_tab_re = re.compile('\t')
+
+#: The `pygments.lexercache.TokenTableCache` used when processing the
+#: token definitions of `RegexLexer` subclasses, if any.
+token_table_cache = None
+
+# limit of offset map segments that map offsets one to one
+_NO_LIMIT = 0x7fffffff
+
+# number of characters before the end of a window of get_tokens_windowed()
+# that are always lexed again with the next window
+_WINDOW_MARGIN = 4096
+
+# number of characters get_tokens_windowed() holds back at most before it
+# cuts the text at a position that may change the tokens
+_WINDOW_LIMIT = 1 << 20
+
+# markers around the tokens of a callback in the window state machine
+_MATCH_START = object()
+_MATCH_END = object()
+
 
 class LexerMeta(type):
     """
@@ -127,36 +154,7 @@ class Lexer(object):
         Also preprocess the text, i.e. expand tabs and strip it if
         wanted and applies registered filters.
         """
-        if not isinstance(text, unicode):
-            if self.encoding == 'guess':
-                try:
-                    text = text.decode('utf-8')
-                    if text.startswith(u'\ufeff'):
-                        text = text[len(u'\ufeff'):]
-                except UnicodeDecodeError:
-                    text = text.decode('latin1')
-            elif self.encoding == 'chardet':
-                try:
-                    import chardet
-                except ImportError:
-                    raise ImportError('To enable chardet encoding guessing, '
-                                      'please install the chardet library '
-                                      'from http://chardet.feedparser.org/')
-                enc = chardet.detect(text)
-                text = text.decode(enc['encoding'])
-            else:
-                text = text.decode(self.encoding)
-        # text now *is* a unicode string
-        text = text.replace('\r\n', '\n')
-        text = text.replace('\r', '\n')
-        if self.stripall:
-            text = text.strip()
-        elif self.stripnl:
-            text = text.strip('\n')
-        if self.tabsize > 0:
-            text = text.expandtabs(self.tabsize)
-        if not text.endswith('\n'):
-            text += '\n'
+        text = self._preprocess_text(text)
 
         def streamer():
             for i, t, v in self.get_tokens_unprocessed(text):
@@ -166,6 +164,225 @@ class Lexer(object):
             stream = apply_filters(stream, self.filters, self)
         return stream
 
+    def get_tokens_windowed(self, windows, unfiltered=False):
+        """
+        Like `get_tokens`, but lex the text given as an iterable of
+        `windows`, each of which must end at a line boundary.
+
+        Lexers that can resume lexing in a given state, i.e. `RegexLexer`
+        subclasses that use its state machine unchanged and the
+        `TextLexer`, lex the text window by window: the tokens up to the
+        last line of a window that is safe to cut at are emitted, and the
+        rest of the window is lexed again with the next one, starting in
+        the state the lexer was in at the cut.  The tokens are the same as
+        from `get_tokens`, and about one window is held in memory.  Only
+        if a single construct spans more than `_WINDOW_LIMIT` characters,
+        the text is cut anyway and a `RuntimeWarning` is issued.  Other
+        lexers, e.g. `ExtendedRegexLexer` and `DelegatingLexer`
+        subclasses, get the joined text of all windows.
+
+        Byte strings are decoded with the encoding chosen for the first
+        window; if that was guessed, bytes that later windows cannot be
+        decoded with are replaced.
+        """
+        if not self._can_stream():
+            # the lexer needs to see the whole text
+            return self.get_tokens(''.join(windows), unfiltered)
+
+        def streamer():
+            encoding = None
+            first = True
+            # the text to lex again, preceded by the end of the line before
+            # it after the first cut, and the lexer state to lex it in
+            pending = u''
+            start = 0
+            state = None
+            window = None
+            for next_window in windows:
+                if window is not None:
+                    text, encoding = self._preprocess_window(
+                        pending, window, encoding, first, False)
+                    first = first and not text
+                    tokens, cut, state = self._lex_window(
+                        text, start, len(pending), state, False)
+                    for i, t, v in tokens:
+                        yield t, v
+                    if cut:
+                        pending = text[cut - 1:]
+                        start = 1
+                    else:
+                        pending = text
+                window = next_window
+            text, encoding = self._preprocess_window(
+                pending, window or '', encoding, first, True)
+            tokens, cut, state = self._lex_window(text, start, len(pending),
+                                                  state, True)
+            for i, t, v in tokens:
+                yield t, v
+        stream = streamer()
+        if not unfiltered:
+            stream = apply_filters(stream, self.filters, self)
+        return stream
+
+    def get_token_buffer(self, text, unfiltered=False):
+        """
+        Return a `TokenBuffer` holding the tokens generated from `text`.
+
+        The text is preprocessed and filtered like in `get_tokens`.  The
+        buffer shares the preprocessed text instead of storing a string
+        for every token, which makes it suitable for caching.
+        """
+        if self.get_tokens.im_func is not Lexer.get_tokens.im_func:
+            # the lexer does its own preprocessing; no text to share
+            buf = TokenBuffer(u'')
+            buf.extend(self.get_tokens(text))
+            return buf
+        text = self._preprocess_text(text)
+        buf = TokenBuffer(text)
+        self._fill_token_buffer(buf, text)
+        if not unfiltered and self.filters:
+            filtered = TokenBuffer(text)
+            filtered.extend(apply_filters(buf, self.filters, self))
+            buf = filtered
+        return buf
+
+    def _fill_token_buffer(self, buf, text):
+        buf.extend_unprocessed(self.get_tokens_unprocessed(text))
+
+    def get_offset_map(self, text):
+        """
+        Return an `OffsetMap` that maps offsets in the text lexed by
+        `get_tokens` for `text` back to offsets in `text`.  For byte
+        strings, the offsets refer to the decoded text.
+        """
+        offsets = OffsetMap()
+        self._preprocess_text(text, offsets)
+        return offsets
+
+    def _decode_text(self, text):
+        if not isinstance(text, unicode):
+            text = self._decode_bytes(text)[0]
+        return text
+
+    def _decode_bytes(self, text):
+        """
+        Decode the byte string `text` as given by the ``encoding`` option
+        and return the text and the name of the encoding used.
+        """
+        if self.encoding == 'guess':
+            try:
+                text = text.decode('utf-8')
+            except UnicodeDecodeError:
+                return text.decode('latin1'), 'latin1'
+            if text.startswith(u'\ufeff'):
+                text = text[len(u'\ufeff'):]
+            return text, 'utf-8'
+        elif self.encoding == 'chardet':
+            try:
+                import chardet
+            except ImportError:
+                raise ImportError('To enable chardet encoding guessing, '
+                                  'please install the chardet library '
+                                  'from http://chardet.feedparser.org/')
+            enc = chardet.detect(text)['encoding']
+            return text.decode(enc), enc
+        return text.decode(self.encoding), self.encoding
+
+    def _preprocess_text(self, text, offsets=None):
+        """
+        Decode `text` and normalize it for lexing.  If the text needs no
+        normalization, it is returned unchanged instead of being copied.
+        If an `OffsetMap` is given as `offsets`, record all changes in it.
+        """
+        text = self._decode_text(text)
+        # text now *is* a unicode string
+        if '\r' in text:
+            if offsets is not None:
+                offsets._add_newlines(text)
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        # stripping and adding the final newline in one step
+        if self.stripall:
+            if text[-1:] != '\n' or text[:1].isspace() or \
+               text[-2:-1].isspace():
+                if offsets is not None:
+                    offsets._add_shift(len(text) - len(text.lstrip()))
+                text = text.strip() + '\n'
+        elif self.stripnl:
+            if text[-1:] != '\n' or text[:1] == '\n' or text[-2:-1] == '\n':
+                if offsets is not None:
+                    offsets._add_shift(len(text) - len(text.lstrip('\n')))
+                text = text.strip('\n') + '\n'
+        elif text[-1:] != '\n':
+            text += '\n'
+        if self.tabsize > 0 and '\t' in text:
+            if offsets is not None:
+                offsets._add_tabs(text, self.tabsize)
+            text = text.expandtabs(self.tabsize)
+        return text
+
+    def _preprocess_window(self, pending, window, encoding, first, last):
+        """
+        Decode and normalize `window` for `get_tokens_windowed` and append
+        it to the text `pending`.  Return the text and the encoding used,
+        which is determined from the window if `encoding` is None.
+        """
+        if not isinstance(window, unicode):
+            if encoding is None:
+                window, encoding = self._decode_bytes(window)
+            elif self.encoding in ('guess', 'chardet'):
+                window = window.decode(encoding, 'replace')
+            else:
+                window = window.decode(encoding)
+        if '\r' in window:
+            window = window.replace('\r\n', '\n').replace('\r', '\n')
+        if self.tabsize > 0 and '\t' in window:
+            window = window.expandtabs(self.tabsize)
+        text = pending + window
+        if self.stripall:
+            if first:
+                text = text.lstrip()
+            if last:
+                text = text.rstrip()
+        elif self.stripnl:
+            if first:
+                text = text.lstrip('\n')
+            if last:
+                text = text.rstrip('\n')
+        if last and text[-1:] != '\n':
+            text += '\n'
+        return text, encoding
+
+    def _window_end(self, text, last):
+        """
+        Return the position up to which `text` can be lexed for good in a
+        window of `get_tokens_windowed`; trailing blank lines must wait for
+        the stripping of the last window.
+        """
+        if last:
+            return len(text)
+        if self.stripall:
+            return len(text.rstrip())
+        if self.stripnl:
+            return len(text.rstrip('\n'))
+        return len(text)
+
+    def _can_stream(self):
+        """
+        Return True if the lexer implements `_lex_window`.
+        """
+        return False
+
+    def _lex_window(self, text, start, carried, state, last):
+        """
+        Lex a window of `get_tokens_windowed` from `start` in the lexer
+        state `state` (None for the first window); the first `carried`
+        characters of `text` were left over from the previous window.
+        Return the tokens, the position up to which the text is lexed for
+        good, and the state at that position.  The rest is lexed again
+        with the next window.
+        """
+        raise NotImplementedError
+
     def get_tokens_unprocessed(self, text):
         """
         Return an iterable of (tokentype, value) pairs.
@@ -175,6 +392,65 @@ class Lexer(object):
         raise NotImplementedError
 
 
+class OffsetMap(object):
+    """
+    Maps offsets in preprocessed text back to the text given to the
+    lexer.  Call the map with an offset to translate it.
+
+    Each preprocessing step that changed the text is recorded as a
+    piecewise mapping: a sorted list of segment starts, the offset each
+    segment maps to, and how far it may advance (``0`` for characters
+    collapsed into one, like the spaces of an expanded tab).
+    """
+
+    def __init__(self):
+        self._steps = []
+
+    def __call__(self, offset):
+        for starts, targets, limits in reversed(self._steps):
+            i = bisect_right(starts, offset) - 1
+            offset = targets[i] + min(offset - starts[i], limits[i])
+        return offset
+
+    def _add_step(self):
+        step = (array('i', [0]), array('i', [0]), array('i', [_NO_LIMIT]))
+        self._steps.append(step)
+        return step
+
+    def _add_newlines(self, text):
+        # each "\r\n" is shortened to one character
+        starts, targets, limits = self._add_step()
+        removed = 0
+        for match in _crlf_re.finditer(text):
+            pos = match.start()
+            starts.extend((pos - removed, pos - removed + 1))
+            targets.extend((pos, pos + 2))
+            limits.extend((0, _NO_LIMIT))
+            removed += 1
+
+    def _add_shift(self, count):
+        # `count` characters were removed from the start
+        if count:
+            starts, targets, limits = self._add_step()
+            targets[0] = count
+
+    def _add_tabs(self, text, tabsize):
+        starts, targets, limits = self._add_step()
+        added = 0
+        line, line_added = -1, 0
+        for match in _tab_re.finditer(text):
+            pos = match.start()
+            newline = text.rfind('\n', 0, pos)
+            if newline != line:
+                line, line_added = newline, added
+            column = pos - newline - 1 + added - line_added
+            width = tabsize - column % tabsize
+            starts.extend((pos + added, pos + added + width))
+            targets.extend((pos, pos + 1))
+            limits.extend((0, _NO_LIMIT))
+            added += width - 1
+
+
 class DelegatingLexer(Lexer):
     """
     This lexer takes two lexer as arguments. A root lexer and
@@ -192,20 +468,37 @@ class DelegatingLexer(Lexer):
         Lexer.__init__(self, **options)
 
     def get_tokens_unprocessed(self, text):
-        buffered = ''
-        insertions = []
-        lng_buffer = []
+        needle = self.needle
+        buffered = []
+        length = 0
+        # the language lexer's tokens are kept in compact form; for every
+        # insertion, store its position in the root lexer's text and the
+        # end of its tokens in the buffer
+        lng_buffer = TokenBuffer(text)
+        ins_index = array('i')
+        ins_end = array('i')
+        inserted = 0
         for i, t, v in self.language_lexer.get_tokens_unprocessed(text):
-            if t is self.needle:
-                if lng_buffer:
-                    insertions.append((len(buffered), lng_buffer))
-                    lng_buffer = []
-                buffered += v
+            if t is needle:
+                if len(lng_buffer) > inserted:
+                    inserted = len(lng_buffer)
+                    ins_index.append(length)
+                    ins_end.append(inserted)
+                buffered.append(v)
+                length += len(v)
             else:
-                lng_buffer.append((i, t, v))
-        if lng_buffer:
-            insertions.append((len(buffered), lng_buffer))
-        return do_insertions(insertions,
+                lng_buffer.append(t, v, i)
+        if len(lng_buffer) > inserted:
+            ins_index.append(length)
+            ins_end.append(len(lng_buffer))
+
+        def insertions():
+            start = 0
+            for index, end in izip(ins_index, ins_end):
+                yield index, lng_buffer.iter_unprocessed(start, end)
+                start = end
+        buffered = ''.join(buffered)
+        return do_insertions(insertions(),
                              self.root_lexer.get_tokens_unprocessed(buffered))
 
 
@@ -305,6 +598,9 @@ def using(_other, **kwargs):
     string which is assumed to be on top of the root state.
 
     Note: For that to work, `_other` must not be an `ExtendedRegexLexer`.
+
+    The lexer instance used for `_other` is created on the first match and
+    then reused for all further matches of the same calling lexer.
     """
     gt_kwargs = {}
     if 'state' in kwargs:
@@ -314,29 +610,38 @@ def using(_other, **kwargs):
         else:
             gt_kwargs['stack'] = ('root', s)
 
-    if _other is this:
-        def callback(lexer, match, ctx=None):
-            # if keyword arguments are given the callback
-            # function has to create a new lexer instance
-            if kwargs:
-                # XXX: cache that somehow
-                kwargs.update(lexer.options)
-                lx = lexer.__class__(**kwargs)
+    def get_delegate(lexer):
+        # the delegate lexer is created once per parent lexer and callback
+        try:
+            cache = lexer._delegates
+        except AttributeError:
+            cache = lexer._delegates = {}
+        try:
+            return cache[callback]
+        except KeyError:
+            options = kwargs.copy()
+            options.update(lexer.options)
+            if _other is this:
+                lx = lexer.__class__(**options)
             else:
-                lx = lexer
+                lx = _other(**options)
+            cache[callback] = lx
+            return lx
+
+    if _other is this and not kwargs:
+        def callback(lexer, match, ctx=None):
             s = match.start()
-            for i, t, v in lx.get_tokens_unprocessed(match.group(), **gt_kwargs):
+            for i, t, v in lexer.get_tokens_unprocessed(match.group(),
+                                                        **gt_kwargs):
                 yield i + s, t, v
             if ctx:
                 ctx.pos = match.end()
     else:
         def callback(lexer, match, ctx=None):
-            # XXX: cache that somehow
-            kwargs.update(lexer.options)
-            lx = _other(**kwargs)
-
+            lx = get_delegate(lexer)
             s = match.start()
-            for i, t, v in lx.get_tokens_unprocessed(match.group(), **gt_kwargs):
+            for i, t, v in lx.get_tokens_unprocessed(match.group(),
+                                                     **gt_kwargs):
                 yield i + s, t, v
             if ctx:
                 ctx.pos = match.end()
@@ -351,6 +656,10 @@ class RegexLexerMeta(LexerMeta):
 
     def _process_regex(cls, regex, rflags):
         """Preprocess the regular expression component of a token definition."""
+        # set by the token table cache while it processes cls
+        table = cls.__dict__.get('_program_table')
+        if table is not None:
+            return table.compile(regex, rflags).match
         return re.compile(regex, rflags).match
 
     def _process_token(cls, token):
@@ -445,6 +754,8 @@ class RegexLexerMeta(LexerMeta):
             if hasattr(cls, 'token_variants') and cls.token_variants:
                 # don't process yet
                 pass
+            elif token_table_cache is not None:
+                cls._tokens = token_table_cache.process_tokendef(cls)
             else:
                 cls._tokens = cls.process_tokendef('', cls.tokens)
 
@@ -488,9 +799,15 @@ class RegexLexer(Lexer):
 
         ``stack`` is the inital stack (default: ``['root']``)
         """
-        pos = 0
-        tokendefs = self._tokens
-        statestack = list(stack)
+        return self._iter_tokens(text, 0, list(stack), self._tokens)
+
+    def _iter_tokens(self, text, pos, statestack, tokendefs):
+        """
+        The state machine of `get_tokens_unprocessed`, lexing `text` from
+        `pos` with the states `tokendefs`, starting in the states of the
+        list `statestack`.  Everything lexing with the ``tokens`` of a
+        `RegexLexer` goes through here.
+        """
         statetokens = tokendefs[statestack[-1]]
         while 1:
             for rexmatch, action, new_state in statetokens:
@@ -524,9 +841,10 @@ class RegexLexer(Lexer):
             else:
                 try:
                     if text[pos] == '\n':
-                        # at EOL, reset state to "root"
+                        # at EOL, reset state to "root"; in place, as
+                        # _lex_window looks at the stack between tokens
                         pos += 1
-                        statestack = ['root']
+                        statestack[:] = ['root']
                         statetokens = tokendefs['root']
                         yield pos, Text, u'\n'
                         continue
@@ -535,6 +853,111 @@ class RegexLexer(Lexer):
                 except IndexError:
                     break
 
+    def _is_plain(self):
+        """
+        Return True unless the subclass replaces or post-processes the
+        token stream of `get_tokens_unprocessed`.
+        """
+        return self.get_tokens_unprocessed.im_func is \
+            RegexLexer.get_tokens_unprocessed.im_func
+
+    def _can_stream(self):
+        return self._is_plain()
+
+    def _window_tokendefs(self):
+        """
+        Return the states of the lexer with every callback wrapped to mark
+        the start and the end of its match, for `_lex_window`.
+        """
+        cls = self.__class__
+        tokendefs = cls.__dict__.get('_window_tokens')
+        if tokendefs is None:
+            def marked(action):
+                def callback(lexer, match):
+                    yield match.start(), _MATCH_START, None
+                    for item in action(lexer, match):
+                        yield item
+                    yield match.end(), _MATCH_END, None
+                return callback
+            tokendefs = {}
+            for state, rules in self._tokens.iteritems():
+                tokendefs[state] = [
+                    (rexmatch, type(action) is _TokenType and action or
+                     marked(action), new_state)
+                    for rexmatch, action, new_state in rules]
+            cls._window_tokens = tokendefs
+        return tokendefs
+
+    def _lex_window(self, text, start, carried, state, last):
+        """
+        Lex a window of `get_tokens_windowed` with `_iter_tokens`.  Unless
+        it is the last one, the window is only lexed for good up to the
+        start of its last line that does not start inside a match, since
+        the tokens after it may belong to a token continuing in the next
+        window.  An error token also holds the window back, as it can be
+        caused by a construct cut off at the window end, and so does a
+        shorter match of a regular expression that fails on the cut off
+        text; only `_WINDOW_MARGIN` characters before the end are guarded
+        against the latter.  Errors in the `carried` text were already
+        lexed with a window to spare and are taken as they are.  The state
+        is the state stack at the cut.
+
+        The character before `start` is kept as context for expressions
+        that look behind or anchor at the start of the text.
+        """
+        if state is None:
+            state = ['root']
+        statestack = list(state)
+        limit = min(self._window_end(text, last), len(text) - _WINDOW_MARGIN)
+        # if too much text is held back, cut at any match before `limit`
+        force = not last and len(text) - start > _WINDOW_LIMIT
+        tokens = []
+        append = tokens.append
+        # the text is lexed for good up to `cut`, giving `ncut` tokens
+        cut = forced = start
+        ncut = nforced = 0
+        cutstack = forcedstack = state
+        settled = True
+        # the tokens of a callback are not at the start of a match
+        inmatch = False
+        # the end of the last match, where the next token starts
+        pos = start
+        for item in self._iter_tokens(text, start, statestack,
+                                      self._window_tokendefs()):
+            ttype = item[1]
+            if ttype is _MATCH_END:
+                inmatch = False
+                pos = item[0]
+                continue
+            # the newline token of an error at EOL is after the reset
+            # to "root" and comes with an index past its start
+            if not inmatch and item[0] == pos and pos <= limit:
+                if settled and text[pos-1:pos] == '\n':
+                    cut = pos
+                    ncut = len(tokens)
+                    cutstack = list(statestack)
+                if force:
+                    forced = pos
+                    nforced = len(tokens)
+                    forcedstack = list(statestack)
+            if ttype is _MATCH_START:
+                inmatch = True
+                continue
+            if ttype is Error and item[0] >= carried:
+                settled = False
+            append(item)
+            if not inmatch:
+                pos += len(item[2])
+        if last:
+            return tokens, len(text), None
+        if force and cut == start and forced > start:
+            import warnings
+            warnings.warn('no safe position to cut the text of a window '
+                          'within %d characters, tokens may differ from '
+                          'get_tokens' % _WINDOW_LIMIT, RuntimeWarning)
+            return tokens[:nforced], forced, forcedstack
+        return tokens[:ncut], cut, cutstack
+
 
 class LexerContext(object):
     """
@@ -619,18 +1042,20 @@ def do_insertions(insertions, tokens):
     Helper for lexers which must combine the results of several
     sublexers.
 
-    ``insertions`` is a list of ``(index, itokens)`` pairs.
-    Each ``itokens`` iterable should be inserted at position
-    ``index`` into the token stream given by the ``tokens``
-    argument.
+    ``insertions`` is an iterable of ``(index, itokens)`` pairs, sorted by
+    index.  Each ``itokens`` iterable should be inserted at position
+    ``index`` into the token stream given by the ``tokens`` argument.
 
     The result is a combined token stream.
 
-    TODO: clean up the code here.
+    Both iterables are consumed lazily.  Each token only needs to be
+    compared with the next index; tokens without insertions are passed
+    through unchanged, and only the tokens that are actually split are
+    sliced.
     """
     insertions = iter(insertions)
     try:
-        index, itokens = insertions.next()
+        next_index, itokens = insertions.next()
     except StopIteration:
         # no insertions
         for item in tokens:
@@ -638,7 +1063,6 @@ def do_insertions(insertions, tokens):
         return
 
     realpos = None
-    insleft = True
 
     # iterate over the token stream where we want to insert
     # the tokens from the insertion list.
@@ -646,27 +1070,33 @@ def do_insertions(insertions, tokens):
         # first iteration. store the postition of first item
         if realpos is None:
             realpos = i
+        end = i + len(v)
+        if itokens is None or end < next_index:
+            yield realpos, t, v
+            realpos += len(v)
+            continue
+        # all insertions up to the end of this token go into it
         oldi = 0
-        while insleft and i + len(v) >= index:
-            tmpval = v[oldi:index - i]
+        while itokens is not None and next_index <= end:
+            tmpval = v[oldi:next_index - i]
             yield realpos, t, tmpval
             realpos += len(tmpval)
             for it_index, it_token, it_value in itokens:
                 yield realpos, it_token, it_value
                 realpos += len(it_value)
-            oldi = index - i
+            oldi = next_index - i
             try:
-                index, itokens = insertions.next()
+                next_index, itokens = insertions.next()
             except StopIteration:
-                insleft = False
-                break  # not strictly necessary
+                itokens = None
         yield realpos, t, v[oldi:]
         realpos += len(v) - oldi
 
-    # leftover tokens
-    if insleft:
+    # leftover insertions
+    if itokens is not None:
         # no normal tokens, set realpos to zero
         realpos = realpos or 0
-        for p, t, v in itokens:
-            yield realpos, t, v
-            realpos += len(v)
+        for index, itokens in chain([(next_index, itokens)], insertions):
+            for p, t, v in itokens:
+                yield realpos, t, v
+                realpos += len(v)
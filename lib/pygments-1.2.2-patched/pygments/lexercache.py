@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.lexercache
+    ~~~~~~~~~~~~~~~~~~~
+
+    Opt-in cache for the processed token definitions of `RegexLexer`
+    subclasses.
+
+    The first instantiation of a `RegexLexer` subclass in a process
+    processes its ``tokens`` and compiles all its regular expressions,
+    which takes tens of milliseconds for big lexers.  With a cache
+    installed, the compiled programs of the regular expressions are
+    stored in one marshal file per lexer class, and later processes build
+    the pattern objects from them without parsing and compiling the
+    expressions again::
+
+        from pygments.lexercache import install
+
+        install('/var/cache/pygments')
+
+    The states and actions are still built from ``tokens``, so callbacks
+    created by `bygroups` and `using` are the same as without the cache.
+    A file is only used with the source of the module defining the lexer
+    and the Python version it was written for.  Programs are looked up by
+    expression and flags, so a lexer taking expressions from other modules
+    at worst misses the cache.
+
+    ``pygmentize`` installs a cache in the directory named by the
+    environment variable ``PYGMENTS_LEXER_CACHE``.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import re
+import sys
+import zlib
+import marshal
+import tempfile
+import sre_parse
+import sre_compile
+try:
+    import _sre
+except ImportError:
+    # the programs are written for CPython's regular expression engine
+    _sre = None
+
+from pygments import lexer
+
+__all__ = ['TokenTableCache', 'install', 'uninstall']
+
+
+def _checksum(data):
+    # the hashes only need to notice changes, cryptographic ones would
+    # take longer than restoring the programs of a big lexer
+    return '%08x%x' % (zlib.crc32(data) & 0xffffffff, len(data))
+
+# the programs are only valid for the regular expression engine they were
+# compiled for
+_ENGINE_KEY = _checksum('%s %s %s' % (sys.version,
+                                      getattr(_sre, 'MAGIC', ''),
+                                      getattr(_sre, 'CODESIZE', '')))
+
+
+def _compile_program(regex, flags):
+    """
+    Compile `regex` and return the pattern object and its marshallable
+    program, or None if the program cannot be obtained.
+    """
+    pattern = re.compile(regex, flags)
+    # the program comes from private functions of the re module, which
+    # may be missing or behave differently in other Python versions
+    try:
+        code = sre_compile._code(sre_parse.parse(regex, flags), flags)
+        program = (pattern.flags, code, pattern.groups,
+                   dict(pattern.groupindex))
+        marshal.dumps(program)
+    except Exception:
+        program = None
+    return pattern, program
+
+
+def _restore_program(regex, program):
+    """
+    Create the pattern object for `regex` from its program.
+    """
+    flags, code, groups, groupindex = program
+    indexgroup = [None] * (groups + 1)
+    for name, index in groupindex.iteritems():
+        indexgroup[index] = name
+    return _sre.compile(regex, flags, code, groups, groupindex, indexgroup)
+
+
+class _ProgramTable(object):
+    """
+    The programs of one lexer class while its tokens are processed.
+    """
+
+    def __init__(self, programs):
+        self.programs = programs
+        self.hits = self.misses = self.added = 0
+
+    def compile(self, regex, flags):
+        key = (regex, flags)
+        program = self.programs.get(key)
+        if program is not None:
+            try:
+                pattern = _restore_program(regex, program)
+            except Exception:
+                pass
+            else:
+                self.hits += 1
+                return pattern
+        pattern, program = _compile_program(regex, flags)
+        if program is not None:
+            self.programs[key] = program
+            self.added += 1
+        self.misses += 1
+        return pattern
+
+
+class TokenTableCache(object):
+    """
+    Cache storing the compiled regular expressions of `RegexLexer`
+    subclasses in `directory`.  Files are replaced atomically, so the
+    directory can be shared between processes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.hits = self.misses = 0
+        self._source_hashes = {}
+
+    def _path(self, cls):
+        return os.path.join(self.directory, '%s.%s-%s' % (
+            cls.__module__, cls.__name__, _ENGINE_KEY))
+
+    def source_hash(self, cls):
+        """
+        Return a hash of the source of the module defining `cls`, or None
+        if it is not available.
+        """
+        modname = cls.__module__
+        try:
+            return self._source_hashes[modname]
+        except KeyError:
+            pass
+        digest = None
+        filename = getattr(sys.modules.get(modname), '__file__', None)
+        if filename:
+            if filename[-4:] in ('.pyc', '.pyo'):
+                filename = filename[:-1]
+            try:
+                f = open(filename, 'rb')
+                try:
+                    digest = _checksum(f.read())
+                finally:
+                    f.close()
+            except IOError:
+                pass
+        self._source_hashes[modname] = digest
+        return digest
+
+    def load(self, cls, digest):
+        """
+        Return the programs stored for `cls` if they belong to the source
+        with hash `digest`, else an empty dict.
+        """
+        try:
+            f = open(self._path(cls), 'rb')
+        except IOError:
+            return {}
+        try:
+            try:
+                stored, programs = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return {}
+        finally:
+            f.close()
+        if stored != digest or not isinstance(programs, dict):
+            return {}
+        return programs
+
+    def save(self, cls, digest, programs):
+        """
+        Store `programs` for `cls` and the source with hash `digest`.
+        Errors are ignored, the cache is only an optimization.
+        """
+        try:
+            fd, tmpname = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+            try:
+                f = os.fdopen(fd, 'wb')
+                try:
+                    marshal.dump((digest, programs), f)
+                finally:
+                    f.close()
+                os.rename(tmpname, self._path(cls))
+            except:
+                os.remove(tmpname)
+                raise
+        except (EnvironmentError, ValueError):
+            pass
+
+    def process_tokendef(self, cls):
+        """
+        Process the token definitions of `cls` like
+        `RegexLexerMeta.process_tokendef`, using and updating the stored
+        programs.
+        """
+        digest = self.source_hash(cls)
+        if digest is None or _sre is None:
+            return cls.process_tokendef('', cls.tokens)
+        table = cls._program_table = _ProgramTable(self.load(cls, digest))
+        try:
+            tokens = cls.process_tokendef('', cls.tokens)
+        finally:
+            del cls._program_table
+        self.hits += table.hits
+        self.misses += table.misses
+        if table.added:
+            self.save(cls, digest, table.programs)
+        return tokens
+
+
+def install(directory):
+    """
+    Use a `TokenTableCache` in `directory` for all `RegexLexer`
+    subclasses processed from now on, and return it.
+    """
+    cache = lexer.token_table_cache
+    if cache is None or cache.directory != directory:
+        cache = lexer.token_table_cache = TokenTableCache(directory)
+    return cache
+
+
+def uninstall():
+    """
+    Stop using the installed `TokenTableCache`.
+    """
+    lexer.token_table_cache = None
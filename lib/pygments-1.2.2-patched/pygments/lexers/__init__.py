@@ -8,10 +8,13 @@
     :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
     :license: BSD, see LICENSE for details.
 """
+import re
 import sys
 import fnmatch
 import types
+import os
 from os.path import basename
+from itertools import izip
 
 try:
     set
@@ -20,13 +23,27 @@ except NameError:
 
 from pygments.lexers._mapping import LEXERS
 from pygments.plugin import find_plugin_lexers
-from pygments.util import ClassNotFound, bytes
+from pygments.util import ClassNotFound, bytes, shebang_command
 
 
 __all__ = ['get_lexer_by_name', 'get_lexer_for_filename', 'find_lexer_class',
            'guess_lexer'] + LEXERS.keys()
 
 _lexer_cache = {}
+_lexer_index = None
+
+_glob_special_re = re.compile(r'[*?[]')
+
+#: Number of characters `guess_lexer` looks at to find a shebang.
+_GUESS_PREFIX_LENGTH = 1024
+
+#: Number of characters `guess_lexer` passes to the ``analyse_text``
+#: methods first, which mostly look for distinctive lines near the top.
+_RATING_PREFIX_LENGTH = 1 << 16
+
+#: If the two best ratings of the prefix are closer than this,
+#: `guess_lexer` rates the whole text again.
+_RATING_CLOSE = 0.1
 
 
 def _load_lexers(module_name):
@@ -39,6 +56,73 @@ def _load_lexers(module_name):
         _lexer_cache[cls.name] = cls
 
 
+class _LexerIndex(object):
+    """
+    Reverse indexes over the builtin lexers in `LEXERS`.  Where several
+    lexers claim the same alias or mimetype, the first one in `LEXERS`
+    wins, as with a linear search.
+    """
+
+    def __init__(self):
+        self.modules = {}       # lexer name -> module name
+        self.aliases = {}       # alias -> lexer name
+        self.mimetypes = {}     # mimetype -> lexer name
+        # lexer names of all filename patterns, numbered in the order of a
+        # linear search over LEXERS and the patterns of each lexer
+        self.names = []
+        self.filenames = {}     # literal filename -> pattern numbers
+        self.suffixes = {}      # suffix of a "*suffix" pattern -> numbers
+        self.globs = []         # (pattern, number) for all other patterns
+        for module_name, name, aliases, filenames, mimetypes in \
+                LEXERS.itervalues():
+            self.modules.setdefault(name, module_name)
+            for alias in aliases:
+                self.aliases.setdefault(alias, name)
+            for mimetype in mimetypes:
+                self.mimetypes.setdefault(mimetype, name)
+            for pattern in filenames:
+                pattern = os.path.normcase(pattern)
+                number = len(self.names)
+                self.names.append(name)
+                if not _glob_special_re.search(pattern):
+                    self.filenames.setdefault(pattern, []).append(number)
+                elif pattern[:1] == '*' and \
+                         not _glob_special_re.search(pattern, 1):
+                    self.suffixes.setdefault(pattern[1:], []).append(number)
+                else:
+                    self.globs.append((pattern, number))
+        self.suffix_lengths = sorted(set(map(len, self.suffixes)))
+        # quick rejection of file names not matching any of the globs
+        self.globs_re = re.compile('|'.join(['(?:%s)' % fnmatch.translate(p)
+                                             for p, _ in self.globs])
+                                   or '(?!)')
+
+    def match_filename(self, fn):
+        """
+        Return the names of all lexers with a pattern matching `fn`, once
+        per matching pattern and in the order of a linear search.
+        """
+        fn = os.path.normcase(fn)
+        numbers = list(self.filenames.get(fn, ()))
+        for length in self.suffix_lengths:
+            if length > len(fn):
+                break
+            numbers.extend(self.suffixes.get(fn[len(fn) - length:], ()))
+        if self.globs_re.match(fn):
+            for pattern, number in self.globs:
+                if fnmatch.fnmatch(fn, pattern):
+                    numbers.append(number)
+        numbers.sort()
+        return [self.names[number] for number in numbers]
+
+
+def _get_lexer_index():
+    global _lexer_index
+    if _lexer_index is None:
+        _lexer_index = _LexerIndex()
+    return _lexer_index
+
+
 def get_all_lexers():
     """
     Return a generator of tuples in the form ``(name, aliases,
@@ -57,10 +141,10 @@ def find_lexer_class(name):
     if name in _lexer_cache:
         return _lexer_cache[name]
     # lookup builtin lexers
-    for module_name, lname, aliases, _, _ in LEXERS.itervalues():
-        if name == lname:
-            _load_lexers(module_name)
-            return _lexer_cache[name]
+    module_name = _get_lexer_index().modules.get(name)
+    if module_name is not None:
+        _load_lexers(module_name)
+        return _lexer_cache[name]
     # continue with lexers from setuptools entrypoints
     for cls in find_plugin_lexers():
         if cls.name == name:
@@ -72,11 +156,12 @@ def get_lexer_by_name(_alias, **options):
     Get a lexer by an alias.
     """
     # lookup builtin lexers
-    for module_name, name, aliases, _, _ in LEXERS.itervalues():
-        if _alias in aliases:
-            if name not in _lexer_cache:
-                _load_lexers(module_name)
-            return _lexer_cache[name](**options)
+    index = _get_lexer_index()
+    name = index.aliases.get(_alias)
+    if name is not None:
+        if name not in _lexer_cache:
+            _load_lexers(index.modules[name])
+        return _lexer_cache[name](**options)
     # continue with lexers from setuptools entrypoints
     for cls in find_plugin_lexers():
         if _alias in cls.aliases:
@@ -92,12 +177,11 @@ def get_lexer_for_filename(_fn, code=None, **options):
     """
     matches = []
     fn = basename(_fn)
-    for modname, name, _, filenames, _ in LEXERS.itervalues():
-        for filename in filenames:
-            if fnmatch.fnmatch(fn, filename):
-                if name not in _lexer_cache:
-                    _load_lexers(modname)
-                matches.append(_lexer_cache[name])
+    index = _get_lexer_index()
+    for name in index.match_filename(fn):
+        if name not in _lexer_cache:
+            _load_lexers(index.modules[name])
+        matches.append(_lexer_cache[name])
     for cls in find_plugin_lexers():
         for filename in cls.filenames:
             if fnmatch.fnmatch(fn, filename):
@@ -128,11 +212,12 @@ def get_lexer_for_mimetype(_mime, **options):
     """
     Get a lexer for a mimetype.
     """
-    for modname, name, _, _, mimetypes in LEXERS.itervalues():
-        if _mime in mimetypes:
-            if name not in _lexer_cache:
-                _load_lexers(modname)
-            return _lexer_cache[name](**options)
+    index = _get_lexer_index()
+    name = index.mimetypes.get(_mime)
+    if name is not None:
+        if name not in _lexer_cache:
+            _load_lexers(index.modules[name])
+        return _lexer_cache[name](**options)
     for cls in find_plugin_lexers():
         if _mime in cls.mimetypes:
             return cls(**options)
@@ -194,20 +279,134 @@ def guess_lexer_for_filename(_fn, _text, **options):
     return result[-1][1](**options)
 
 
-def guess_lexer(_text, **options):
+def _guess_from_shebang(text):
     """
-    Guess a lexer by strong distinctions in the text (eg, shebang).
+    Return the builtin lexer class named by the shebang line of `text`,
+    if it is certain about the text.  No lexer after it can win the
+    rating, so `_iter_ratings` stops there.
     """
-    best_lexer = [0.0, None]
-    for lexer in _iter_lexerclasses():
-        rv = lexer.analyse_text(_text)
+    command = shebang_command(text[:_GUESS_PREFIX_LENGTH])
+    if command is None:
+        return None
+    index = _get_lexer_index()
+    for alias in (command, command.rstrip('0123456789.')):
+        name = index.aliases.get(alias)
+        if name is not None:
+            lexer = find_lexer_class(name)
+            if lexer.analyse_text(text) == 1.0:
+                return lexer
+    return None
+
+
+_guess_pool = None
+
+def _get_guess_pool(jobs):
+    """
+    Return a pool of `jobs` worker processes for `_iter_ratings`, which
+    is kept for later calls.
+    """
+    global _guess_pool
+    pid = os.getpid()
+    if _guess_pool is None or _guess_pool[:2] != (pid, jobs):
+        import multiprocessing
+        if _guess_pool is not None and _guess_pool[0] == pid:
+            _guess_pool[2].terminate()
+        _guess_pool = (pid, jobs, multiprocessing.Pool(jobs))
+    return _guess_pool[2]
+
+
+def _rate_lexers(args):
+    # runs in the worker processes of _iter_ratings
+    names, text = args
+    ratings = []
+    for name in names:
+        rv = find_lexer_class(name).analyse_text(text)
+        ratings.append(rv)
         if rv == 1.0:
-            return lexer(**options)
-        if rv > best_lexer[0]:
-            best_lexer[:] = (rv, lexer)
-    if not best_lexer[0] or best_lexer[1] is None:
+            break
+    return ratings
+
+
+def _iter_ratings(text, jobs, last=None):
+    """
+    Yield ``(lexer, rating)`` for all lexers in the order of
+    `_iter_lexerclasses`, up to the builtin lexer class `last` if it is
+    given.  `last` is known to be certain about the text and is not rated
+    again.  With more than one job the builtin lexers are rated by a pool
+    of worker processes, and `lexer` is the name of the lexer instead of
+    the class.
+    """
+    if jobs > 1:
+        names = [name for _, name, _, _, _ in LEXERS.itervalues()]
+        if last is not None:
+            names = names[:names.index(last.name)]
+        size = len(names) // (jobs * 4) + 1
+        chunks = [names[i:i+size] for i in xrange(0, len(names), size)]
+        # imap returns the chunks in order, so the caller can still stop
+        # at the first lexer that is certain; the chunks already sent
+        # are rated anyway
+        results = _get_guess_pool(jobs).imap(
+            _rate_lexers, [(chunk, text) for chunk in chunks])
+        for chunk, ratings in izip(chunks, results):
+            for item in izip(chunk, ratings):
+                yield item
+        if last is not None:
+            yield last, 1.0
+            return
+        for lexer in find_plugin_lexers():
+            yield lexer, lexer.analyse_text(text)
+    else:
+        for lexer in _iter_lexerclasses():
+            if lexer is last:
+                yield last, 1.0
+                return
+            yield lexer, lexer.analyse_text(text)
+
+
+def _rate(text, jobs, last):
+    """
+    Return the best rating of `text`, the first lexer with it, and the
+    second best rating.
+    """
+    best = second = 0.0
+    best_lexer = None
+    ratings = _iter_ratings(text, jobs, last)
+    for lexer, rv in ratings:
+        if rv > best:
+            best, best_lexer, second = rv, lexer, best
+            if rv == 1.0:
+                break
+        elif rv > second:
+            second = rv
+    ratings.close()
+    return best, best_lexer, second
+
+
+def guess_lexer(_text, _jobs=1, **options):
+    """
+    Guess a lexer by strong distinctions in the text (eg, shebang).
+
+    The first lexer with the highest rating wins.  The first 64 KB of
+    the text are rated first; only if no lexer is certain and the best
+    two ratings are close, the whole text is rated again.  If the
+    shebang line names a builtin lexer that is certain about the text,
+    the lexers after it are not asked; the doctype is looked up only
+    once for all lexers that check it.  If ``_jobs`` is larger than one,
+    a pool of that many processes, kept for later calls, rates the text
+    in parallel.
+    """
+    text = _text[:_RATING_PREFIX_LENGTH]
+    last = _guess_from_shebang(text)
+    best, lexer, second = _rate(text, _jobs, last)
+    if len(text) < len(_text) and best < 1.0 and \
+       best - second < _RATING_CLOSE:
+        # the rest of the text may tell the lexers apart
+        best, lexer, second = _rate(_text, _jobs, last)
+    if not best or lexer is None:
         raise ClassNotFound('no lexer matching the text found')
-    return best_lexer[1](**options)
+    if isinstance(lexer, basestring):
+        lexer = find_lexer_class(lexer)
+    return lexer(**options)
 
 
 class _automodule(types.ModuleType):
@@ -14,7 +14,8 @@ import cStringIO
 
 from pygments.lexer import Lexer
 from pygments.token import Token, Error, Text
-from pygments.util import get_choice_opt, b
+from pygments.util import get_choice_opt, b, RAW_TOKEN_MAGIC, \
+     RAW_TOKEN_VERSION, decode_varint
 
 
 __all__ = ['TextLexer', 'RawTokenLexer']
@@ -32,6 +33,15 @@ class TextLexer(Lexer):
     def get_tokens_unprocessed(self, text):
         yield 0, Text, text
 
+    def _can_stream(self):
+        return True
+
+    def _lex_window(self, text, start, carried, state, last):
+        end = self._window_end(text, last)
+        if end <= start:
+            return [], start, None
+        return [(start, Text, text[start:end])], end, None
+
 
 _ttype_cache = {}
 
@@ -41,7 +51,7 @@ class RawTokenLexer(Lexer):
     """
     Recreate a token stream formatted with the `RawTokenFormatter`.  This
     lexer raises exceptions during parsing if the token stream in the
-    file is malformed.
+    file is malformed.  Both the text and the binary format are accepted.
 
     Additional options accepted:
 
@@ -71,12 +81,61 @@ class RawTokenLexer(Lexer):
             import bz2
             text = bz2.decompress(text)
 
+        if text.startswith(RAW_TOKEN_MAGIC):
+            for t, v in self._get_binary_tokens(text):
+                yield t, v
+            return
+
         # do not call Lexer.get_tokens() because we do not want Unicode
         # decoding to occur, and stripping is not optional.
         text = text.strip(b('\n')) + b('\n')
         for i, t, v in self.get_tokens_unprocessed(text):
             yield t, v
 
+    def _get_binary_tokens(self, data):
+        pos = len(RAW_TOKEN_MAGIC)
+        if data[pos:pos+1] != chr(RAW_TOKEN_VERSION):
+            raise ValueError('unsupported raw token format version')
+        pos += 1
+        end = len(data)
+        ttypes = [None]
+        try:
+            while pos < end:
+                # type number and payload length are almost always a
+                # single byte each
+                num = ord(data[pos])
+                if num < 0x80:
+                    pos += 1
+                else:
+                    num, pos = decode_varint(data, pos)
+                length = ord(data[pos])
+                if length < 0x80:
+                    pos += 1
+                else:
+                    length, pos = decode_varint(data, pos)
+                payload = data[pos:pos+length]
+                pos += length
+                if num:
+                    yield ttypes[num], payload.decode('utf-8')
+                else:
+                    ttypes.append(self._get_ttype(payload))
+        except IndexError:
+            raise ValueError('truncated or malformed raw token data')
+        if pos != end:
+            raise ValueError('truncated raw token data')
+
+    def _get_ttype(self, ttypestr):
+        ttype = _ttype_cache.get(ttypestr)
+        if not ttype:
+            ttype = Token
+            ttypes = ttypestr.split('.')[1:]
+            for ttype_ in ttypes:
+                if not ttype_ or not ttype_[0].isupper():
+                    raise ValueError('malformed token name')
+                ttype = getattr(ttype, ttype_)
+            _ttype_cache[ttypestr] = ttype
+        return ttype
+
     def get_tokens_unprocessed(self, text):
         length = 0
         for match in line_re.finditer(text):
@@ -86,15 +145,7 @@ class RawTokenLexer(Lexer):
                 val = match.group().decode(self.encoding)
                 ttype = Error
             else:
-                ttype = _ttype_cache.get(ttypestr)
-                if not ttype:
-                    ttype = Token
-                    ttypes = ttypestr.split('.')[1:]
-                    for ttype_ in ttypes:
-                        if not ttype_ or not ttype_[0].isupper():
-                            raise ValueError('malformed token name')
-                        ttype = getattr(ttype, ttype_)
-                    _ttype_cache[ttypestr] = ttype
+                ttype = self._get_ttype(ttypestr)
                 val = val[2:-2].decode('unicode-escape')
             yield length, ttype, val
             length += len(val)
@@ -31,44 +31,145 @@
         [pygments.filter]
         yourfilter = yourfilter:YourFilter
 
+    Entry points are discovered once per process; call
+    `invalidate_plugin_cache` after installing plugins at runtime.
+
+    Scanning the installed distributions can be slow, so the discovered
+    entry points can be snapshotted into the generated module
+    ``pygments/_plugin_mapping.py`` by running this file as a script.
+    While that module exists, it is used instead of scanning; rerun the
+    script or delete the module when the installed plugins change.
 
     :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
     :license: BSD, see LICENSE for details.
 """
-try:
-    import pkg_resources
-except ImportError:
-    pkg_resources = None
+import os
+import sys
 
 LEXER_ENTRY_POINT = 'pygments.lexers'
 FORMATTER_ENTRY_POINT = 'pygments.formatters'
 STYLE_ENTRY_POINT = 'pygments.styles'
 FILTER_ENTRY_POINT = 'pygments.filters'
 
+ENTRY_POINTS = [LEXER_ENTRY_POINT, FORMATTER_ENTRY_POINT,
+                STYLE_ENTRY_POINT, FILTER_ENTRY_POINT]
+
+# entry point group -> list of (name, loaded object)
+_plugin_cache = {}
+
+
+def _iter_entry_points(group):
+    """
+    Yield ``(name, module_name, attrs)`` for the entry points of `group`,
+    from the snapshot if there is one.
+    """
+    try:
+        from pygments._plugin_mapping import PLUGINS
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        for entrypoint in pkg_resources.iter_entry_points(group):
+            yield entrypoint.name, entrypoint.module_name, entrypoint.attrs
+    else:
+        for item in PLUGINS.get(group, ()):
+            yield item
+
+
+def _load_entry_point(module_name, attrs):
+    obj = __import__(module_name, None, None, ['__name__'])
+    for attr in attrs:
+        obj = getattr(obj, attr)
+    return obj
+
+
+def get_plugins(group):
+    """
+    Return a list of ``(name, object)`` pairs for the entry points of
+    `group`, loading them on the first call.
+    """
+    try:
+        return _plugin_cache[group]
+    except KeyError:
+        plugins = [(name, _load_entry_point(module_name, attrs))
+                   for name, module_name, attrs in _iter_entry_points(group)]
+        _plugin_cache[group] = plugins
+        return plugins
+
+
+def invalidate_plugin_cache():
+    """
+    Forget all discovered plugins, so that they are looked up again.
+    """
+    _plugin_cache.clear()
+    sys.modules.pop('pygments._plugin_mapping', None)
+
 
 def find_plugin_lexers():
-    if pkg_resources is None:
-        return
-    for entrypoint in pkg_resources.iter_entry_points(LEXER_ENTRY_POINT):
-        yield entrypoint.load()
+    for name, lexer in get_plugins(LEXER_ENTRY_POINT):
+        yield lexer
 
 
 def find_plugin_formatters():
-    if pkg_resources is None:
-        return
-    for entrypoint in pkg_resources.iter_entry_points(FORMATTER_ENTRY_POINT):
-        yield entrypoint.name, entrypoint.load()
+    for item in get_plugins(FORMATTER_ENTRY_POINT):
+        yield item
 
 
 def find_plugin_styles():
-    if pkg_resources is None:
-        return
-    for entrypoint in pkg_resources.iter_entry_points(STYLE_ENTRY_POINT):
-        yield entrypoint.name, entrypoint.load()
+    for item in get_plugins(STYLE_ENTRY_POINT):
+        yield item
 
 
 def find_plugin_filters():
-    if pkg_resources is None:
-        return
-    for entrypoint in pkg_resources.iter_entry_points(FILTER_ENTRY_POINT):
-        yield entrypoint.name, entrypoint.load()
+    for item in get_plugins(FILTER_ENTRY_POINT):
+        yield item
+
+
+def write_plugin_mapping(filename=None):
+    """
+    Scan the installed distributions for plugins and write their entry
+    points to `filename`, by default ``_plugin_mapping.py`` next to this
+    module.
+    """
+    import pkg_resources
+    if filename is None:
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '_plugin_mapping.py')
+    found = []
+    for group in ENTRY_POINTS:
+        entrypoints = [(entrypoint.name, entrypoint.module_name,
+                        tuple(entrypoint.attrs)) for entrypoint in
+                       pkg_resources.iter_entry_points(group)]
+        found.append('%r: %r' % (group, entrypoints))
+    f = open(filename, 'w')
+    try:
+        f.write(MAPPING_HEADER)
+        f.write('PLUGINS = {\n    %s\n}\n' % ',\n    '.join(found))
+    finally:
+        f.close()
+    invalidate_plugin_cache()
+
+
+MAPPING_HEADER = '''\
+# -*- coding: utf-8 -*-
+"""
+    pygments._plugin_mapping
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Snapshot of the installed plugin entry points. This file is generated
+    by running pygments/plugin.py; delete it to scan the installed
+    distributions again.
+
+    Do not alter the PLUGINS dictionary by hand.
+"""
+
+'''
+
+
+if __name__ == '__main__':
+    # replace this file's directory, whose token.py would shadow the
+    # standard library module of that name
+    sys.path[0] = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '..')
+    write_plugin_mapping()
@@ -14,39 +14,74 @@ except NameError:
     from sets import Set as set
 
 
+#: All token types ever created, indexed by their ``id``.
+_token_table = []
+# maps the plain name tuple of every token type to the type itself
+_token_index = {}
+
+
 class _TokenType(tuple):
+    """
+    A token type.  Token types are interned: there is exactly one instance
+    for every name tuple, numbered densely by its ``id`` attribute.
+    ``ancestors`` holds the ids of the type and all its parents, root
+    first, so that subtype checks only need to compare integers.  Hashing
+    is inherited from the plain name tuple, which is faster than any
+    Python level ``__hash__``.
+    """
     parent = None
 
+    def __new__(cls, *args):
+        key = tuple(*args)
+        try:
+            return _token_index[key]
+        except KeyError:
+            pass
+        if key:
+            # link it into the hierarchy like an attribute access would
+            return getattr(_TokenType(key[:-1]), key[-1])
+        return cls._create(None, key)
+
+    def _create(cls, parent, key):
+        new = tuple.__new__(cls, key)
+        new.subtypes = set()
+        new.parent = parent
+        new.id = len(_token_table)
+        if parent is None:
+            new.ancestors = (new.id,)
+        else:
+            new.ancestors = parent.ancestors + (new.id,)
+        _token_table.append(new)
+        _token_index[key] = new
+        return new
+    _create = classmethod(_create)
+
     def split(self):
-        buf = []
-        node = self
-        while node is not None:
-            buf.append(node)
-            node = node.parent
-        buf.reverse()
-        return buf
+        return [_token_table[tid] for tid in self.ancestors]
 
     def __init__(self, *args):
-        # no need to call super.__init__
-        self.subtypes = set()
+        # everything is set up in __new__ and _create
+        pass
 
     def __contains__(self, val):
+        depth = len(self)
         return self is val or (
             type(val) is self.__class__ and
-            val[:len(self)] == self
+            len(val.ancestors) > depth and
+            val.ancestors[depth] == self.id
         )
 
     def __getattr__(self, val):
         if not val or not val[0].isupper():
             return tuple.__getattribute__(self, val)
-        new = _TokenType(self + (val,))
+        new = self._create(self, self + (val,))
         setattr(self, val, new)
         self.subtypes.add(new)
-        new.parent = self
         return new
 
-    def __hash__(self):
-        return hash(tuple(self))
+    def __reduce__(self):
+        # ids are only valid within one process, so pickle by name
+        return _TokenType, (tuple(self),)
 
     def __repr__(self):
         return 'Token' + (self and '.' or '') + '.'.join(self)
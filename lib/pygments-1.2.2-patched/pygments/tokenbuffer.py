@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+    pygments.tokenbuffer
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Compact, array-backed storage for token streams.
+
+    A `TokenBuffer` stores a token stream in columnar form: parallel
+    ``array('i')`` columns for the start and end offsets and the token
+    type id (see `pygments.token`) of every token.  Token values are not
+    stored but sliced from the shared source text on demand, which makes
+    buffers much cheaper to keep around than lists of ``(tokentype,
+    value)`` tuples.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+from array import array
+from itertools import izip
+
+from pygments.token import _token_table
+
+__all__ = ['TokenBuffer']
+
+
+class TokenBuffer(object):
+    """
+    A columnar token stream sharing the text it was lexed from.
+
+    Iterating over a buffer yields ``(tokentype, value)`` pairs, so it can
+    be passed everywhere a token stream is accepted.  Token values that do
+    not occur verbatim at their position in ``text`` (e.g. values changed
+    by a filter) are kept in a small side table instead.
+    """
+
+    def __init__(self, text):
+        #: The source text all token offsets refer to.
+        self.text = text
+        self.starts = array('i')
+        self.ends = array('i')
+        self.types = array('i')
+        # token index -> value, for values not found in `text`
+        self._values = {}
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.types)
+
+    def __repr__(self):
+        return '<TokenBuffer with %d tokens>' % len(self.types)
+
+    def append_span(self, start, end, ttype):
+        """
+        Append a token whose value is ``text[start:end]``.
+        """
+        self.starts.append(start)
+        self.ends.append(end)
+        self.types.append(ttype.id)
+        self._pos = end
+
+    def append(self, ttype, value, start=None):
+        """
+        Append a token starting at `start`, or right after the previous
+        one if not given.  If `value` is not found at that position in the
+        text, it is stored separately.
+        """
+        if start is None:
+            start = self._pos
+        end = start + len(value)
+        if not self.text.startswith(value, start):
+            self._values[len(self.types)] = value
+        self.append_span(start, end, ttype)
+
+    def extend(self, tokensource):
+        """
+        Append all ``(tokentype, value)`` pairs from `tokensource`.
+        """
+        append = self.append
+        for ttype, value in tokensource:
+            append(ttype, value)
+
+    def extend_unprocessed(self, tokensource):
+        """
+        Append all ``(index, tokentype, value)`` triples from `tokensource`,
+        as yielded by `Lexer.get_tokens_unprocessed`.  A token is placed
+        right after the previous one if its value is found there, else at
+        its index, so that gaps left by the lexer are kept.
+        """
+        text = self.text
+        startswith = text.startswith
+        starts, ends, types = self.starts, self.ends, self.types
+        values = self._values
+        pos = self._pos
+        for index, ttype, value in tokensource:
+            if not startswith(value, pos):
+                if startswith(value, index):
+                    pos = index
+                else:
+                    values[len(types)] = value
+            starts.append(pos)
+            pos += len(value)
+            ends.append(pos)
+            types.append(ttype.id)
+        self._pos = pos
+
+    def value(self, index):
+        """
+        Return the value of the token at position `index`.
+        """
+        try:
+            return self._values[index]
+        except KeyError:
+            return self.text[self.starts[index]:self.ends[index]]
+
+    def __getitem__(self, index):
+        return _token_table[self.types[index]], self.value(index)
+
+    def __iter__(self):
+        text = self.text
+        typetable = _token_table
+        values = self._values
+        if values:
+            for i in xrange(len(self.types)):
+                if i in values:
+                    yield typetable[self.types[i]], values[i]
+                else:
+                    yield (typetable[self.types[i]],
+                           text[self.starts[i]:self.ends[i]])
+        else:
+            for start, end, tid in izip(self.starts, self.ends, self.types):
+                yield typetable[tid], text[start:end]
+
+    def iter_unprocessed(self, start=0, end=None):
+        """
+        Yield ``(index, tokentype, value)`` triples like
+        `Lexer.get_tokens_unprocessed`, optionally only for the tokens
+        from position `start` up to `end`.
+        """
+        if end is None:
+            end = len(self.types)
+        value = self.value
+        for i in xrange(start, end):
+            yield self.starts[i], _token_table[self.types[i]], value(i)
+
+    def is_verbatim(self):
+        """
+        Return True if the token values, joined together, are exactly the
+        buffer's text.
+        """
+        if self._values:
+            return False
+        if not self.types:
+            return not self.text
+        if self.starts[0] != 0 or self.ends[-1] != len(self.text):
+            return False
+        return self.starts[1:] == self.ends[:-1]
+
+    def getvalue(self):
+        """
+        Return the concatenation of all token values.  This is the shared
+        text itself whenever possible.
+        """
+        if self.is_verbatim():
+            return self.text
+        return u''.join([value for ttype, value in self])
+
+    def merged(self):
+        """
+        Return a new buffer in which consecutive tokens of the same type
+        are merged into one, like the `TokenMergeFilter` does.
+        """
+        buf = TokenBuffer(self.text)
+        starts, ends, types = buf.starts, buf.ends, buf.types
+        values, merged_values = self._values, buf._values
+        for i in xrange(len(self.types)):
+            tid = self.types[i]
+            if types and types[-1] == tid:
+                last = len(types) - 1
+                if last in merged_values or i in values or \
+                   ends[-1] != self.starts[i]:
+                    merged_values[last] = buf.value(last) + self.value(i)
+                ends[-1] = self.ends[i]
+                continue
+            if i in values:
+                merged_values[len(types)] = values[i]
+            starts.append(self.starts[i])
+            ends.append(self.ends[i])
+            types.append(tid)
+        buf._pos = self._pos
+        return buf
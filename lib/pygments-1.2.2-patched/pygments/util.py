@@ -13,6 +13,7 @@ import sys
 
 
 split_path_re = re.compile(r'[/\\ ]')
+executable_ext_re = re.compile(r'\.(exe|cmd|bat|bin)$')
 doctype_lookup_re = re.compile(r'''(?smx)
     (<\?.*?\?>)?\s*
     <!DOCTYPE\s+(
@@ -145,6 +146,26 @@ def shebang_matches(text, regex):
     Note that this method automatically searches the whole string (eg:
     the regular expression is wrapped in ``'^$'``)
     """
+    found = shebang_command(text)
+    if found is not None:
+        regex = re.compile('^%s$' % regex, re.IGNORECASE)
+        if regex.search(found) is not None:
+            return True
+    return False
+
+
+def shebang_command(text):
+    """
+    Return the lowercased last part of the shebang without a windows
+    executable file extension, as matched by `shebang_matches`, or None
+    if there is no shebang.
+
+        >>> from pygments.util import shebang_command
+        >>> shebang_command('#!/usr/bin/env python -O')
+        'python'
+        >>> shebang_command('#!C:\\Python2.4\\Python.exe')
+        'python2.4'
+    """
     index = text.find('\n')
     if index >= 0:
         first_line = text[:index].lower()
@@ -155,11 +176,31 @@ def shebang_matches(text, regex):
             found = [x for x in split_path_re.split(first_line[2:].strip())
                      if x and not x.startswith('-')][-1]
         except IndexError:
-            return False
-        regex = re.compile('^%s(\.(exe|cmd|bat|bin))?$' % regex, re.IGNORECASE)
-        if regex.search(found) is not None:
-            return True
-    return False
+            return None
+        return executable_ext_re.sub('', found)
+    return None
+
+
+_doctype_cache = (None, None)
+
+def _get_doctype(text):
+    """
+    Return the first part of the DOCTYPE of `text`, or None.  The result
+    for the last text is kept, as guessing a lexer asks for the doctype
+    of the same text many times.
+    """
+    global _doctype_cache
+    if _doctype_cache[0] is text:
+        return _doctype_cache[1]
+    doctype = None
+    # without a doctype, the expression would still scan the text for
+    # the end of a leading processing instruction
+    if '<!DOCTYPE' in text:
+        m = doctype_lookup_re.match(text)
+        if m is not None:
+            doctype = m.group(2)
+    _doctype_cache = (text, doctype)
+    return doctype
 
 
 def doctype_matches(text, regex):
@@ -168,10 +209,9 @@ def doctype_matches(text, regex):
     Note that this method only checks the first part of a DOCTYPE.
     eg: 'html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN"'
     """
-    m = doctype_lookup_re.match(text)
-    if m is None:
+    doctype = _get_doctype(text)
+    if doctype is None:
         return False
-    doctype = m.group(2)
     return re.compile(regex).match(doctype.strip()) is not None
 
 
@@ -191,13 +231,58 @@ def looks_like_xml(text):
     try:
         return _looks_like_xml_cache[key]
     except KeyError:
-        m = doctype_lookup_re.match(text)
-        if m is not None:
+        if _get_doctype(text) is not None:
             return True
         rv = tag_re.search(text[:1000]) is not None
         _looks_like_xml_cache[key] = rv
         return rv
 
+# Escaping of token values for the text formatters
+
+def make_escaper(table, pattern=None, cachesize=10000, maxlength=20):
+    """
+    Return a function that replaces all characters of a string which are
+    keys of `table` with the corresponding values, in a single pass.
+
+    `pattern` is a regular expression matching the characters to replace;
+    by default it matches the keys of `table`.  To compute replacements on
+    demand, `table` can be a dict subclass with a ``__missing__`` method.
+
+    Strings without such characters are returned unchanged.  Otherwise
+    the results for Unicode strings of at most `maxlength` characters,
+    like operators and identifiers, are cached; the cache is emptied when
+    it grows beyond `cachesize` entries.
+    """
+    if pattern is None:
+        pattern = u'[%s]' % u''.join([re.escape(c) for c in table])
+    regex = re.compile(pattern)
+    search = regex.search
+    sub = regex.sub
+    cache = {}
+
+    def replace(match):
+        return table[match.group()]
+
+    def escape(text):
+        if search(text) is None:
+            # most values need no escaping at all
+            return text
+        if text.__class__ is not unicode or len(text) > maxlength:
+            return sub(replace, text)
+        result = cache.get(text)
+        if result is None:
+            if len(cache) >= cachesize:
+                cache.clear()
+            result = cache[text] = sub(replace, text)
+        return result
+    return escape
+
+
+#: Escape &, <, > as well as single and double quotes for HTML.
+escape_html = make_escaper({'&': '&amp;', '<': '&lt;', '>': '&gt;',
+                            '"': '&quot;', "'": '&#39;'})
+
+
 # Python 2/3 compatibility
 
 if sys.version_info < (3,0):
@@ -220,3 +305,40 @@ else:
     import io
     BytesIO = io.BytesIO
     StringIO = io.StringIO
+
+
+# Binary raw token format, see `RawTokenFormatter`
+
+#: Magic bytes starting a binary raw token stream, followed by a
+#: version byte.
+RAW_TOKEN_MAGIC = b('\x00PYGTOK')
+RAW_TOKEN_VERSION = 1
+
+
+def encode_varint(n):
+    """
+    Encode a non-negative integer as a little-endian base 128 varint.
+    """
+    if n < 0x80:
+        return chr(n)
+    buf = []
+    while n >= 0x80:
+        buf.append(chr(n & 0x7f | 0x80))
+        n >>= 7
+    buf.append(chr(n))
+    return ''.join(buf)
+
+
+def decode_varint(data, pos):
+    """
+    Decode the varint starting at `pos` in `data`.  Return the integer and
+    the position after it.
+    """
+    result = shift = 0
+    while 1:
+        byte = ord(data[pos])
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
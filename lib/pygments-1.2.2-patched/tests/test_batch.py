@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+    Batch highlighting tests
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments import highlight, batch
+from pygments.batch import highlight_many
+from pygments.lexers import get_lexer_by_name
+from pygments.formatters import get_formatter_by_name
+
+
+ITEMS = [
+    (u'def f(x):\n    return x\n', 'python', {}),
+    (u'int main() { return 0; }\n', 'c', {'linenos': True}),
+    (u'x = 1\n', 'python', {'stripall': True, 'cssclass': 'code'}),
+    (u'<p>a</p>\n', 'html', {}),
+] * 5
+
+
+def expected(formatter_name='html'):
+    return [highlight(code, get_lexer_by_name(name, **options),
+                      get_formatter_by_name(formatter_name, **options))
+            for code, name, options in ITEMS]
+
+
+class HighlightManyTest(unittest.TestCase):
+
+    def test_serial(self):
+        self.assertEqual(list(highlight_many(ITEMS)), expected())
+        self.assertEqual(list(highlight_many(ITEMS, 'latex')),
+                         expected('latex'))
+
+    def test_threads(self):
+        self.assertEqual(list(highlight_many(ITEMS, jobs=3, threads=True,
+                                             chunksize=2)), expected())
+
+    def test_processes(self):
+        self.assertEqual(list(highlight_many(ITEMS, jobs=3, chunksize=2)),
+                         expected())
+
+    def test_instances_reused(self):
+        batch._local.instances = {}
+        list(highlight_many(ITEMS))
+        # one lexer per distinct name and options, and one formatter per
+        # distinct options
+        self.assertEqual(len(batch._local.instances), 4 + 3)
+        lexer = batch._get_instance(get_lexer_by_name, 'python',
+                                    {'stripall': True, 'cssclass': 'code'})
+        self.assert_(lexer is batch._get_instance(
+            get_lexer_by_name, 'python', dict(cssclass='code', stripall=True)))
+        self.assert_(lexer is not batch._get_instance(
+            get_lexer_by_name, 'python', {'stripall': False}))
+        # options that cannot be keyed give new instances every time
+        options = {'extra': object()}
+        self.assert_(batch._get_instance(get_lexer_by_name, 'python', options)
+                     is not batch._get_instance(get_lexer_by_name, 'python',
+                                                options))
+
+
+if __name__ == '__main__':
+    unittest.main()
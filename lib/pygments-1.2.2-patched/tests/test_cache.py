@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+    Highlighting cache tests
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from pygments import highlight
+from pygments.cache import MemoryCache, SQLiteCache, DirectoryCache, \
+     make_key, Uncacheable
+from pygments.lexers import PythonLexer
+from pygments.formatters import HtmlFormatter
+from pygments.filters import get_filter_by_name
+
+
+CODE = u'def f(x):\n    return x\n'
+
+
+class Opaque(object):
+    pass
+
+
+class KeyTest(unittest.TestCase):
+
+    def test_equal_objects(self):
+        cache = MemoryCache()
+        def key():
+            lexer = PythonLexer(stripall=True)
+            lexer.add_filter(get_filter_by_name('keywordcase', case='upper'))
+            formatter = HtmlFormatter(linenos=True, style='emacs')
+            return cache.highlight_key(CODE, lexer, formatter)
+        self.assertEqual(key(), key())
+        self.assertNotEqual(key(), cache.highlight_key(
+            CODE, PythonLexer(stripall=True), HtmlFormatter(linenos=True)))
+
+    def test_make_key(self):
+        self.assertEqual(make_key({'a': [1, u'b'], 'c': set([2, 3])}),
+                         make_key({'c': frozenset([3, 2]), 'a': [1, u'b']}))
+        self.assertEqual(make_key(PythonLexer(stripall=True)),
+                         make_key(PythonLexer(stripall=True)))
+        self.assertNotEqual(make_key(PythonLexer()), make_key(PythonLexer))
+        self.assertRaises(Uncacheable, make_key, lambda: 1)
+        self.assertRaises(Uncacheable, make_key, [Opaque()])
+
+    def test_uncacheable(self):
+        cache = MemoryCache()
+        lexer = PythonLexer(extra=Opaque())
+        expected = highlight(CODE, PythonLexer(), HtmlFormatter())
+        for i in range(2):
+            self.assertEqual(highlight(CODE, lexer, HtmlFormatter(),
+                                       cache=cache), expected)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+
+
+class StoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_directory_replace(self):
+        cache = DirectoryCache(self.directory)
+        for i in range(3):
+            cache.set('abcd', 'x' * 10)
+        self.assertEqual(cache.size, 11)
+        self.assertEqual(DirectoryCache(self.directory).size, 11)
+
+    def test_sqlite_size(self):
+        filename = os.path.join(self.directory, 'cache.db')
+        cache = SQLiteCache(filename, maxsize=30)
+        def total():
+            db = sqlite3.connect(filename)
+            try:
+                return (db.execute('SELECT total FROM highlight_size')
+                        .fetchone()[0],
+                        db.execute('SELECT SUM(size) FROM highlight')
+                        .fetchone()[0])
+            finally:
+                db.close()
+        cache.set('a', 'x' * 10)
+        cache.set('b', 'x' * 10)
+        cache.set('a', 'x' * 5)
+        self.assertEqual(total(), (15, 15))
+        # the waiting access time of 'a' makes 'b' the oldest entry
+        self.assertEqual(cache.get('a'), 'x' * 5)
+        cache.set('c', 'x' * 20)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 'x' * 5)
+        self.assertEqual(total(), (25, 25))
+        cache.close()
+        # the total is kept across connections
+        cache = SQLiteCache(filename, maxsize=30)
+        cache.set('d', 'x' * 10)
+        self.assertEqual(cache.get('c'), None)
+        self.assertEqual(total(), (15, 15))
+        cache.clear()
+        self.assertEqual(total(), (0, None))
+        cache.close()
+
+    def test_sqlite_atime_batch(self):
+        filename = os.path.join(self.directory, 'cache.db')
+        cache = SQLiteCache(filename)
+        cache.set('a', 'x')
+        def atime():
+            db = sqlite3.connect(filename)
+            try:
+                return db.execute('SELECT atime FROM highlight').fetchone()[0]
+            finally:
+                db.close()
+        written = atime()
+        cache.get('a')
+        self.assertEqual(atime(), written)
+        cache.close()
+        self.assert_(atime() > written)
+
+    def test_sqlite_threads(self):
+        cache = SQLiteCache(os.path.join(self.directory, 'cache.db'))
+        errors = []
+        def work(n):
+            try:
+                key = '%040x' % n
+                cache.set(key, u'value %d' % n)
+                if cache.get(key) != u'value %d' % n:
+                    errors.append(n)
+            except Exception, err:
+                errors.append(err)
+        threads = [threading.Thread(target=work, args=(n,))
+                   for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.get('%040x' % 3), u'value 3')
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    Command line batch mode tests
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import StringIO
+
+from pygments import cmdline
+from pygments.batch import _write_atomic
+
+
+FILES = {
+    'a.py': 'def f(x):\n    return x\n',
+    'sub/b.c': 'int main() { return 0; }\n',
+    'sub/deeper/c.rb': 'puts "\xe4"\n',
+    'unknown.zzz': 'what is this\n',
+    '.hidden.py': 'x = 1\n',
+    '.hidden/d.py': 'y = 2\n',
+}
+
+
+def run_cmdline(*args):
+    saved = sys.stdout, sys.stderr
+    sys.stdout = StringIO.StringIO()
+    sys.stderr = StringIO.StringIO()
+    try:
+        status = cmdline.main(['pygmentize'] + list(args))
+        return status, sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = saved
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.src = os.path.join(self.directory, 'src')
+        for name, data in FILES.iteritems():
+            path = os.path.join(self.src, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            f = open(path, 'wb')
+            f.write(data)
+            f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def read(self, path):
+        f = open(path, 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def outputs(self, outdir):
+        result = {}
+        for dirpath, dirnames, filenames in os.walk(outdir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                result[path[len(outdir):].lstrip(os.sep)] = self.read(path)
+        return result
+
+    def single(self, infn, *args):
+        # the output of pygmentize for one file
+        outfn = self.path('single.html')
+        self.assertEqual(run_cmdline(*(args + ('-o', outfn, infn)))[0], 0)
+        return self.read(outfn)
+
+    def test_directory(self):
+        outdir = self.path('out')
+        status, out, err = run_cmdline('-o', outdir + '/', self.src)
+        self.assertEqual(status, 0)
+        self.assert_(err.startswith('3 files highlighted, 1 skipped, '
+                                    '0 failed'), err)
+        outputs = self.outputs(outdir)
+        self.assertEqual(sorted(outputs),
+                         ['a.py.html', 'sub/b.c.html', 'sub/deeper/c.rb.html'])
+        for name in ('a.py', 'sub/b.c', 'sub/deeper/c.rb'):
+            self.assertEqual(outputs[name + '.html'],
+                             self.single(os.path.join(self.src, name)))
+
+    def test_jobs(self):
+        run_cmdline('-f', 'latex', '-o', self.path('serial') + '/', self.src)
+        status, out, err = run_cmdline('--jobs', '2', '-f', 'latex',
+                                       '-o', self.path('parallel') + '/',
+                                       self.src)
+        self.assertEqual(status, 0)
+        outputs = self.outputs(self.path('parallel'))
+        self.assertEqual(sorted(outputs), ['a.py.tex', 'sub/b.c.tex',
+                                           'sub/deeper/c.rb.tex'])
+        self.assertEqual(outputs, self.outputs(self.path('serial')))
+        self.assertEqual(outputs['sub/b.c.tex'],
+                         self.single(os.path.join(self.src, 'sub/b.c'),
+                                     '-f', 'latex'))
+
+    def test_options(self):
+        # lexer, options and filters apply to every file
+        outdir = self.path('out')
+        args = ('-l', 'text', '-O', 'linenos=1', '-F', 'keywordcase')
+        status, out, err = run_cmdline(*(args + ('-o', outdir + '/',
+                                                 self.src)))
+        self.assertEqual(status, 0)
+        outputs = self.outputs(outdir)
+        self.assertEqual(len(outputs), 4)
+        self.assertEqual(outputs['unknown.zzz.html'],
+                         self.single(os.path.join(self.src, 'unknown.zzz'),
+                                     *args))
+
+    def test_files(self):
+        # files given as arguments go directly into the output directory,
+        # and must match a lexer
+        outdir = self.path('out')
+        status, out, err = run_cmdline(
+            '-o', outdir + '/', os.path.join(self.src, 'sub/b.c'),
+            os.path.join(self.src, 'unknown.zzz'))
+        self.assertEqual(status, 1)
+        self.assert_('cannot highlight' in err and 'unknown.zzz' in err, err)
+        self.assertEqual(sorted(self.outputs(outdir)), ['b.c.html'])
+        # unless -g is given
+        status, out, err = run_cmdline(
+            '-g', '-o', outdir + '/', os.path.join(self.src, 'unknown.zzz'))
+        self.assertEqual(status, 0)
+
+    def test_collect_files(self):
+        # the output directory is not highlighted again
+        outdir = os.path.join(self.src, 'out')
+        os.mkdir(outdir)
+        open(os.path.join(outdir, 'old.py'), 'wb').close()
+        items = cmdline._collect_files([self.src], outdir, '.html')
+        self.assertEqual([item[0][len(self.src):] for item in items],
+                         ['/a.py', '/unknown.zzz', '/sub/b.c',
+                          '/sub/deeper/c.rb'])
+        self.assertEqual(items[2], (os.path.join(self.src, 'sub/b.c'),
+                                    os.path.join(outdir, 'sub/b.c.html'),
+                                    False))
+
+    def test_conflict(self):
+        os.mkdir(self.path('other'))
+        shutil.copy(os.path.join(self.src, 'a.py'), self.path('other'))
+        status, out, err = run_cmdline(
+            '-o', self.path('out') + '/', os.path.join(self.src, 'a.py'),
+            self.path('other', 'a.py'))
+        self.assertEqual(status, 1)
+        self.assert_('would both be written' in err)
+        self.assert_(not os.path.exists(self.path('out')))
+
+    def test_usage(self):
+        for args in [('--jobs', '0', '-o', self.path('out') + '/', self.src),
+                     ('--jobs', '2', self.src),
+                     ('-s', '-o', self.path('out') + '/', self.src),
+                     ('-o', self.path('out') + '/')]:
+            self.assertEqual(run_cmdline(*args)[0], 2, args)
+
+    def test_write_atomic(self):
+        path = self.path('new', 'file')
+        _write_atomic(path, 'a')
+        _write_atomic(path, 'b')
+        self.assertEqual(self.read(path), 'b')
+        # a failed write leaves the old file and no temporary file
+        self.assertRaises(TypeError, _write_atomic, path, None)
+        self.assertEqual(self.read(path), 'b')
+        self.assertEqual(os.listdir(self.path('new')), ['file'])
+
+
+if __name__ == '__main__':
+    unittest.main()
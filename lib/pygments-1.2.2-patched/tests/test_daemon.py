@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    pygmentize server tests
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import tempfile
+import unittest
+import subprocess
+
+import pygments
+from pygments.daemon import request
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(pygments.__file__)))
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'socket')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def start(self):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        process = subprocess.Popen(
+            [sys.executable, '-c', 'import sys; from pygments.daemon import '
+             'serve; serve(sys.argv[1])', self.path], env=env)
+        # wait until the server accepts connections
+        for i in range(200):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                try:
+                    probe.connect(self.path)
+                    break
+                except socket.error:
+                    time.sleep(0.05)
+            finally:
+                probe.close()
+        return process
+
+    def test_sigterm(self):
+        process = self.start()
+        try:
+            status, out, err = request(self.path, ['pygmentize', '-l',
+                                                   'python'], 'x = 1\n')
+            self.assertEqual((status, err), (0, ''))
+            self.assert_('x' in out)
+        finally:
+            os.kill(process.pid, signal.SIGTERM)
+            process.wait()
+        self.assertEqual(process.returncode, 0)
+        self.assert_(not os.path.exists(self.path))
+
+    def client(self, *args):
+        # run the thin client, reporting the Pygments modules it imported
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        process = subprocess.Popen(
+            [sys.executable, '-c', 'import sys; from pygments.client import '
+             'main; status = main(sys.argv); print >>sys.stderr, sorted(['
+             'name for name in sys.modules if name.startswith("pygments") '
+             'and sys.modules[name]]); sys.exit(status)', self.path] +
+            list(args), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, env=env)
+        out, err = process.communicate('x = 1\n')
+        return process.returncode, out, eval(err.splitlines()[-1])
+
+    def test_client(self):
+        process = self.start()
+        try:
+            status, out, modules = self.client('-l', 'python')
+            self.assertEqual(status, 0)
+            self.assert_('x' in out)
+            self.assertEqual(modules, ['pygments', 'pygments.client',
+                                       'pygments.daemon', 'pygments.util'])
+        finally:
+            os.kill(process.pid, signal.SIGTERM)
+            process.wait()
+        # without a server, the client does the work itself
+        status, out, modules = self.client('-l', 'python')
+        self.assertEqual(status, 0)
+        self.assert_('x' in out)
+        self.assert_('pygments.cmdline' in modules)
+
+    def test_stale_socket(self):
+        # a socket without a server is replaced
+        process = self.start()
+        os.kill(process.pid, signal.SIGKILL)
+        process.wait()
+        self.assert_(os.path.exists(self.path))
+        process = self.start()
+        try:
+            status, out, err = request(self.path, ['pygmentize', '-V'])
+            self.assertEqual(status, 0)
+        finally:
+            os.kill(process.pid, signal.SIGTERM)
+            process.wait()
+        self.assert_(not os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
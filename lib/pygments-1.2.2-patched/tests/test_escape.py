@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+    Escaping tests
+    ~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments.util import make_escaper, escape_html
+from pygments.formatters import RtfFormatter
+from pygments.formatters.latex import _get_tex_escaper, escape_tex
+from pygments.formatters.rtf import _TextEscapes
+
+
+TEXTS = [
+    u'',
+    u'plain',
+    u'<a href="x" title=\'y\'>&amp;</a>',
+    u'\\begin{x}^2_i {}} \\\\',
+    u'\x00\x01\x02\x03\x04 control characters',
+    u'line\nline\r\n',
+    u'\x7f\x81 \xe4\xf6\xfc\xdf \u20ac \u0434\u0430 \u4e2d\u6587',
+    u'non-BMP \U0001f600 \U00010400<\U0002070e>',
+    u'\ud83d\ude00 \ud800 lone surrogates',
+    u'long ' * 10 + u'&<{}\\\xe4',
+]
+
+
+# the escaping as it was done with chains of replace() calls and a loop
+# over the characters, except that the encoded byte \x80 is escaped too
+
+def replace_html(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;'). \
+                replace('>', '&gt;').replace('"', '&quot;'). \
+                replace("'", '&#39;')
+
+
+def replace_tex(text, commandprefix):
+    for c, name in [('\\', 'Zbs'), ('{', 'Zob'), ('}', 'Zcb'),
+                    ('^', 'Zca'), ('_', 'Zus')]:
+        text = text.replace(c, u'\uffff%s\ufffe' % name)
+    return text.replace(u'\uffff', u'\\' + commandprefix). \
+                replace(u'\ufffe', u'{}')
+
+
+def replace_rtf(text, encoding):
+    text = text.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}')
+    buf = []
+    for c in text:
+        if ord(c) > 128:
+            ansic = c.encode(encoding, 'ignore') or '?'
+            if ord(ansic) > 127:
+                ansic = '\\\'%x' % ord(ansic)
+            else:
+                ansic = c
+            buf.append(r'\ud{\u%d%s}' % (ord(c), ansic))
+        else:
+            buf.append(str(c))
+    return ''.join(buf).replace('\n', '\\par\n')
+
+
+class MakeEscaperTest(unittest.TestCase):
+
+    def test_escape(self):
+        escape = make_escaper({'a': '1', 'b': '22', u'\xe4': 'ae'})
+        self.assertEqual(escape(u'abc\xe4'), u'122cae')
+        self.assertEqual(escape(u'xyz'), u'xyz')
+        # byte strings stay byte strings
+        self.assertEqual(escape('abc'), '122c')
+        self.assert_(type(escape('abc')) is str)
+        unchanged = u'xyz 123'
+        self.assert_(escape(unchanged) is unchanged)
+
+    def test_cache(self):
+        escape = make_escaper({'<': '&lt;'}, cachesize=3, maxlength=5)
+        for i in range(10):
+            text = u'<%d' % i
+            self.assertEqual(escape(text), u'&lt;%d' % i)
+            # cached results are returned
+            self.assert_(escape(text) is escape(text))
+        long = u'<' * 6
+        self.assertEqual(escape(long), u'&lt;' * 6)
+        self.assert_(escape(long) is not escape(long))
+
+    def test_missing(self):
+        class Table(dict):
+            def __missing__(self, c):
+                result = self[c] = u'&#%d;' % ord(c)
+                return result
+        table = Table({'&': '&amp;'})
+        escape = make_escaper(table, u'[&]|[^\x00-\x7f]')
+        self.assertEqual(escape(u'a & \xe4\U0001f600'),
+                         u'a &amp; &#228;&#128512;')
+        self.assertEqual(sorted(table), [u'&', u'\xe4', u'\U0001f600'])
+
+
+class FormatterEscapeTest(unittest.TestCase):
+
+    def test_html(self):
+        for text in TEXTS:
+            self.assertEqual(escape_html(text), replace_html(text))
+            self.assertEqual(escape_html(text.encode('utf-8')),
+                             replace_html(text.encode('utf-8')))
+        self.assertEqual(escape_html(u'<a b="c" d=\'e\'>&</a>'),
+                         u'&lt;a b=&quot;c&quot; d=&#39;e&#39;&gt;&amp;'
+                         u'&lt;/a&gt;')
+
+    def test_tex(self):
+        for prefix in ('PY', 'C', 'Zz'):
+            self.assert_(_get_tex_escaper(prefix) is _get_tex_escaper(prefix))
+            for text in TEXTS:
+                self.assertEqual(escape_tex(text, prefix),
+                                 replace_tex(text, prefix))
+        self.assertEqual(escape_tex(u'\\x{y}^_', 'PY'),
+                         u'\\PYZbs{}x\\PYZob{}y\\PYZcb{}\\PYZca{}\\PYZus{}')
+
+    def test_rtf(self):
+        for encoding in ('iso-8859-15', 'cp1252', 'cp1251', 'ascii'):
+            formatter = RtfFormatter(encoding=encoding)
+            for text in TEXTS:
+                self.assertEqual(formatter._escape_text(text),
+                                 replace_rtf(text, encoding),
+                                 (encoding, text))
+        formatter = RtfFormatter(encoding='utf-8')
+        self.assertEqual(formatter._escape_text(u'{\xe4\u20ac}\n'),
+                         '\\{\\ud{\\u228\\\'e4}\\ud{\\u8364\\\'a4}\\}\\par\n')
+        # \x80 is escaped like the characters above it
+        self.assertEqual(formatter._escape_text(u'\x80'),
+                         '\\ud{\\u128\\\'80}')
+        formatter = RtfFormatter(encoding='cp1252')
+        self.assertEqual(formatter._escape_text(u'\u20ac'),
+                         '\\ud{\\u8364\\\'80}')
+        # characters the encoding does not have are kept as they are
+        self.assertEqual(formatter._escape_text(u'\U0001f600'),
+                         u'\\ud{\\u128512\U0001f600}')
+
+    def test_rtf_missing(self):
+        table = _TextEscapes('cp1251')
+        self.assertEqual(table[u'\u0434'], '\\ud{\\u1076\\\'e4}')
+        self.assertEqual(table[u'\xe4'], u'\\ud{\\u228\xe4}')
+        self.assert_(u'\u0434' in table and u'\xe4' in table)
+        self.assertEqual(table['{'], '\\{')
+
+
+if __name__ == '__main__':
+    unittest.main()
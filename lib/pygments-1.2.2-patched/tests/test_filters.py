@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+    Filter tests
+    ~~~~~~~~~~~~
+
+    Builtin filters and combinations of them must give the same tokens
+    when fused by `apply_filters` as when every filter is applied on its
+    own, and the same as the generators they were before.
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import re
+import unittest
+
+from pygments.lexers import PythonLexer
+from pygments.filter import apply_filters, simplefilter
+from pygments.filters import get_filter_by_name, FILTERS, ErrorToken
+from pygments.token import Token, String, Comment, Keyword, Name, Error, \
+     Whitespace
+
+
+TEXT = u'''\
+#!/usr/bin/env python
+    # XXX: gobbled, TODO too
+def f(a,\tb):
+    """NOTE the docstring
+    spans lines"""
+    if a and not b:  # BUG
+        return None
+    return "string\twith  spaces"
+
+class Foo(object):
+    pass
+'''
+
+#: Builtin filters with options covering their special cases.
+FILTER_OPTIONS = [
+    ('codetagify', {}),
+    ('codetagify', {'codetags': 'spans Foo'}),
+    ('keywordcase', {}),
+    ('keywordcase', {'case': 'lower'}),
+    ('keywordcase', {'case': 'upper'}),
+    ('keywordcase', {'case': 'capitalize'}),
+    ('highlight', {'names': 'a b Foo'}),
+    ('highlight', {'names': 'object', 'tokentype': 'Name.Builtin'}),
+    ('raiseonerror', {}),
+    ('whitespace', {}),
+    ('whitespace', {'spaces': True, 'tabs': True, 'newlines': True}),
+    ('whitespace', {'spaces': '_', 'tabs': '>', 'tabsize': 4}),
+    ('whitespace', {'spaces': True, 'newlines': True,
+                    'wstokentype': False}),
+    ('whitespace', {'tabs': True, 'wstokentype': False}),
+    ('gobble', {}),
+    ('gobble', {'n': 2}),
+    ('gobble', {'n': 4}),
+    ('gobble', {'n': 100}),
+    ('tokenmerge', {}),
+]
+
+STACKS = [
+    [('whitespace', {'spaces': True}), ('codetagify', {}),
+     ('tokenmerge', {}), ('keywordcase', {'case': 'upper'})],
+    [('whitespace', {'spaces': True, 'wstokentype': False}),
+     ('codetagify', {}), ('tokenmerge', {}),
+     ('keywordcase', {'case': 'capitalize'})],
+    [('gobble', {'n': 4}), ('whitespace', {'spaces': True, 'tabs': True})],
+    [('gobble', {'n': 2}), ('whitespace', {'newlines': True,
+                                           'wstokentype': False})],
+    [('whitespace', {'spaces': True}), ('gobble', {'n': 4})],
+    [('codetagify', {}), ('keywordcase', {}), ('highlight', {'names': 'f'}),
+     ('raiseonerror', {}), ('gobble', {'n': 1}), ('tokenmerge', {})],
+    [('codetagify', {'codetags': 'NOTE'}), ('codetagify', {}),
+     ('whitespace', {'spaces': True})],
+]
+
+
+@simplefilter
+def uppercase(self, lexer, stream, options):
+    for ttype, value in stream:
+        yield ttype, value.upper()
+
+
+# the builtin filters as they were implemented before they could be fused
+
+def _replace_special(ttype, value, regex, specialttype,
+                     replacefunc=lambda x: x):
+    last = 0
+    for match in regex.finditer(value):
+        start, end = match.start(), match.end()
+        if start != last:
+            yield ttype, value[last:start]
+        yield specialttype, replacefunc(value[start:end])
+        last = end
+    if last != len(value):
+        yield ttype, value[last:]
+
+def codetagify(self, stream):
+    for ttype, value in stream:
+        if ttype in String.Doc or \
+           ttype in Comment and ttype not in Comment.Preproc:
+            for item in _replace_special(ttype, value, self.tag_re,
+                                         Comment.Special):
+                yield item
+        else:
+            yield ttype, value
+
+def keywordcase(self, stream):
+    for ttype, value in stream:
+        if ttype in Keyword:
+            yield ttype, self.convert(value)
+        else:
+            yield ttype, value
+
+def highlight(self, stream):
+    for ttype, value in stream:
+        if ttype is Name and value in self.names:
+            yield self.tokentype, value
+        else:
+            yield ttype, value
+
+def raiseonerror(self, stream):
+    for ttype, value in stream:
+        if ttype is Error:
+            raise self.exception(value)
+        yield ttype, value
+
+def whitespace(self, stream):
+    if self.wstt:
+        spaces = self.spaces or ' '
+        tabs = self.tabs or '\t'
+        newlines = self.newlines or '\n'
+        regex = re.compile(r'\s')
+        def replacefunc(wschar):
+            if wschar == ' ':
+                return spaces
+            elif wschar == '\t':
+                return tabs
+            elif wschar == '\n':
+                return newlines
+            return wschar
+        for ttype, value in stream:
+            for item in _replace_special(ttype, value, regex, Whitespace,
+                                         replacefunc):
+                yield item
+    else:
+        spaces, tabs, newlines = self.spaces, self.tabs, self.newlines
+        for ttype, value in stream:
+            if spaces:
+                value = value.replace(' ', spaces)
+            if tabs:
+                value = value.replace('\t', tabs)
+            if newlines:
+                value = value.replace('\n', newlines)
+            yield ttype, value
+
+def gobble(self, stream):
+    n = self.n
+    left = n
+    for ttype, value in stream:
+        parts = value.split('\n')
+        (parts[0], left) = self.gobble(parts[0], left)
+        for i in range(1, len(parts)):
+            (parts[i], left) = self.gobble(parts[i], n)
+        value = '\n'.join(parts)
+        if value != '':
+            yield ttype, value
+
+def tokenmerge(self, stream):
+    current_type = None
+    current_value = None
+    for ttype, value in stream:
+        if ttype is current_type:
+            current_value += value
+        else:
+            if current_type is not None:
+                yield current_type, current_value
+            current_type = ttype
+            current_value = value
+    if current_type is not None:
+        yield current_type, current_value
+
+REFERENCE = {
+    'codetagify': codetagify,
+    'keywordcase': keywordcase,
+    'highlight': highlight,
+    'raiseonerror': raiseonerror,
+    'whitespace': whitespace,
+    'gobble': gobble,
+    'tokenmerge': tokenmerge,
+}
+
+
+def make_filters(stack):
+    return [get_filter_by_name(name, **options) for name, options in stack]
+
+
+def reference(tokens, stack):
+    stream = iter(tokens)
+    for (name, options), filter_ in zip(stack, make_filters(stack)):
+        stream = REFERENCE[name](filter_, stream)
+    return list(stream)
+
+
+def chained(tokens, filters):
+    stream = iter(tokens)
+    for filter_ in filters:
+        stream = filter_.filter(None, stream)
+    return list(stream)
+
+
+def fused(tokens, filters):
+    return list(apply_filters(iter(tokens), filters))
+
+
+class FilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tokens = list(PythonLexer().get_tokens(TEXT))
+
+    def assertFused(self, stack):
+        # fresh filters for every run, as filters may keep state
+        expected = reference(self.tokens, stack)
+        self.assertEqual(chained(self.tokens, make_filters(stack)), expected,
+                         stack)
+        self.assertEqual(fused(self.tokens, make_filters(stack)), expected,
+                         stack)
+
+    def test_options(self):
+        for name, options in FILTER_OPTIONS:
+            self.assertFused([(name, options)])
+
+    def test_all_filters_tested(self):
+        tested = set([name for name, options in FILTER_OPTIONS])
+        self.assertEqual(tested, set(FILTERS))
+        self.assertEqual(set(REFERENCE), set(FILTERS))
+
+    def test_stacks(self):
+        for stack in STACKS:
+            self.assertFused(stack)
+
+    def test_pairs(self):
+        for first in FILTER_OPTIONS:
+            for second in FILTER_OPTIONS:
+                self.assertFused([first, second])
+
+    def test_unfusable(self):
+        # filters that implement filter() split the fused runs
+        stack = [get_filter_by_name('whitespace', spaces=True), uppercase(),
+                 get_filter_by_name('keywordcase', case='lower')]
+        self.assertEqual(fused(self.tokens, stack),
+                         chained(self.tokens, stack))
+
+    def test_results(self):
+        tokens = [(Name, u'a b'), (Token.Keyword, u'iF'), (Name, u'b')]
+        filters = [get_filter_by_name('highlight', names=['b']),
+                   get_filter_by_name('whitespace', spaces='_'),
+                   get_filter_by_name('keywordcase', case='capitalize')]
+        self.assertEqual(fused(tokens, filters),
+                         [(Name, u'a'), (Token.Text.Whitespace, u'_'),
+                          (Name, u'b'), (Token.Keyword, u'If'),
+                          (Name.Function, u'b')])
+        filters = [get_filter_by_name('gobble', n=2)]
+        self.assertEqual(fused([(Name, u'ab\n'), (Name, u'cd')], filters),
+                         [(Name, u'\n')])
+
+    def test_raiseonerror(self):
+        filters = [get_filter_by_name('raiseonerror')]
+        stream = apply_filters(iter([(Name, u'a'), (Error, u'!')]), filters)
+        self.assertEqual(stream.next(), (Name, u'a'))
+        self.assertRaises(ErrorToken, stream.next)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    Lexer guessing tests
+    ~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments import lexers
+from pygments.lexers import guess_lexer, _iter_lexerclasses
+from pygments.util import shebang_command, shebang_matches, \
+     doctype_matches, html_doctype_matches, looks_like_xml
+
+
+TEXTS = [
+    u'#!/usr/bin/env python\nprint 1\n',
+    u'#!/usr/bin/perl\nprint 1;\n',
+    u'#!/usr/bin/ruby\nputs 1\n',
+    u'#!/usr/bin/env ruby1.8\nputs 1\n',
+    u'#!C:\\Python\\python.exe\nx = 1\n',
+    u'#!/bin/sh\necho 1\n',
+    u'#!/usr/bin/env php\n<?php echo 1; ?>\n',
+    u'<?xml version="1.0"?>\n<a/>\n',
+    u'<!DOCTYPE html PUBLIC "-//W3C//DTD HTML 4.01//EN">\n<p>\n',
+    # decided by the text after the rated prefix
+    u'x\n' * 40000 + u'<% a %>\n',
+]
+
+
+def rate_all(text):
+    """
+    Return the class of the first lexer with the highest rating, asking
+    every lexer.
+    """
+    best = (0.0, None)
+    for lexer in _iter_lexerclasses():
+        rv = lexer.analyse_text(text)
+        if rv == 1.0:
+            return lexer
+        if rv > best[0]:
+            best = (rv, lexer)
+    return best[1]
+
+
+class GuessTest(unittest.TestCase):
+
+    def test_shebang_keeps_winner(self):
+        # the shebang only saves rating the lexers after the one it names
+        for text in TEXTS:
+            expected = rate_all(text)
+            self.assertEqual(guess_lexer(text).__class__, expected, text)
+            self.assertEqual(guess_lexer(text, _jobs=2).__class__, expected,
+                             text)
+
+    def test_pool_reused(self):
+        guess_lexer(TEXTS[0], _jobs=2)
+        pool = lexers._guess_pool
+        guess_lexer(TEXTS[1], _jobs=2)
+        self.assert_(lexers._guess_pool is pool)
+
+    def test_doctype(self):
+        html = u'<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN">'
+        self.assert_(html_doctype_matches(html))
+        self.assert_(html_doctype_matches(u'<?xml version="1.0"?>\n' + html))
+        self.assert_(doctype_matches(u'<!DOCTYPE svg PUBLIC "x">', 'svg'))
+        self.assert_(not doctype_matches(u'<!DOCTYPE svg PUBLIC "x">',
+                                         'html'))
+        self.assert_(not html_doctype_matches(u'<?php echo 1;\n<p>'))
+        self.assert_(looks_like_xml(u'<!DOCTYPE a b "c">'))
+        self.assert_(not looks_like_xml(u'<?php echo 1;\n'))
+
+    def test_shebang_command(self):
+        self.assertEqual(shebang_command(u'#!/usr/bin/env python -O\n'),
+                         u'python')
+        self.assertEqual(shebang_command(u'#!C:\\Perl\\bin\\Perl.EXE\n'),
+                         u'perl')
+        self.assertEqual(shebang_command(u'#!\n'), None)
+        self.assertEqual(shebang_command(u'print 1\n'), None)
+        self.assert_(shebang_matches(u'#!C:\\Perl\\bin\\perl.bat', r'perl'))
+        self.assert_(not shebang_matches(u'#!/usr/bin/perl.sh', r'perl'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+    Image formatter tests
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+from StringIO import StringIO
+
+from pygments import highlight
+from pygments.formatter import Formatter
+from pygments.lexers import PythonLexer
+from pygments.token import Text, Name, Operator, Comment, Keyword
+from pygments.formatters.img import ImageFormatter, FontNotFound, \
+     pil_available
+
+if pil_available:
+    import Image
+
+
+CODE = u'''\
+def AVA(To, Wa):
+    """Tea, LT, Yo, ff, fi -- WAVE."""
+    return {'AV': To.Wa, "x": [1, 2.5e-3]} # Tj, r.
+'''
+
+FONTS = ['Bitstream Vera Sans Mono', 'DejaVu Sans Mono', 'Liberation Mono',
+         'Courier New', 'DejaVu Sans', 'Liberation Serif']
+
+
+class UnjoinedImageFormatter(ImageFormatter):
+
+    def _can_join(self, font, left, right):
+        return False
+
+
+class FakeFont(object):
+    # a font with the given character widths and kerning pairs that
+    # records the measured texts
+
+    def __init__(self, widths={}, kerning={}):
+        self.widths = widths
+        self.kerning = kerning
+        self.measured = []
+
+    def getsize(self, text):
+        self.measured.append(text)
+        width = sum([self.widths.get(c, 10) for c in text])
+        for i in range(len(text) - 1):
+            width += self.kerning.get(text[i:i+2], 0)
+        return width, 14
+
+
+class FakeFontManager(object):
+
+    def __init__(self, font):
+        self.font = font
+
+    def get_font(self, bold, oblique):
+        return self.font
+
+
+class DrawCallFormatter(ImageFormatter):
+    # records the draw calls without needing PIL
+
+    def __init__(self, font, **options):
+        Formatter.__init__(self, **options)
+        self.styles = dict(self.style)
+        self.fonts = FakeFontManager(font)
+        self.fontw, self.fonth = font.getsize('M')
+        self.image_pad = 0
+        self.line_pad = 0
+        self.line_number_width = 0
+        self.drawables = []
+        self._text_widths = {}
+
+    def draw_calls(self, tokens):
+        self._create_drawables(tokens)
+        return [(pos, text, kw['fill'])
+                for pos, text, font, kw in self.drawables]
+
+
+def render(cls, font_name):
+    out = StringIO()
+    highlight(CODE, PythonLexer(), cls(font_name=font_name, style='emacs',
+                                       image_format='png'), out)
+    out.seek(0)
+    im = Image.open(out)
+    return im.size, list(im.getdata())
+
+
+class ImageFormatterTest(unittest.TestCase):
+
+    def test_joined_runs(self):
+        # drawing runs in one go must give the same pixels as drawing every
+        # fragment in its own cells, also with proportional fonts
+        if not pil_available:
+            self.skipTest('PIL is not installed')
+        tested = 0
+        for font_name in FONTS:
+            try:
+                expected = render(UnjoinedImageFormatter, font_name)
+            except FontNotFound:
+                continue
+            self.assertEqual(render(ImageFormatter, font_name), expected,
+                             font_name)
+            tested += 1
+        if not tested:
+            self.skipTest('none of the fonts is installed')
+
+
+class DrawCallTest(unittest.TestCase):
+
+    def draw_calls(self, tokens, **fontargs):
+        formatter = DrawCallFormatter(FakeFont(**fontargs), style='default')
+        return formatter.draw_calls(tokens)
+
+    def test_runs(self):
+        tokens = [(Name, u'foo'), (Text, u' '), (Name, u'bar'),
+                  (Operator, u'='), (Operator, u'+\n'), (Name, u'x'),
+                  (Comment, u'#a'), (Comment, u'b\n\tc')]
+        self.assertEqual(self.draw_calls(tokens), [
+            ((0, 0), u'foo bar', '#000'),
+            ((70, 0), u'=+', '#666666'),
+            ((0, 14), u'x', '#000'),
+            # italic fragments are drawn each on their own
+            ((10, 14), u'#a', '#408080'),
+            ((30, 14), u'b', '#408080'),
+            ((0, 28), u'    c', '#408080'),
+        ])
+
+    def test_metrics(self):
+        tokens = [(Name, u'VA'), (Text, u'A'), (Name, u'V'),
+                  (Keyword, u'ii'), (Keyword, u'x'), (Keyword, u'y')]
+        # kerning between fragments and fragments that do not fill their
+        # cells are not joined
+        self.assertEqual(self.draw_calls(tokens, widths={'i': 5},
+                                         kerning={'AV': -2}), [
+            ((0, 0), u'VAA', '#000'),
+            ((30, 0), u'V', '#000'),
+            ((40, 0), u'ii', '#008000'),
+            ((60, 0), u'xy', '#008000'),
+        ])
+
+    def test_linear(self):
+        # only the fragments and the pairs around the joins are measured
+        font = FakeFont()
+        formatter = DrawCallFormatter(font)
+        tokens = [(Name, u'abc')] * 1000
+        self.assertEqual(formatter.draw_calls(tokens),
+                         [((0, 0), u'abc' * 1000, '#000')])
+        self.assertEqual(sorted(set(font.measured)), [u'M', u'abc', u'ca'])
+
+
+if __name__ == '__main__':
+    unittest.main()
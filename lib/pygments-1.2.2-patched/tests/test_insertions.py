@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+    do_insertions tests
+    ~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments.lexer import do_insertions
+from pygments.token import Text, Name, Generic
+
+
+def insert(insertions, tokens):
+    return list(do_insertions(insertions, iter(tokens)))
+
+
+class InsertionsTest(unittest.TestCase):
+
+    def test_insertions(self):
+        tokens = [(0, Text, u'abc'), (3, Name, u'def')]
+        self.assertEqual(
+            insert([(0, [(0, Generic, u'>')]), (4, [(0, Generic, u'|')]),
+                    (6, [(0, Generic, u'<')])], tokens),
+            [(0, Text, u''), (0, Generic, u'>'), (1, Text, u'abc'),
+             (4, Name, u'd'), (5, Generic, u'|'), (6, Name, u'ef'),
+             (8, Generic, u'<'), (9, Name, u'')])
+        self.assertEqual(insert([], tokens), tokens)
+        self.assertEqual(insert([(0, [(0, Generic, u'>')])], []),
+                         [(0, Generic, u'>')])
+
+    def test_trailing_insertions(self):
+        # every insertion after the end of the tokens is made
+        tokens = [(0, Text, u'ab')]
+        self.assertEqual(
+            insert([(1, [(0, Generic, u'|')]), (5, [(0, Generic, u'>')]),
+                    (6, [(0, Generic, u'<'), (1, Name, u'x')])], tokens),
+            [(0, Text, u'a'), (1, Generic, u'|'), (2, Text, u'b'),
+             (3, Generic, u'>'), (4, Generic, u'<'), (5, Name, u'x')])
+        self.assertEqual(
+            insert([(0, [(0, Generic, u'>')]), (0, [(0, Generic, u'<')])],
+                   []),
+            [(0, Generic, u'>'), (1, Generic, u'<')])
+
+    def test_lazy(self):
+        # insertions are only taken when the tokens reach them
+        taken = []
+        def insertions():
+            for index in (1, 3):
+                taken.append(index)
+                yield index, [(0, Generic, u'|')]
+        stream = do_insertions(insertions(), iter([(0, Text, u'abcd')]))
+        self.assertEqual(stream.next(), (0, Text, u'a'))
+        self.assertEqual(taken, [1])
+        self.assertEqual(list(stream)[-1], (5, Text, u'd'))
+        self.assertEqual(taken, [1, 3])
+
+    def test_large_offsets(self):
+        # token positions are not limited to a fixed range
+        start = 0x7ffffff0
+        tokens = [(start, Text, u'x' * 32)]
+        self.assertEqual(
+            insert([(start + 20, [(0, Generic, u'>')])], tokens),
+            [(start, Text, u'x' * 20), (start + 20, Generic, u'>'),
+             (start + 21, Text, u'x' * 12)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+    Token table cache tests
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import sre_compile
+
+from pygments import lexercache
+from pygments.lexers import PythonLexer, CLexer, HtmlLexer, RstLexer
+from pygments.lexercache import TokenTableCache
+
+
+TEXTS = {
+    PythonLexer: u'@dec\ndef f(x=1, *a):\n    """doc"""\n    return x ** 2\n',
+    CLexer: u'#include <stdio.h>\nint main() { /* c */ return 0x1f; }\n',
+    HtmlLexer: u'<!-- c -->\n<p class="a">x &amp; y</p>\n'
+               u'<script>var a = 1;</script>\n',
+    RstLexer: u'Title\n=====\n\n.. code-block:: python\n\n    x = 1\n\n'
+              u'* item with ``code``\n',
+}
+
+
+class FailingSre(object):
+    # stands in for an _sre module that does not take the stored programs
+    MAGIC = lexercache._sre.MAGIC
+    CODESIZE = getattr(lexercache._sre, 'CODESIZE', '')
+
+    def compile(self, *args):
+        raise TypeError('unexpected arguments')
+
+
+class TokenTableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # process the classes without the cache first
+        for cls in TEXTS:
+            cls()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameTokens(self, cls, tokendefs):
+        lx = cls()
+        for text in (TEXTS[cls], TEXTS[cls] * 3):
+            self.assertEqual(
+                list(lx._iter_tokens(text, 0, ['root'], tokendefs)),
+                list(lx._iter_tokens(text, 0, ['root'], lx._tokens)))
+
+    def test_round_trip(self):
+        for cls in TEXTS:
+            TokenTableCache(self.directory).process_tokendef(cls)
+            # a new cache, as in a later process
+            cache = TokenTableCache(self.directory)
+            tokendefs = cache.process_tokendef(cls)
+            self.assert_(cache.hits > 0, cls)
+            self.assertEqual(cache.misses, 0, cls)
+            self.assertSameTokens(cls, tokendefs)
+
+    def test_stale(self):
+        cache = TokenTableCache(self.directory)
+        cache.process_tokendef(PythonLexer)
+        digest = cache.source_hash(PythonLexer)
+        self.assert_(cache.load(PythonLexer, digest))
+        # another version of the source
+        self.assertEqual(cache.load(PythonLexer, digest + '0'), {})
+        # another regular expression engine
+        key = lexercache._ENGINE_KEY
+        lexercache._ENGINE_KEY = key + '0'
+        try:
+            self.assertEqual(cache.load(PythonLexer, digest), {})
+            cache = TokenTableCache(self.directory)
+            cache.process_tokendef(PythonLexer)
+            self.assert_(cache.misses > 0)
+            # stored next to the programs for the other engine
+            self.assertEqual(len(os.listdir(self.directory)), 2)
+        finally:
+            lexercache._ENGINE_KEY = key
+        # a corrupt file
+        f = open(cache._path(PythonLexer), 'wb')
+        f.write('\x00garbage')
+        f.close()
+        self.assertEqual(cache.load(PythonLexer, digest), {})
+
+    def test_private_api_failures(self):
+        # without the programs, the expressions are compiled as usual
+        lexercache.sre_compile = object()
+        try:
+            cache = TokenTableCache(self.directory)
+            tokendefs = cache.process_tokendef(CLexer)
+        finally:
+            lexercache.sre_compile = sre_compile
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertSameTokens(CLexer, tokendefs)
+
+        TokenTableCache(self.directory).process_tokendef(CLexer)
+        sre = lexercache._sre
+        lexercache._sre = FailingSre()
+        try:
+            cache = TokenTableCache(self.directory)
+            tokendefs = cache.process_tokendef(CLexer)
+        finally:
+            lexercache._sre = sre
+        self.assertEqual(cache.hits, 0)
+        self.assertSameTokens(CLexer, tokendefs)
+
+
+if __name__ == '__main__':
+    unittest.main()
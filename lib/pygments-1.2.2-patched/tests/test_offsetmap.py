@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+    Offset map tests
+    ~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments.lexers import TextLexer, PythonLexer
+
+
+def lexed(lexer, text):
+    return u''.join([v for t, v in lexer.get_tokens(text)])
+
+
+class OffsetMapTest(unittest.TestCase):
+
+    def assertMapsBack(self, lexer, text):
+        """
+        Check that every character of the lexed text maps to the character
+        of `text` it was made from.
+        """
+        result = lexed(lexer, text)
+        offsets = lexer.get_offset_map(text)
+        if not isinstance(text, unicode):
+            text = text.decode('utf-8')
+        last = 0
+        for i, char in enumerate(result):
+            j = offsets(i)
+            self.assert_(j >= last, (text, i))
+            last = j
+            if j == len(text):
+                # the newline added at the end
+                self.assertEqual((char, i), (u'\n', len(result) - 1))
+            elif char == u'\n':
+                self.assert_(text[j] in u'\r\n', (text, i))
+            elif char == u' ' and text[j] == u'\t':
+                pass
+            else:
+                self.assertEqual(text[j], char, (text, i))
+
+    def test_unchanged(self):
+        lexer = TextLexer()
+        offsets = lexer.get_offset_map(u'abc\n')
+        self.assertEqual([offsets(i) for i in range(5)], [0, 1, 2, 3, 4])
+
+    def test_crlf(self):
+        lexer = TextLexer()
+        text = u'a\r\nbc\r\n\r\nd\re\n'
+        self.assertEqual(lexed(lexer, text), u'a\nbc\n\nd\ne\n')
+        offsets = lexer.get_offset_map(text)
+        self.assertEqual([offsets(i) for i in range(11)],
+                         [0, 1, 3, 4, 5, 7, 9, 10, 11, 12, 13])
+        self.assertMapsBack(lexer, text)
+        self.assertMapsBack(PythonLexer(), u'x = 1\r\nif x:\r\n    y\r\n')
+
+    def test_tabsize(self):
+        lexer = TextLexer(tabsize=4)
+        text = u'\ta\tb\n12\t\tc\n'
+        self.assertEqual(lexed(lexer, text), u'    a   b\n12      c\n')
+        offsets = lexer.get_offset_map(text)
+        # the spaces of a tab map to the tab
+        self.assertEqual([offsets(i) for i in range(10)],
+                         [0, 0, 0, 0, 1, 2, 2, 2, 3, 4])
+        self.assertEqual([offsets(i) for i in range(10, 19)],
+                         [5, 6, 7, 7, 8, 8, 8, 8, 9])
+        self.assertMapsBack(lexer, text)
+        self.assertMapsBack(TextLexer(tabsize=8), u'a\r\n\tb\r\n')
+
+    def test_stripping(self):
+        text = u'\n\n  \tx\n\n'
+        for options, result in [({}, u'  \tx\n'),
+                                ({'stripall': True}, u'x\n'),
+                                ({'stripnl': False}, text),
+                                ({'stripall': True, 'tabsize': 2}, u'x\n'),
+                                ({'tabsize': 2}, u'    x\n')]:
+            lexer = TextLexer(**options)
+            self.assertEqual(lexed(lexer, text), result, options)
+            self.assertMapsBack(lexer, text)
+        offsets = TextLexer(stripall=True).get_offset_map(text)
+        self.assertEqual(offsets(0), 5)
+        self.assertMapsBack(TextLexer(stripall=True, tabsize=4),
+                            u'\r\n \t\r\n\ta\tb\r\n  ')
+        self.assertMapsBack(TextLexer(), u'no newline')
+
+    def test_bytes(self):
+        # offsets refer to the decoded text
+        lexer = TextLexer(encoding='utf-8', stripall=True, tabsize=2)
+        text = u'  \xe4\r\n\t\u20ac\r\n'.encode('utf-8')
+        self.assertMapsBack(lexer, text)
+        offsets = lexer.get_offset_map(text)
+        self.assertEqual([offsets(i) for i in range(5)], [2, 3, 5, 5, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    Plugin discovery tests
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import imp
+import shutil
+import tempfile
+import unittest
+
+from pygments import plugin
+from pygments.plugin import get_plugins, invalidate_plugin_cache, \
+     write_plugin_mapping, LEXER_ENTRY_POINT, STYLE_ENTRY_POINT, ENTRY_POINTS
+from pygments.lexers.special import TextLexer
+from pygments.styles import get_style_by_name
+from pygments.styles.default import DefaultStyle
+
+
+class EntryPoint(object):
+
+    def __init__(self, name, module_name, *attrs):
+        self.name = name
+        self.module_name = module_name
+        self.attrs = attrs
+
+
+class FakePkgResources(object):
+    # stands in for the setuptools module, counting the scans
+
+    def __init__(self):
+        self.scans = []
+
+    def iter_entry_points(self, group):
+        self.scans.append(group)
+        if group == LEXER_ENTRY_POINT:
+            return [EntryPoint('faketext', 'pygments.lexers.special',
+                               'TextLexer')]
+        if group == STYLE_ENTRY_POINT:
+            return [EntryPoint('fakestyle', 'pygments.styles.default',
+                               'DefaultStyle')]
+        return []
+
+
+class PluginCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = sys.modules.get('pkg_resources')
+        self.pkg_resources = sys.modules['pkg_resources'] = FakePkgResources()
+        invalidate_plugin_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        if self.saved is None:
+            sys.modules.pop('pkg_resources', None)
+        else:
+            sys.modules['pkg_resources'] = self.saved
+        invalidate_plugin_cache()
+
+    def test_scan_once(self):
+        expected = [('faketext', TextLexer)]
+        self.assertEqual(get_plugins(LEXER_ENTRY_POINT), expected)
+        self.assertEqual(get_plugins(LEXER_ENTRY_POINT), expected)
+        self.assertEqual(self.pkg_resources.scans, [LEXER_ENTRY_POINT])
+        self.assert_(get_style_by_name('fakestyle') is DefaultStyle)
+        get_style_by_name('fakestyle')
+        self.assertEqual(self.pkg_resources.scans,
+                         [LEXER_ENTRY_POINT, STYLE_ENTRY_POINT])
+        # looked up again after invalidating
+        invalidate_plugin_cache()
+        self.assertEqual(get_plugins(LEXER_ENTRY_POINT), expected)
+        self.assertEqual(self.pkg_resources.scans,
+                         [LEXER_ENTRY_POINT, STYLE_ENTRY_POINT,
+                          LEXER_ENTRY_POINT])
+
+    def test_without_setuptools(self):
+        sys.modules['pkg_resources'] = None
+        for group in ENTRY_POINTS:
+            self.assertEqual(get_plugins(group), [])
+
+    def test_mapping(self):
+        filename = os.path.join(self.directory, '_plugin_mapping.py')
+        get_plugins(LEXER_ENTRY_POINT)
+        write_plugin_mapping(filename)
+        self.assertEqual(self.pkg_resources.scans,
+                         [LEXER_ENTRY_POINT] + ENTRY_POINTS)
+        # writing a snapshot invalidates the cache
+        self.assertEqual(plugin._plugin_cache, {})
+        namespace = {}
+        execfile(filename, namespace)
+        self.assertEqual(sorted(namespace['PLUGINS']), sorted(ENTRY_POINTS))
+        self.assertEqual(namespace['PLUGINS'][LEXER_ENTRY_POINT],
+                         [('faketext', 'pygments.lexers.special',
+                           ('TextLexer',))])
+
+        # with the snapshot imported, the distributions are not scanned
+        imp.load_source('pygments._plugin_mapping', filename)
+        sys.modules['pkg_resources'] = None
+        self.assertEqual(get_plugins(LEXER_ENTRY_POINT),
+                         [('faketext', TextLexer)])
+        self.assertEqual(get_plugins(STYLE_ENTRY_POINT),
+                         [('fakestyle', DefaultStyle)])
+        invalidate_plugin_cache()
+        self.assert_('pygments._plugin_mapping' not in sys.modules)
+        self.assertEqual(get_plugins(LEXER_ENTRY_POINT), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
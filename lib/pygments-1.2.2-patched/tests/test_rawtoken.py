@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+    Raw token format tests
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+import StringIO
+
+from pygments import format
+from pygments.lexers import PythonLexer, HtmlLexer, RawTokenLexer
+from pygments.formatters import RawTokenFormatter
+from pygments.token import Token, Name, Text
+from pygments.util import encode_varint, decode_varint, RAW_TOKEN_MAGIC, \
+     RAW_TOKEN_VERSION
+
+
+TEXTS = [
+    (PythonLexer, u'def f(x):\n    return u"\xe4€\U0001f600"\n'),
+    (HtmlLexer, u'<p title="да">a &amp; b</p>\n'),
+]
+
+
+def dump(tokens, **options):
+    out = StringIO.StringIO()
+    format(tokens, RawTokenFormatter(binary=True, **options), out)
+    return out.getvalue()
+
+
+def load(data, **options):
+    return list(RawTokenLexer(**options).get_tokens(data))
+
+
+class BinaryFormatTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for cls, text in TEXTS:
+            tokens = list(cls().get_tokens(text))
+            for compress in ('', 'gz', 'bz2'):
+                data = dump(tokens, compress=compress)
+                self.assertEqual(load(data, compress=compress), tokens)
+            # the text format is still read
+            out = StringIO.StringIO()
+            format(tokens, RawTokenFormatter(), out)
+            self.assertEqual(load(out.getvalue()), tokens)
+
+    def test_varint_records(self):
+        # type numbers and lengths of more than one byte
+        tokens = [(getattr(Name, 'X%d' % i), u'x' * i) for i in range(300)]
+        tokens += [(Text, u''), (Token, u'\U0001f600' * 100)]
+        self.assertEqual(load(dump(tokens)), tokens)
+
+    def test_format(self):
+        data = dump([(Text, u'\xe4'), (Name, u'a'), (Text, u'')])
+        self.assertEqual(data, RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION) +
+                         '\x00\x0aToken.Text\x01\x02\xc3\xa4'
+                         '\x00\x0aToken.Name\x02\x01a\x01\x00')
+
+    def test_malformed(self):
+        good = dump([(Text, u'\xe4' * 100), (Name, u'a')])
+        header = len(RAW_TOKEN_MAGIC) + 1
+        bad = [
+            # cut off inside a payload, a length and a token type name
+            good[:-1], good[:header + 14], good[:header + 5],
+            # unknown version
+            RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION + 1),
+            # undefined type number
+            RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION) + '\x01\x01a',
+            # malformed type name
+            RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION) + '\x00\x09Token.foo',
+            # invalid UTF-8
+            RAW_TOKEN_MAGIC + chr(RAW_TOKEN_VERSION) +
+            '\x00\x0aToken.Text\x01\x01\xff',
+        ]
+        for data in bad:
+            self.assertRaises(ValueError, load, data)
+
+
+class VarintTest(unittest.TestCase):
+
+    def test_encode(self):
+        self.assertEqual(encode_varint(0), '\x00')
+        self.assertEqual(encode_varint(127), '\x7f')
+        self.assertEqual(encode_varint(128), '\x80\x01')
+        self.assertEqual(encode_varint(300), '\xac\x02')
+        self.assertEqual(encode_varint(2 ** 64), '\x80' * 9 + '\x02')
+
+    def test_decode(self):
+        for n in (0, 1, 127, 128, 255, 16383, 16384, 2 ** 31, 2 ** 64 + 5):
+            data = 'ab' + encode_varint(n) + 'cd'
+            self.assertEqual(decode_varint(data, 2), (n, len(data) - 2))
+        self.assertRaises(IndexError, decode_varint, '\x80\x80', 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+    Terminal256 formatter tests
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments.formatters import Terminal256Formatter
+
+
+class BlueFormatter(Terminal256Formatter):
+    # maps every color to a single blue
+    def _build_color_table(self):
+        Terminal256Formatter._build_color_table(self)
+        self.xterm_colors[:] = [(0, 0, 0xee)] * 254
+
+
+class Terminal256Test(unittest.TestCase):
+
+    def slow_closest(self, formatter, r, g, b):
+        # the distance search over the whole palette
+        colors = formatter.xterm_colors
+        distances = [(cr - r) ** 2 + (cg - g) ** 2 + (cb - b) ** 2
+                     for cr, cg, cb in colors]
+        return distances.index(min(distances))
+
+    def test_closest_color(self):
+        formatter = Terminal256Formatter()
+        for rgb in [(0, 0, 0), (255, 255, 255), (0x12, 0x34, 0x56),
+                    (0x80, 0x80, 0x80), (0xcd, 0x01, 0x00), (8, 8, 9)]:
+            self.assertEqual(formatter._closest_color(*rgb),
+                             self.slow_closest(formatter, *rgb))
+
+    def test_subclass_palette(self):
+        formatter = BlueFormatter()
+        self.assertEqual(formatter._closest_color(255, 255, 255), 0)
+        self.assertEqual(formatter._color_index('ffffff'), 0)
+        # the palette of other instances is not changed
+        formatter = Terminal256Formatter()
+        self.assertEqual(formatter.xterm_colors[15], (0xff, 0xff, 0xff))
+        self.assertEqual(formatter._closest_color(255, 255, 255), 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    Token buffer tests
+    ~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from pygments import format
+from pygments.lexers import PythonLexer, CLexer, HtmlLexer, PhpLexer, \
+     RstLexer, RawTokenLexer
+from pygments.formatters import RawTokenFormatter
+from pygments.filters import get_filter_by_name
+from pygments.token import Text, Name, Keyword
+from pygments.tokenbuffer import TokenBuffer
+
+
+PYTHON_CODE = u'''\
+def f(a, b='\xe4\\t'):
+\t"""doc"""
+    return a ? b  # errors too
+'''
+
+SAMPLES = [
+    (PythonLexer, PYTHON_CODE),
+    (CLexer, u'int main() {\n  /* x */ return 0;\n}\n'),
+    (HtmlLexer, u'<p class="x">a &amp; <b>b</b></p>\n<script>var x;</script>'),
+    # post-processes the stream of RegexLexer
+    (PhpLexer, u'<?php echo strlen("x"); ?>\n'),
+    # callbacks with sub-lexers
+    (RstLexer, u'Title\n=====\n\n.. code-block:: python\n\n   x = 1\n'),
+]
+
+
+class TokenBufferTest(unittest.TestCase):
+
+    def test_lexers(self):
+        for cls, code in SAMPLES:
+            for options in [{}, {'tabsize': 4, 'stripall': True}]:
+                lexer = cls(**options)
+                buf = lexer.get_token_buffer(code)
+                self.assertEqual(list(buf), list(lexer.get_tokens(code)),
+                                 cls)
+                self.assertEqual(len(buf), len(list(buf)))
+                self.assertEqual([buf[i] for i in range(len(buf))],
+                                 list(buf))
+                self.assert_(buf.is_verbatim(), cls)
+                self.assert_(buf.getvalue() is buf.text)
+                # offsets point into the text
+                pos = 0
+                for index, ttype, value in buf.iter_unprocessed():
+                    self.assertEqual(index, pos)
+                    pos += len(value)
+
+    def test_iter_unprocessed(self):
+        buf = PythonLexer().get_token_buffer(PYTHON_CODE)
+        tokens = list(buf)
+        self.assertEqual([(t, v) for i, t, v in buf.iter_unprocessed(2, 5)],
+                         tokens[2:5])
+
+    def test_filters(self):
+        lexer = PythonLexer()
+        lexer.add_filter('keywordcase', case='upper')
+        lexer.add_filter('whitespace', spaces=True)
+        buf = lexer.get_token_buffer(PYTHON_CODE)
+        self.assertEqual(list(buf), list(lexer.get_tokens(PYTHON_CODE)))
+        self.assert_(not buf.is_verbatim())
+        self.assertEqual(buf.getvalue(), u''.join(
+            [v for t, v in lexer.get_tokens(PYTHON_CODE)]))
+        self.assertEqual(list(lexer.get_token_buffer(PYTHON_CODE, True)),
+                         list(lexer.get_tokens(PYTHON_CODE, True)))
+
+    def test_merged(self):
+        tokenmerge = get_filter_by_name('tokenmerge')
+        for cls, code in SAMPLES:
+            for unfiltered in (True, False):
+                lexer = cls()
+                if not unfiltered:
+                    lexer.add_filter('keywordcase', case='upper')
+                buf = lexer.get_token_buffer(code, unfiltered)
+                merged = buf.merged()
+                self.assertEqual(list(merged), list(tokenmerge.filter(
+                    lexer, lexer.get_tokens(code, unfiltered))))
+                self.assertEqual(merged.getvalue(), buf.getvalue())
+
+    def test_own_get_tokens(self):
+        # lexers overriding get_tokens give a buffer without shared text
+        raw = format(PythonLexer().get_tokens(PYTHON_CODE),
+                     RawTokenFormatter())
+        lexer = RawTokenLexer()
+        buf = lexer.get_token_buffer(raw)
+        self.assertEqual(buf.text, u'')
+        self.assertEqual(list(buf), list(lexer.get_tokens(raw)))
+        self.assertEqual(list(buf), list(PythonLexer().get_tokens(PYTHON_CODE)))
+
+    def test_append(self):
+        buf = TokenBuffer(u'a bc')
+        buf.append(Name, u'a')
+        buf.append_span(1, 2, Text)
+        buf.append(Keyword, u'BC')
+        self.assertEqual(list(buf), [(Name, u'a'), (Text, u' '),
+                                     (Keyword, u'BC')])
+        self.assert_(not buf.is_verbatim())
+        # a newline token indexed after its position is placed after the
+        # previous token, tokens after a gap at their index
+        buf = TokenBuffer(u'a\nb-cd')
+        buf.extend_unprocessed([(0, Name, u'a'), (2, Text, u'\n'),
+                                (2, Name, u'b'), (4, Name, u'cd'),
+                                (6, Keyword, u'!')])
+        self.assertEqual(list(buf.starts), [0, 1, 2, 4, 6])
+        self.assertEqual(list(buf.ends), [1, 2, 3, 6, 7])
+        self.assert_(not buf.is_verbatim())
+        self.assertEqual(buf.getvalue(), u'a\nbcd!')
+
+
+if __name__ == '__main__':
+    unittest.main()
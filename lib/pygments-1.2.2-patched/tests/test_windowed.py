@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+    Windowed lexing tests
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2010 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import unittest
+import warnings
+
+from pygments import lexer
+from pygments.lexer import RegexLexer
+from pygments.token import String, Text
+from pygments.lexers import CLexer, GoLexer, PythonLexer, TextLexer, \
+     HtmlPhpLexer, PhpLexer, RubyLexer
+
+
+C_CODE = '''\
+int x;
+/* a
+ b
+*/
+int y;
+'''
+
+PYTHON_CODE = '''\
+def f():
+    """doc
+    more
+    """
+    return 1
+'''
+
+GO_CODE = 'x\n/*\n' + ' * a\n' * 20 + ' */\ny\n'
+
+PHP_CODE = '''\
+<p>
+<?php
+function f($x) {
+    /* a
+       comment */
+    return "$x
+    more";
+}
+?>
+</p>
+'''
+
+RUBY_CODE = '''\
+x = <<EOS
+a
+b
+EOS
+puts x
+'''
+
+
+def windows(text, lines):
+    """
+    Split `text` into windows of `lines` lines.
+    """
+    split = text.splitlines(True)
+    return [''.join(split[i:i+lines]) for i in range(0, len(split), lines)]
+
+
+class WindowedTest(unittest.TestCase):
+
+    def setUp(self):
+        # a margin just longer than the tokens of the test texts, so that
+        # the texts are cut often
+        self.margin = lexer._WINDOW_MARGIN
+        lexer._WINDOW_MARGIN = 40
+
+    def tearDown(self):
+        lexer._WINDOW_MARGIN = self.margin
+
+    def assertWindowed(self, lx, text, sizes=(1, 2, 3)):
+        expected = list(lx.get_tokens(text))
+        for size in sizes:
+            self.assertEqual(list(lx.get_tokens_windowed(windows(text, size))),
+                             expected, 'windows of %d lines' % size)
+
+    def test_tokens_across_windows(self):
+        self.assertWindowed(CLexer(), C_CODE)
+        self.assertWindowed(PythonLexer(), PYTHON_CODE)
+
+    def test_margin(self):
+        # a comment spanning more than two windows that falls back to other
+        # tokens if cut off
+        lexer._WINDOW_MARGIN = self.margin
+        self.assertWindowed(GoLexer(), GO_CODE, (1, 2, 5))
+
+    def test_stripping(self):
+        text = '\n\n  int x;\n\n\n'
+        for options in [{}, {'stripall': True}, {'stripnl': False}]:
+            self.assertWindowed(CLexer(**options), text)
+
+    def test_state_carried(self):
+        # a string spanning all windows is not lexed again and again
+        class RecordingLexer(PythonLexer):
+            def _lex_window(self, text, *args):
+                lengths.append(len(text))
+                return PythonLexer._lex_window(self, text, *args)
+        lengths = []
+        text = 'x = """\n' + 'a\n' * 100 + '"""\n'
+        self.assertWindowed(RecordingLexer(), text, (1,))
+        self.assertEqual(len(lengths), 102)
+        self.assert_(max(lengths) < 50)
+
+    def test_unstreamable_lexers(self):
+        # lexers that cannot resume in a state get the whole text
+        self.assertWindowed(HtmlPhpLexer(), PHP_CODE)
+        self.assertWindowed(PhpLexer(startinline=True), PHP_CODE)
+        self.assertWindowed(RubyLexer(), RUBY_CODE)
+
+    def test_limit(self):
+        # a string without matches at line starts is cut at the limit with
+        # a warning
+        class StringLexer(RegexLexer):
+            tokens = {
+                'root': [(r'"', String, 'string'), (r'[^"]+', Text)],
+                'string': [(r'\n?[^"\n]+', String), (r'"', String, '#pop')],
+            }
+        limit = lexer._WINDOW_LIMIT
+        lexer._WINDOW_LIMIT = 20
+        lexer._WINDOW_MARGIN = 0
+        filters = warnings.filters[:]
+        showwarning = warnings.showwarning
+        caught = []
+        try:
+            warnings.simplefilter('always', RuntimeWarning)
+            warnings.showwarning = lambda *args: caught.append(args[0])
+            text = 'x\n"' + 'a\n' * 30 + '"\n'
+            tokens = list(StringLexer().get_tokens_windowed(windows(text, 1)))
+        finally:
+            lexer._WINDOW_LIMIT = limit
+            warnings.filters[:] = filters
+            warnings.showwarning = showwarning
+        self.assertEqual(tokens, list(StringLexer().get_tokens(text)))
+        self.assert_(caught)
+        self.assert_(isinstance(caught[0], RuntimeWarning))
+
+    def test_other_lexers(self):
+        # lexed window by window
+        lx = TextLexer()
+        tokens = list(lx.get_tokens_windowed(windows(C_CODE, 2)))
+        self.assertEqual(len(tokens), 3)
+        self.assertEqual(u''.join([v for t, v in tokens]), C_CODE)
+
+    def test_encoding(self):
+        # the encoding is guessed from the first window only
+        lx = TextLexer(encoding='guess')
+        for text, expected in [(u'\xe4\n'.encode('utf-8') + '\xe4\n',
+                                u'\xe4\n\ufffd\n'),
+                               ('\xe4\n' + u'\xe4\n'.encode('utf-8'),
+                                u'\xe4\n\xc3\xa4\n')]:
+            tokens = lx.get_tokens_windowed(windows(text, 1))
+            self.assertEqual(u''.join([v for t, v in tokens]), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()